@@ -0,0 +1,51 @@
+import { NextRequest, NextResponse } from 'next/server'
+
+const BACKEND_URL = process.env.BACKEND_URL || 'http://127.0.0.1:8000'
+
+export async function POST(request: NextRequest) {
+  try {
+    const body = await request.json()
+    const { text, document_id, style, max_length, language, max_points, num_questions } = body
+
+    if (!text && !document_id) {
+      return NextResponse.json(
+        { error: 'Text or document id is required' },
+        { status: 400 }
+      )
+    }
+
+    // Summary, key points and questions in a single backend call
+    const response = await fetch(`${BACKEND_URL}/pdf-summarizer/analyze`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({
+        text: text,
+        document_id: document_id,
+        style: style || 'concise',
+        max_length: max_length || 500,
+        language: language || 'en',
+        max_points: max_points || 10,
+        num_questions: num_questions || 5,
+      }),
+    })
+
+    if (!response.ok) {
+      const errorData = await response.json()
+      return NextResponse.json(
+        { error: errorData.detail || 'Failed to analyze document' },
+        { status: response.status }
+      )
+    }
+
+    const data = await response.json()
+    return NextResponse.json(data)
+
+  } catch (error) {
+    return NextResponse.json(
+      { error: 'Internal server error' },
+      { status: 500 }
+    )
+  }
+}
@@ -5,7 +5,7 @@ const BACKEND_URL = process.env.BACKEND_URL || 'http://127.0.0.1:8000'
 export async function POST(request: NextRequest) {
   try {
     const body = await request.json()
-    const { messages, pdf_context } = body
+    const { messages, pdf_context, document_id, session_id } = body
 
     if (!messages || !Array.isArray(messages)) {
       return NextResponse.json(
@@ -14,9 +14,9 @@ export async function POST(request: NextRequest) {
       )
     }
 
-    if (!pdf_context) {
+    if (!pdf_context && !document_id) {
       return NextResponse.json(
-        { error: 'PDF context is required' },
+        { error: 'PDF context or document id is required' },
         { status: 400 }
       )
     }
@@ -30,6 +30,8 @@ export async function POST(request: NextRequest) {
       body: JSON.stringify({
         messages: messages,
         pdf_context: pdf_context,
+        document_id: document_id,
+        session_id: session_id,
       }),
     })
 
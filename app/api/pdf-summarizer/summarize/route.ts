@@ -5,11 +5,11 @@ const BACKEND_URL = process.env.BACKEND_URL || 'http://127.0.0.1:8000'
 export async function POST(request: NextRequest) {
   try {
     const body = await request.json()
-    const { text, style, max_length, language } = body
+    const { text, document_id, style, max_length, language } = body
 
-    if (!text) {
+    if (!text && !document_id) {
       return NextResponse.json(
-        { error: 'Text is required' },
+        { error: 'Text or document id is required' },
         { status: 400 }
       )
     }
@@ -22,6 +22,7 @@ export async function POST(request: NextRequest) {
       },
       body: JSON.stringify({
         text: text,
+        document_id: document_id,
         style: style || 'concise',
         max_length: max_length || 500,
         language: language || 'en',
@@ -157,6 +157,8 @@ function PdfSummarizer({ droppedFileName, autoProcess }: { droppedFileName?: str
   const [isUploading, setIsUploading] = useState(false);
   const [uploadProgress, setUploadProgress] = useState(0);
   const [pdfText, setPdfText] = useState<string>("");
+  // Server-side copy of the uploaded PDF, so chat doesn't resend the full text
+  const [documentId, setDocumentId] = useState<string | null>(null);
   const [chatMessages, setChatMessages] = useState<Array<{ role: "user" | "assistant"; content: string; timestamp: Date }>>([]);
   const [currentMessage, setCurrentMessage] = useState("");
   const [isSending, setIsSending] = useState(false);
@@ -261,6 +263,7 @@ function PdfSummarizer({ droppedFileName, autoProcess }: { droppedFileName?: str
         const session = data.session;
         
         setPdfText(session.pdfText);
+        setDocumentId(null);
         setCurrentSessionId(session.id);
         setChatMessages(session.messages.map((msg: { role: string; content: string; timestamp: string }) => ({
           role: msg.role,
@@ -297,6 +300,7 @@ function PdfSummarizer({ droppedFileName, autoProcess }: { droppedFileName?: str
         if (currentSessionId === sessionId) {
           // Clear current session if it was deleted
           setPdfText("");
+          setDocumentId(null);
           setChatMessages([]);
           setCurrentSessionId(null);
           setFile(null);
@@ -391,6 +395,7 @@ function PdfSummarizer({ droppedFileName, autoProcess }: { droppedFileName?: str
 
       const data = await response.json();
       setPdfText(data.text);
+      setDocumentId(data.document_id ?? null);
 
       // Increment usage after successful upload
       try {
@@ -532,16 +537,25 @@ function PdfSummarizer({ droppedFileName, autoProcess }: { droppedFileName?: str
     }
 
     try {
-      const response = await fetch("/api/pdf-summarizer/chat", {
-        method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-        },
-        body: JSON.stringify({
-          messages: [...chatMessages, userMessage],
-          pdf_context: pdfText,
-        }),
-      });
+      const sendChat = (context: { document_id: string } | { pdf_context: string }) =>
+        fetch("/api/pdf-summarizer/chat", {
+          method: "POST",
+          headers: {
+            "Content-Type": "application/json",
+          },
+          body: JSON.stringify({
+            messages: [...chatMessages, userMessage],
+            session_id: currentSessionId,
+            ...context,
+          }),
+        });
+
+      let response = await sendChat(documentId ? { document_id: documentId } : { pdf_context: pdfText });
+      if (response.status === 404 && documentId) {
+        // Stored document expired; fall back to sending the text
+        setDocumentId(null);
+        response = await sendChat({ pdf_context: pdfText });
+      }
 
       if (!response.ok) {
         throw new Error("Failed to get response");
@@ -0,0 +1,178 @@
+"""
+Local fake of the Gemini REST API for testing rate limiting, retries and load.
+
+Serves POST /v1beta/models/<model>:generateContent (and
+:streamGenerateContent, sent in word chunks, and :countTokens) with canned responses,
+configurable latency, and injected 429 (quota) and 503 errors, optionally
+enforcing its own requests-per-minute quota.
+
+Usage (from the backend directory):
+    python -m benchmarks.fake_gemini_server --latency-ms 300 --error-rate 0.1 --rpm 60
+
+Then point the backend (or benchmarks.llm_gateway) at it:
+    GEMINI_API_KEY=fake GEMINI_API_ENDPOINT=http://127.0.0.1:8765 uvicorn main:app
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core.llm_providers import canned_text, mock_token_count
+
+_GENERATE_PATH = re.compile(r"^/v1beta/models/([^/:]+):(generateContent|streamGenerateContent|countTokens)")
+
+
+class FakeGemini:
+    """Behaviour and counters of the fake server."""
+
+    def __init__(self, latency: float, jitter: float, error_rate: float, server_error_rate: float,
+                 rpm: int, seed: int = 0, chunk_delay: float = 0.05):
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.server_error_rate = server_error_rate
+        self.rpm = rpm
+        self._random = random.Random(seed)
+        self._recent = deque()
+        self._lock = threading.Lock()
+        self.counts = {"requests": 0, "ok": 0, "quota_errors": 0, "server_errors": 0, "streams_aborted": 0}
+
+    def admit(self) -> int:
+        """HTTP status for the next request: 200, 429 or 503."""
+        with self._lock:
+            self.counts["requests"] += 1
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            roll = self._random.random()
+            if (self.rpm and len(self._recent) >= self.rpm) or roll < self.error_rate:
+                self.counts["quota_errors"] += 1
+                return 429
+            if roll < self.error_rate + self.server_error_rate:
+                self.counts["server_errors"] += 1
+                return 503
+            self._recent.append(now)
+            self.counts["ok"] += 1
+            return 200
+
+    def delay(self) -> float:
+        with self._lock:
+            return max(0.0, self._random.gauss(self.latency, self.jitter))
+
+
+def make_handler(fake: FakeGemini):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, body: dict):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_stream(self, text: str, usage: dict):
+            """Stream the text a few words per chunk, as a JSON array written incrementally."""
+            words = text.split(" ")
+            chunks = [" ".join(words[i:i + 4]) + (" " if i + 4 < len(words) else "") for i in range(0, len(words), 4)]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            try:
+                for index, chunk in enumerate(chunks):
+                    body = {"candidates": [{"content": {"parts": [{"text": chunk}], "role": "model"}}]}
+                    if index == len(chunks) - 1:
+                        body["candidates"][0]["finishReason"] = "STOP"
+                        body["usageMetadata"] = usage
+                    self.wfile.write((("[" if index == 0 else "\n,") + json.dumps(body)).encode("utf-8"))
+                    self.wfile.flush()
+                    time.sleep(fake.chunk_delay)
+                self.wfile.write(b"]")
+            except (BrokenPipeError, ConnectionResetError):
+                with fake._lock:
+                    fake.counts["streams_aborted"] += 1
+
+        def do_GET(self):
+            if self.path.startswith("/stats"):
+                self._send_json(200, fake.counts)
+            else:
+                self._send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            match = _GENERATE_PATH.match(self.path)
+            if not match:
+                self._send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+                return
+
+            # countTokens wraps a generate request
+            contents = request.get("generateContentRequest", request).get("contents", [])
+            prompt = " ".join(part.get("text", "") for content in contents for part in content.get("parts", []))
+            if match.group(2) == "countTokens":
+                self._send_json(200, {"totalTokens": mock_token_count(prompt)})
+                return
+
+            status = fake.admit()
+            time.sleep(fake.delay())
+            if status == 429:
+                self._send_json(429, {"error": {
+                    "code": 429, "status": "RESOURCE_EXHAUSTED",
+                    "message": "Resource has been exhausted (e.g. check quota)."
+                }})
+                return
+            if status == 503:
+                self._send_json(503, {"error": {
+                    "code": 503, "status": "UNAVAILABLE", "message": "The model is overloaded. Please try again later."
+                }})
+                return
+
+            config = request.get("generationConfig", {})
+            text = canned_text(prompt, config.get("responseMimeType") == "application/json", config.get("responseSchema"))
+            usage = {
+                "promptTokenCount": len(prompt) // 4,
+                "candidatesTokenCount": len(text) // 4,
+                "totalTokenCount": (len(prompt) + len(text)) // 4,
+            }
+            if match.group(2) == "streamGenerateContent":
+                self._send_stream(text, usage)
+                return
+            self._send_json(200, {
+                "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP"}],
+                "usageMetadata": usage,
+            })
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Gemini API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=300, help="Mean response latency")
+    parser.add_argument("--jitter-ms", type=float, default=100, help="Standard deviation of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="Fraction answered with 503")
+    parser.add_argument("--rpm", type=int, default=0, help="Server-side requests-per-minute quota (0: none)")
+    parser.add_argument("--chunk-delay-ms", type=float, default=50, help="Delay between streamed chunks")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fake = FakeGemini(args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate,
+                      args.server_error_rate, args.rpm, args.seed, args.chunk_delay_ms / 1000)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(fake))
+    print(f"Fake Gemini API on http://{args.host}:{args.port} (GET /stats for counters)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Offline throughput and tail-latency benchmark of the LLM-backed endpoints.
+
+Serves the PDF summarizer and text humanizer routers in-process with the
+mock LLM provider (canned responses after a configurable latency, paced
+by a token throughput, with injected 429s and 503s) and reports requests
+per second, status counts and latency percentiles per endpoint, followed
+by the gateway statistics. Every request carries different text, so caches
+and request coalescing don't hide upstream calls. Streaming endpoints are
+timed to the end of the stream.
+
+Usage (from the backend directory):
+    python -m benchmarks.llm_endpoints
+    python -m benchmarks.llm_endpoints --requests 200 --concurrency 32 --latency-ms 500 --error-rate 0.05
+    python -m benchmarks.llm_endpoints --endpoints summarize,chat --distribution exponential
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import Counter
+
+WORDS = ("the report describes revenue growth across regions while costs for energy and staff rose "
+         "faster than expected so the board approved a plan to review suppliers and delay hiring").split()
+
+
+def document(index: int, sentences: int) -> str:
+    """Deterministic text of the given length, different for each request index."""
+    rng = random.Random(index)
+    return " ".join(
+        f"Item {index}-{n}: " + " ".join(rng.choice(WORDS) for _ in range(14)) + "."
+        for n in range(sentences)
+    )
+
+
+def conversation(index: int, turns: int) -> list:
+    messages = []
+    for turn in range(turns):
+        messages.append({"role": "user", "content": f"Question {turn} about item {index}: what changed and why?"})
+        messages.append({"role": "assistant", "content": document(index * 100 + turn, 3)})
+    messages.append({"role": "user", "content": f"Summarize what we discussed about item {index}."})
+    return messages
+
+
+# name -> (path, request arguments (json body or query params) for a request index)
+ENDPOINTS = {
+    "summarize": ("/pdf-summarizer/summarize", lambda i: {"json": {"text": document(i, 30), "style": "concise"}}),
+    "summarize_long": ("/pdf-summarizer/summarize", lambda i: {"json": {"text": document(i, 600), "style": "detailed"}}),
+    "summarize_stream": ("/pdf-summarizer/summarize/stream", lambda i: {"json": {"text": document(i, 30)}}),
+    "analyze": ("/pdf-summarizer/analyze", lambda i: {"json": {"text": document(i, 60)}}),
+    "key_points": ("/pdf-summarizer/key-points", lambda i: {"params": {"text": document(i, 30), "max_points": 5}}),
+    "questions": ("/pdf-summarizer/questions", lambda i: {"params": {"text": document(i, 30), "num_questions": 5}}),
+    "chat": ("/pdf-summarizer/chat", lambda i: {"json": {
+        "messages": conversation(i, 12), "pdf_context": document(i, 80), "session_id": f"bench-{i}"
+    }}),
+    "chat_stream": ("/pdf-summarizer/chat/stream", lambda i: {"json": {
+        "messages": conversation(i, 2), "pdf_context": document(i, 80)
+    }}),
+    "humanize": ("/text-humanizer/humanize", lambda i: {"json": {"text": document(i, 12), "model": "gemini"}}),
+}
+
+
+def configure(args):
+    """Select and configure the mock provider; settings are read when the app is imported."""
+    os.environ.update({
+        "LLM_PROVIDER": "mock",
+        "LLM_MOCK_LATENCY_MS": str(args.latency_ms),
+        "LLM_MOCK_JITTER_MS": str(args.jitter_ms),
+        "LLM_MOCK_LATENCY_DISTRIBUTION": args.distribution,
+        "LLM_MOCK_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "LLM_MOCK_ERROR_RATE": str(args.error_rate),
+        "LLM_MOCK_SERVER_ERROR_RATE": str(args.server_error_rate),
+        "LLM_MOCK_SEED": str(args.seed),
+        "LLM_RPM": str(args.rpm),
+        "LLM_TPM": str(args.tpm),
+        "HUMANIZER_BATCH_SIZE": str(args.humanizer_batch_size),
+    })
+
+
+def build_app():
+    from fastapi import FastAPI
+    from tools.pdf_summarizer.router import router as pdf_router
+    from tools.text_humanizer.router import router as humanizer_router
+
+    app = FastAPI()
+    app.include_router(pdf_router)
+    app.include_router(humanizer_router)
+    return app
+
+
+async def run(client, path: str, arguments, requests: int, concurrency: int):
+    from core.metrics import LatencyStats
+
+    latency = LatencyStats(window=requests)
+    outcomes = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call(index: int):
+        async with semaphore:
+            start_time = time.perf_counter()
+            try:
+                response = await client.post(path, **arguments(index))
+                outcomes[str(response.status_code)] += 1
+                # Streams report failures as a final error event
+                if path.endswith("/stream") and '"type": "error"' in response.text:
+                    outcomes["stream_error"] += 1
+            except Exception as e:
+                outcomes[type(e).__name__] += 1
+            latency.record(time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(call(index) for index in range(requests)))
+    return time.perf_counter() - start_time, outcomes, latency.snapshot()
+
+
+async def main_async(args):
+    import httpx
+    from core.llm import llm_stats
+
+    names = args.endpoints.split(",") if args.endpoints else list(ENDPOINTS)
+    unknown = [name for name in names if name not in ENDPOINTS]
+    if unknown:
+        raise SystemExit(f"Unknown endpoints: {', '.join(unknown)} (choose from {', '.join(ENDPOINTS)})")
+
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        print(f"{'endpoint':<18}{'req/s':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}  statuses")
+        for name in names:
+            path, arguments = ENDPOINTS[name]
+            elapsed, outcomes, latency = await run(client, path, arguments, args.requests, args.concurrency)
+            print(f"{name:<18}{args.requests / elapsed:>8.1f}{latency['p50_ms']:>10.0f}{latency['p95_ms']:>10.0f}"
+                  f"{latency['p99_ms']:>10.0f}{latency['max_ms']:>10.0f}  {dict(outcomes)}")
+
+    stats = llm_stats()
+    report = {key: stats.get(key) for key in ("provider", "circuit_breaker", "single_flight", "tools")}
+    if "humanize" in names:
+        from tools.text_humanizer.gemini_humanizer import gemini_humanizer
+        report["gemini_humanizer"] = gemini_humanizer.stats()
+    print(json.dumps(report, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LLM-backed endpoints against the mock provider")
+    parser.add_argument("--endpoints", default="", help=f"Comma-separated subset of: {', '.join(ENDPOINTS)}")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10, help="Requests in flight at once")
+    parser.add_argument("--latency-ms", type=float, default=300, help="Mean time to first token")
+    parser.add_argument("--jitter-ms", type=float, default=100, help="Standard deviation of the time to first token")
+    parser.add_argument("--distribution", default="lognormal", choices=("fixed", "normal", "lognormal", "exponential"))
+    parser.add_argument("--tokens-per-second", type=float, default=200, help="Output token throughput per call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls failing with 429")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="Fraction of calls failing with 503")
+    parser.add_argument("--rpm", type=int, default=0, help="Gateway requests-per-minute budget (0: none)")
+    parser.add_argument("--tpm", type=int, default=0, help="Gateway tokens-per-minute budget (0: none)")
+    parser.add_argument("--humanizer-batch-size", type=int, default=1,
+                        help="Gemini humanizer chunks per request (1: no batching)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    configure(args)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
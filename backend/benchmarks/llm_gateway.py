@@ -0,0 +1,82 @@
+"""
+Load-test the LLM gateway (rate limiting, retries, circuit breaker) against a Gemini endpoint.
+
+Fires concurrent generate calls through the gateway and reports successes,
+failures by type, latency percentiles and the gateway's limiter and
+breaker statistics. Meant to be run against benchmarks.fake_gemini_server,
+or in-process against the mock provider.
+
+Usage (from the backend directory):
+    python -m benchmarks.fake_gemini_server --error-rate 0.2 &
+    python -m benchmarks.llm_gateway --requests 100 --concurrency 20 --rpm 120
+    python -m benchmarks.llm_gateway --provider mock --error-rate 0.2
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+
+from core.llm import LLMGateway
+from core.llm_providers import GeminiProvider, MockProvider
+from core.metrics import LatencyStats
+from core.rate_limit import RateLimiter, CircuitBreaker
+
+
+async def run(gateway: LLMGateway, requests: int, concurrency: int):
+    latency = LatencyStats(window=requests)
+    outcomes = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call(index: int):
+        async with semaphore:
+            start_time = time.time()
+            try:
+                await gateway.generate(f"Rewrite sentence number {index} in simpler words.", "benchmark",
+                                       "gemini-1.5-flash")
+                outcomes["ok"] += 1
+            except Exception as e:
+                outcomes[type(e).__name__] += 1
+            latency.record(time.time() - start_time)
+
+    start_time = time.time()
+    await asyncio.gather(*(call(index) for index in range(requests)))
+    return time.time() - start_time, outcomes, latency.snapshot()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the LLM gateway")
+    parser.add_argument("--provider", choices=("gemini", "mock"), default="gemini")
+    parser.add_argument("--endpoint", default="http://127.0.0.1:8765", help="Gemini API endpoint")
+    parser.add_argument("--latency-ms", type=float, default=300, help="Mock: mean time to first token")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Mock: fraction of calls answered with 429")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--rpm", type=int, default=0)
+    parser.add_argument("--tpm", type=int, default=0)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--circuit-threshold", type=int, default=5)
+    parser.add_argument("--circuit-reset", type=float, default=30.0)
+    args = parser.parse_args()
+
+    if args.provider == "mock":
+        provider = MockProvider(latency=args.latency_ms / 1000, error_rate=args.error_rate)
+    else:
+        provider = GeminiProvider("fake-key", endpoint=args.endpoint)
+    gateway = LLMGateway(
+        provider, max_concurrency=args.concurrency,
+        rate_limiter=RateLimiter(args.rpm, args.tpm),
+        circuit_breaker=CircuitBreaker(args.circuit_threshold, args.circuit_reset),
+        max_retries=args.retries
+    )
+    elapsed, outcomes, latency = asyncio.run(run(gateway, args.requests, args.concurrency))
+
+    print(f"{args.requests} calls in {elapsed:.2f}s ({args.requests / elapsed:.1f}/s)")
+    print(f"Outcomes: {dict(outcomes)}")
+    print(f"Latency: {latency}")
+    stats = gateway.stats()
+    print(json.dumps({key: stats[key] for key in ("provider", "rate_limiter", "circuit_breaker", "tools")}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
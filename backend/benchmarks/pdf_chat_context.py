@@ -0,0 +1,88 @@
+"""
+Compare PDF chat prompt size with the full document vs. BM25 retrieval.
+
+Measures index build time, retrieval time per question and the estimated
+prompt tokens per chat turn (~4 characters per token) without calling Gemini.
+Live token counts and answer latency per mode are reported by
+GET /pdf-summarizer/metrics ("chat_context").
+
+Usage (from the backend directory):
+    python -m benchmarks.pdf_chat_context                       # synthetic 80-page document
+    python -m benchmarks.pdf_chat_context --pdf report.pdf --question "What were the findings?"
+"""
+import argparse
+import random
+import time
+
+from core.config import settings
+from tools.pdf_summarizer.pdf_extractor import PDFExtractor
+from tools.pdf_summarizer.retrieval import BM25Index, build_chat_context
+
+TOPICS = {
+    "budget": "revenue expenses forecast quarter spending allocation deficit audit",
+    "safety": "hazard incident inspection protective equipment training compliance",
+    "hiring": "candidates interview onboarding recruiter salary offer retention",
+    "climate": "emissions carbon temperature renewable solar efficiency targets",
+    "security": "password encryption breach firewall access vulnerability patch",
+}
+FILLER = "the team reviewed the report and discussed next steps with stakeholders across departments".split()
+
+
+def make_document(pages: int, seed: int = 7):
+    """Synthetic document where each page covers one topic; returns (text, page_offsets)."""
+    rng = random.Random(seed)
+    page_texts = []
+    for page in range(pages):
+        topic = list(TOPICS)[page % len(TOPICS)]
+        words = TOPICS[topic].split()
+        lines = [f"Section {page + 1}: {topic.title()}"]
+        for _ in range(30):
+            lines.append(" ".join(rng.choice(words if rng.random() < 0.3 else FILLER) for _ in range(14)) + ".")
+        page_texts.append("\n".join(lines))
+
+    offsets, offset = [], 0
+    for text in page_texts:
+        offsets.append([offset, offset + len(text)])
+        offset += len(text) + 2
+    return "\n\n".join(page_texts), offsets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare chat prompt size: full document vs BM25 retrieval")
+    parser.add_argument("--pdf", help="PDF file to use (default: synthetic document)")
+    parser.add_argument("--pages", type=int, default=80, help="Pages in the synthetic document")
+    parser.add_argument("--question", action="append", help="Question to test (repeatable)")
+    parser.add_argument("--top-k", type=int, default=settings.PDF_CHAT_TOP_K)
+    args = parser.parse_args()
+
+    if args.pdf:
+        extractor = PDFExtractor()
+        with open(args.pdf, "rb") as f, extractor.open(f.read(), args.pdf) as document:
+            text, metadata = extractor.extract_text(document)
+        offsets = metadata["page_offsets"]
+    else:
+        text, offsets = make_document(args.pages)
+
+    questions = args.question or [
+        "What does the document say about the budget forecast and spending?",
+        "Were there any security breaches or vulnerabilities?",
+        "How is hiring and retention going?",
+    ]
+
+    start_time = time.time()
+    index = BM25Index.build(text, offsets)
+    build_time = time.time() - start_time
+    full_tokens = len(text) // 4
+
+    print(f"Document: {len(text)} characters, {len(index.passages)} passages, index built in {build_time * 1000:.1f} ms")
+    print(f"{'mode':>10} {'prompt tokens':>14} {'retrieval ms':>13}  question")
+    for question in questions:
+        start_time = time.time()
+        context, pages = build_chat_context(index, question, args.top_k)
+        retrieval_time = time.time() - start_time
+        print(f"{'full':>10} {full_tokens:>14} {0:>13.2f}  {question}")
+        print(f"{'retrieval':>10} {len(context) // 4:>14} {retrieval_time * 1000:>13.2f}  pages {pages}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark PDF text extraction throughput (pages/sec) against worker count.
+
+Usage (from the backend directory):
+    python -m benchmarks.pdf_extraction                    # synthetic 200-page PDF
+    python -m benchmarks.pdf_extraction --pdf report.pdf --workers 1 2 4 8
+"""
+import argparse
+import os
+import time
+
+from tools.pdf_summarizer.pdf_extractor import PDFExtractor, STRATEGIES
+
+LOREM = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud "
+    "exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat."
+)
+
+
+def make_pdf(pages: int, lines_per_page: int = 40) -> bytes:
+    """Build a simple multi-page text PDF without third-party libraries."""
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = len(objects) + 2 * pages + 1
+    page_ids = []
+    for page in range(pages):
+        lines = [f"Page {page + 1} line {line + 1}: {LOREM[:70]}" for line in range(lines_per_page)]
+        stream = "BT /F1 9 Tf 40 800 Td 12 TL " + " ".join(f"({text}) '" for text in lines) + " ET"
+        content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream.encode("latin-1")))
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font, content)
+        ))
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids).encode()
+    add(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    return bytes(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF extraction pages/sec vs worker count")
+    parser.add_argument("--pdf", help="PDF file to extract (default: synthetic document)")
+    parser.add_argument("--pages", type=int, default=200, help="Pages in the synthetic document")
+    parser.add_argument("--workers", type=int, nargs="+", help="Worker counts to test (default: 1..cpu count)")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="layout",
+                        help="'layout' runs pdfplumber on every page (exercises the pool); 'adaptive' is the server default")
+    parser.add_argument("--repeat", type=int, default=2, help="Runs per worker count (best is reported)")
+    args = parser.parse_args()
+
+    if args.pdf:
+        with open(args.pdf, "rb") as f:
+            content = f.read()
+        filename = os.path.basename(args.pdf)
+    else:
+        content = make_pdf(args.pages)
+        filename = "synthetic.pdf"
+
+    cpu_count = os.cpu_count() or 1
+    worker_counts = args.workers or sorted({1, 2, 4, 8, cpu_count} & set(range(1, cpu_count + 1))) or [1]
+
+    print(f"{filename}: {len(content) / 1e6:.1f} MB, {cpu_count} CPUs")
+    print(f"{'workers':>8} {'seconds':>9} {'pages/s':>9} {'speedup':>8}")
+    baseline = None
+    for workers in worker_counts:
+        extractor = PDFExtractor(workers=workers, parallel_min_pages=1, strategy=args.strategy)
+        with extractor.open(content, filename) as document:
+            extractor.extract_text(document)  # warm up the process pool
+
+        best = None
+        for _ in range(args.repeat):
+            start_time = time.time()
+            with extractor.open(content, filename) as document:
+                _, metadata = extractor.extract_text(document)
+            elapsed = time.time() - start_time
+            best = elapsed if best is None else min(best, elapsed)
+
+        baseline = baseline or best
+        pages = metadata["pages"]
+        print(f"{workers:>8} {best:>9.2f} {pages / best:>9.1f} {baseline / best:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,16 @@
 Configuration settings for the backend application.
 """
 import os
-from typing import Optional
+from typing import Optional, Dict
+
+def _parse_mapping(value: str) -> Dict[str, float]:
+    """Parse a "name=value,name=value" setting into a dict of floats."""
+    mapping = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, number = item.split("=", 1)
+            mapping[name.strip()] = float(number)
+    return mapping
 
 class Settings:
     """Application settings."""
@@ -21,6 +30,117 @@ class Settings:
     # Model Settings
     DEFAULT_MODEL: str = "t5-small"
     MAX_TEXT_LENGTH: int = 2048
+
+    # Warmup Settings (comma-separated: stable_diffusion, ai_detector)
+    WARMUP_MODELS: list = [
+        name.strip() for name in os.getenv("WARMUP_MODELS", "stable_diffusion,ai_detector").split(",")
+        if name.strip()
+    ]
+    # Seconds shutdown waits for model loads still in progress
+    WARMUP_STOP_TIMEOUT: float = float(os.getenv("WARMUP_STOP_TIMEOUT", "30"))
+
+    # AI Detection Settings
+    DETECTION_MODE: str = os.getenv("DETECTION_MODE", "statistical")  # statistical | cascade | ensemble | ngram
+    CASCADE_BAND: float = float(os.getenv("CASCADE_BAND", "0.08"))
+    CASCADE_TRANSFORMER_WEIGHT: float = float(os.getenv("CASCADE_TRANSFORMER_WEIGHT", "0.7"))
+    ENSEMBLE_DEADLINE: float = float(os.getenv("ENSEMBLE_DEADLINE", "5.0"))
+    ENSEMBLE_TIMEOUTS: Dict[str, float] = _parse_mapping(
+        os.getenv("ENSEMBLE_TIMEOUTS", "statistical=1.0,transformer=4.0,semantic=1.0,ngram=0.5")
+    )
+    ENSEMBLE_WEIGHTS: Dict[str, float] = _parse_mapping(
+        os.getenv("ENSEMBLE_WEIGHTS", "statistical=0.25,transformer=0.45,semantic=0.15,ngram=0.15")
+    )
+    DETECTION_CACHE_SIZE: int = int(os.getenv("DETECTION_CACHE_SIZE", "2048"))
+    DETECTION_CACHE_TTL: float = float(os.getenv("DETECTION_CACHE_TTL", "3600"))
+    # Optional SQLite file shared by all workers on this host, e.g. .cache/detection.sqlite3
+    DETECTION_CACHE_PATH: Optional[str] = os.getenv("DETECTION_CACHE_PATH") or None
+    # Path prefix of the hashed n-gram detector weights (<prefix>.npy / <prefix>.json)
+    NGRAM_MODEL_PATH: Optional[str] = os.getenv("NGRAM_MODEL_PATH") or None
+
+    # LLM Gateway Settings (outbound Gemini calls, shared by all tools)
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    LLM_TOOL_CONCURRENCY: Dict[str, float] = _parse_mapping(
+        os.getenv("LLM_TOOL_CONCURRENCY", "pdf_summarizer=6,text_humanizer=4")
+    )
+    # Per-process request and token budgets per minute (0 disables); calls over budget queue
+    LLM_RPM: int = int(os.getenv("LLM_RPM", "60"))
+    LLM_TPM: int = int(os.getenv("LLM_TPM", "1000000"))
+    LLM_MAX_QUEUE_SECONDS: float = float(os.getenv("LLM_MAX_QUEUE_SECONDS", "60"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    LLM_BACKOFF_BASE: float = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+    LLM_BACKOFF_MAX: float = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+    # Consecutive quota errors before failing fast, and the cool-down before trying again
+    LLM_CIRCUIT_THRESHOLD: int = int(os.getenv("LLM_CIRCUIT_THRESHOLD", "5"))
+    LLM_CIRCUIT_RESET_SECONDS: float = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30"))
+    # Alternative API endpoint, e.g. http://127.0.0.1:8765 for benchmarks/fake_gemini_server.py
+    GEMINI_API_ENDPOINT: Optional[str] = os.getenv("GEMINI_API_ENDPOINT") or None
+    GEMINI_TRANSPORT: Optional[str] = os.getenv("GEMINI_TRANSPORT") or None  # grpc | rest
+    # Identical in-flight calls (model + prompt + config) share one upstream request
+    LLM_COALESCE: bool = os.getenv("LLM_COALESCE", "true").lower() in ("1", "true", "yes")
+    # Model API: gemini, or mock (local canned responses for offline load tests and benchmarks)
+    LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "gemini").lower()
+    # Mock provider: time to first token (fixed | normal | lognormal | exponential), output
+    # throughput, and fractions of calls failing with 429 and 503
+    LLM_MOCK_LATENCY_MS: float = float(os.getenv("LLM_MOCK_LATENCY_MS", "300"))
+    LLM_MOCK_JITTER_MS: float = float(os.getenv("LLM_MOCK_JITTER_MS", "100"))
+    LLM_MOCK_LATENCY_DISTRIBUTION: str = os.getenv("LLM_MOCK_LATENCY_DISTRIBUTION", "lognormal")
+    LLM_MOCK_TOKENS_PER_SECOND: float = float(os.getenv("LLM_MOCK_TOKENS_PER_SECOND", "200"))
+    LLM_MOCK_ERROR_RATE: float = float(os.getenv("LLM_MOCK_ERROR_RATE", "0"))
+    LLM_MOCK_SERVER_ERROR_RATE: float = float(os.getenv("LLM_MOCK_SERVER_ERROR_RATE", "0"))
+    LLM_MOCK_SEED: int = int(os.getenv("LLM_MOCK_SEED", "0"))
+
+    # Gemini humanizer: chunks rewritten at once per request, and extra attempts per chunk after an
+    # invalid rewrite before falling back to the local humanizer
+    HUMANIZER_CHUNK_CONCURRENCY: int = int(os.getenv("HUMANIZER_CHUNK_CONCURRENCY", "4"))
+    HUMANIZER_CHUNK_RETRIES: int = int(os.getenv("HUMANIZER_CHUNK_RETRIES", "1"))
+    # Chunks packed into one structured request (1 disables batching), up to this many characters
+    HUMANIZER_BATCH_SIZE: int = int(os.getenv("HUMANIZER_BATCH_SIZE", "1"))
+    HUMANIZER_BATCH_MAX_CHARS: int = int(os.getenv("HUMANIZER_BATCH_MAX_CHARS", "4000"))
+
+    # Prompt Budget Settings: input tokens per prompt; document context and chat history are trimmed to fit
+    PROMPT_MAX_TOKENS: int = int(os.getenv("PROMPT_MAX_TOKENS", "100000"))
+    # Share of the budget left after the instructions that is kept for chat history
+    PROMPT_HISTORY_SHARE: float = float(os.getenv("PROMPT_HISTORY_SHARE", "0.25"))
+    # Prompts estimated within this fraction of the budget are counted exactly (countTokens API)
+    PROMPT_EXACT_COUNT: bool = os.getenv("PROMPT_EXACT_COUNT", "true").lower() in ("1", "true", "yes")
+    PROMPT_EXACT_COUNT_MARGIN: float = float(os.getenv("PROMPT_EXACT_COUNT_MARGIN", "0.1"))
+
+    # PDF Extraction Settings
+    PDF_EXTRACT_WORKERS: int = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+    PDF_PARALLEL_MIN_PAGES: int = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "24"))
+    PDF_MAX_UPLOAD_BYTES: int = int(os.getenv("PDF_MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+    # Uploads larger than this are spooled to a temp file and parsed through a memory map
+    PDF_SPOOL_MEMORY_BYTES: int = int(os.getenv("PDF_SPOOL_MEMORY_BYTES", str(1024 * 1024)))
+    # Extraction cache directory shared by all workers on this host (empty disables the cache)
+    PDF_CACHE_DIR: str = os.getenv("PDF_CACHE_DIR", ".cache/pdf_extraction")
+    PDF_CACHE_MAX_BYTES: int = int(os.getenv("PDF_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+    # Uploaded documents referenced by document_id; each access extends the TTL (seconds)
+    PDF_DOCUMENT_DIR: str = os.getenv("PDF_DOCUMENT_DIR", ".cache/pdf_documents")
+    PDF_DOCUMENT_TTL: float = float(os.getenv("PDF_DOCUMENT_TTL", str(24 * 3600)))
+    # Chat sends the top-k BM25 passages instead of documents longer than this many characters
+    PDF_CHAT_FULL_CONTEXT_CHARS: int = int(os.getenv("PDF_CHAT_FULL_CONTEXT_CHARS", "12000"))
+    PDF_CHAT_TOP_K: int = int(os.getenv("PDF_CHAT_TOP_K", "6"))
+    # Search indexes of chat contexts sent as text (no document_id) kept in memory per worker
+    PDF_CHAT_INDEX_CACHE_SIZE: int = int(os.getenv("PDF_CHAT_INDEX_CACHE_SIZE", "64"))
+    # Texts over this many (estimated) tokens are summarized map-reduce, in sections of this size
+    PDF_SUMMARY_SECTION_TOKENS: int = int(os.getenv("PDF_SUMMARY_SECTION_TOKENS", "6000"))
+    PDF_SUMMARY_CONCURRENCY: int = int(os.getenv("PDF_SUMMARY_CONCURRENCY", "4"))
+    # Texts over this many tokens are also summarized by section from their second summary request
+    # on (e.g. another style), so the section summaries are reused by later requests. The first
+    # summary stays one call; the second costs a section call plus the reduce call, and later
+    # styles, lengths or languages only the (small) reduce call
+    PDF_SUMMARY_REUSE_MIN_TOKENS: int = int(os.getenv("PDF_SUMMARY_REUSE_MIN_TOKENS", "1500"))
+    PDF_SUMMARY_CACHE_SIZE: int = int(os.getenv("PDF_SUMMARY_CACHE_SIZE", "4096"))
+    PDF_SUMMARY_CACHE_TTL: float = float(os.getenv("PDF_SUMMARY_CACHE_TTL", str(24 * 3600)))
+    # Optional SQLite file shared by all workers on this host, e.g. .cache/summaries.sqlite3
+    PDF_SUMMARY_CACHE_PATH: Optional[str] = os.getenv("PDF_SUMMARY_CACHE_PATH") or None
+    # Chat sends the last N turns verbatim; older messages are folded, at least a batch at a time,
+    # into a rolling summary of at most PDF_CHAT_SUMMARY_WORDS, cached per session
+    PDF_CHAT_RECENT_TURNS: int = int(os.getenv("PDF_CHAT_RECENT_TURNS", "4"))
+    PDF_CHAT_COMPACT_BATCH: int = int(os.getenv("PDF_CHAT_COMPACT_BATCH", "4"))
+    PDF_CHAT_SUMMARY_WORDS: int = int(os.getenv("PDF_CHAT_SUMMARY_WORDS", "250"))
+    PDF_CHAT_SUMMARY_CACHE_SIZE: int = int(os.getenv("PDF_CHAT_SUMMARY_CACHE_SIZE", "2048"))
+    PDF_CHAT_SUMMARY_CACHE_TTL: float = float(os.getenv("PDF_CHAT_SUMMARY_CACHE_TTL", str(7 * 24 * 3600)))
     
     # CORS Settings
     BACKEND_CORS_ORIGINS: list = ["http://localhost:3000", "http://localhost:3001"]
@@ -0,0 +1,484 @@
+"""
+Shared gateway for outbound LLM (Gemini) calls.
+
+Every tool calls Gemini through one long-lived gateway: the API is
+configured once, model clients (and their connections) are reused across
+requests, calls use the async generation API, and concurrency is capped
+globally and per tool. Latency and token usage are recorded per tool.
+
+Calls are queued against requests-per-minute and tokens-per-minute
+budgets, transient errors and 429s are retried with jittered exponential
+backoff, and a circuit breaker fails calls fast once the quota is
+exhausted. Identical calls in flight at the same time (same model, prompt
+and generation config) share one upstream request.
+
+The model API itself is a provider (core.llm_providers): Gemini, or a
+local mock for offline load tests, chosen with LLM_PROVIDER.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import weakref
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from core.cache import TTLCache
+from core.config import settings
+from core.dependencies import get_logger
+from core.llm_providers import (
+    QUOTA_ERRORS, TRANSIENT_ERRORS, LLMUnavailable, LLMProvider, GeminiProvider, MockProvider
+)
+from core.metrics import LatencyStats
+from core.rate_limit import CLOSED, RateLimiter, RateLimitExceeded, CircuitBreaker, backoff_delay
+from core.single_flight import SingleFlight
+
+logger = get_logger(__name__)
+
+def is_quota_error(error: BaseException) -> bool:
+    """Whether an API error means the request or token quota is used up (HTTP 429)."""
+    message = str(error).lower()
+    return isinstance(error, QUOTA_ERRORS) or "429" in message or "quota" in message
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """Whether an API error is worth retrying (server errors, timeouts, dropped connections)."""
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+class LLMResult:
+    """Text and usage of one generation call."""
+
+    def __init__(self, text: str, model: str, prompt_tokens: int, output_tokens: int, latency: float):
+        self.text = text
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.output_tokens = output_tokens
+        self.latency = latency
+
+
+class LLMMetrics:
+    """Per-tool call counts, in-flight calls, latency and token usage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tools: Dict[str, Dict[str, Any]] = {}
+
+    def _stats(self, tool: str) -> Dict[str, Any]:
+        stats = self._tools.get(tool)
+        if stats is None:
+            stats = self._tools[tool] = {
+                "calls": 0, "errors": 0, "retries": 0, "coalesced": 0, "in_flight": 0, "peak_in_flight": 0,
+                "prompt_tokens": 0, "output_tokens": 0, "latency": LatencyStats(),
+            }
+        return stats
+
+    def started(self, tool: str):
+        with self._lock:
+            stats = self._stats(tool)
+            stats["in_flight"] += 1
+            stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+
+    def finished(self, tool: str, seconds: float, prompt_tokens: int = 0, output_tokens: int = 0,
+                 error: bool = False):
+        with self._lock:
+            stats = self._stats(tool)
+            stats["in_flight"] -= 1
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["prompt_tokens"] += prompt_tokens
+            stats["output_tokens"] += output_tokens
+        stats["latency"].record(seconds)
+
+    def retried(self, tool: str):
+        with self._lock:
+            self._stats(tool)["retries"] += 1
+
+    def coalesced(self, tool: str):
+        with self._lock:
+            self._stats(tool)["coalesced"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            tools = {tool: dict(stats) for tool, stats in self._tools.items()}
+        for stats in tools.values():
+            stats["latency"] = stats["latency"].snapshot()
+        return tools
+
+
+llm_metrics = LLMMetrics()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)."""
+    return len(text) // 4
+
+
+def get_api_key() -> Optional[str]:
+    """Gemini API key from the environment, or from backend/config.env."""
+    api_key = os.getenv("GEMINI_API_KEY")
+    if api_key:
+        return api_key
+
+    config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config.env")
+    if os.path.exists(config_path):
+        with open(config_path, "r") as f:
+            for line in f:
+                if line.startswith("GEMINI_API_KEY="):
+                    return line.split("=", 1)[1].strip() or None
+    return None
+
+
+class LLMGateway:
+    """Long-lived LLM client shared by all tools, with concurrency limits."""
+
+    def __init__(self, provider: LLMProvider, max_concurrency: int, tool_concurrency: Optional[Dict[str, float]] = None,
+                 rate_limiter: Optional[RateLimiter] = None, circuit_breaker: Optional[CircuitBreaker] = None,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 coalesce: bool = True):
+        self.provider = provider
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.coalesce = coalesce
+        self.single_flight = SingleFlight()
+        self.max_concurrency = max(1, max_concurrency)
+        self.tool_concurrency = {tool: max(1, int(limit)) for tool, limit in (tool_concurrency or {}).items()}
+        self._token_counts = TTLCache(max_size=1024, ttl=3600.0)
+        # asyncio semaphores belong to one event loop; keep a set per loop
+        self._semaphores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    def _limits(self, tool: str):
+        loop = asyncio.get_running_loop()
+        semaphores = self._semaphores.get(loop)
+        if semaphores is None:
+            semaphores = self._semaphores[loop] = {None: asyncio.Semaphore(self.max_concurrency)}
+        if tool in self.tool_concurrency and tool not in semaphores:
+            semaphores[tool] = asyncio.Semaphore(self.tool_concurrency[tool])
+        return semaphores[None], semaphores.get(tool)
+
+    async def generate(self, prompt: str, tool: str, model: str,
+                       generation_config: Optional[Dict[str, Any]] = None) -> LLMResult:
+        """
+        Generate content for a prompt.
+
+        Waits for its turn under the rate limits and for a free slot under
+        the global and per-tool concurrency limits. 429s and transient
+        errors are retried with backoff; other API errors are re-raised
+        unchanged. If an identical call is already in flight, waits for
+        its result instead of sending another request.
+
+        Args:
+            prompt: Prompt text
+            tool: Calling tool, for its concurrency limit and metrics
+            model: Model name
+            generation_config: Optional Gemini generation config
+
+        Returns:
+            LLMResult with the response text and token usage
+            
+        Raises:
+            CircuitOpen: While calls are failing fast after repeated quota errors
+            RateLimitExceeded: If the call would have to queue longer than LLM_MAX_QUEUE_SECONDS
+        """
+        if not self.coalesce:
+            return await self._generate_with_retries(prompt, tool, model, generation_config)
+        
+        key = hashlib.sha256(
+            json.dumps([model, prompt, generation_config], sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+        if self.single_flight.is_in_flight(key):
+            llm_metrics.coalesced(tool)
+        return await self.single_flight.do(
+            key, lambda: self._generate_with_retries(prompt, tool, model, generation_config)
+        )
+
+    async def _generate_with_retries(self, prompt: str, tool: str, model: str,
+                                     generation_config: Optional[Dict[str, Any]]) -> LLMResult:
+        attempt = 0
+        while True:
+            reserved = estimate_tokens(prompt)
+            await self._admit(reserved)
+            
+            try:
+                result = await self._generate_limited(prompt, tool, model, generation_config)
+            except asyncio.CancelledError:
+                self.circuit_breaker.release()
+                raise
+            except Exception as e:
+                quota_error = is_quota_error(e)
+                if quota_error:
+                    self.circuit_breaker.record_failure()
+                else:
+                    # Any other answer from the API shows the quota isn't exhausted
+                    self.circuit_breaker.record_success()
+                if attempt >= self.max_retries or not (quota_error or is_transient_error(e)):
+                    raise
+                
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                attempt += 1
+                llm_metrics.retried(tool)
+                logger.warning(f"LLM call failed ({e}); retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            
+            self.circuit_breaker.record_success()
+            self.rate_limiter.settle(reserved, result.prompt_tokens + result.output_tokens)
+            return result
+
+    async def _admit(self, reserved: int):
+        """
+        Pass the circuit breaker and wait for the rate budget of one call.
+
+        If the call is not going to be sent (the budget is exceeded or the
+        caller is cancelled while queued), the breaker's half-open trial and
+        the reservation are given back.
+        """
+        self.circuit_breaker.allow()
+        try:
+            # Refunds its own reservation when it raises RateLimitExceeded
+            wait = self.rate_limiter.reserve(reserved)
+        except BaseException:
+            self.circuit_breaker.release()
+            raise
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except BaseException:
+                self.rate_limiter.release(reserved)
+                self.circuit_breaker.release()
+                raise
+
+    async def _generate_limited(self, prompt: str, tool: str, model: str,
+                                generation_config: Optional[Dict[str, Any]]) -> LLMResult:
+        global_limit, tool_limit = self._limits(tool)
+        # Per-tool slot first, so calls queued behind a busy tool don't hold global slots
+        if tool_limit is not None:
+            await tool_limit.acquire()
+        try:
+            async with global_limit:
+                return await self._generate(prompt, tool, model, generation_config)
+        finally:
+            if tool_limit is not None:
+                tool_limit.release()
+
+    async def _generate(self, prompt: str, tool: str, model: str,
+                        generation_config: Optional[Dict[str, Any]]) -> LLMResult:
+        llm_metrics.started(tool)
+        start_time = time.time()
+        try:
+            response = await self.provider.generate(prompt, model, generation_config)
+            text = response.text or ""
+        except BaseException:
+            llm_metrics.finished(tool, time.time() - start_time, error=True)
+            raise
+
+        latency = time.time() - start_time
+        prompt_tokens = response.prompt_tokens or estimate_tokens(prompt)
+        output_tokens = response.output_tokens or estimate_tokens(text)
+        llm_metrics.finished(tool, latency, prompt_tokens, output_tokens)
+        return LLMResult(text, model, int(prompt_tokens), int(output_tokens), latency)
+
+    async def stream(self, prompt: str, tool: str, model: str,
+                     generation_config: Optional[Dict[str, Any]] = None,
+                     usage: Optional[Dict[str, int]] = None) -> AsyncIterator[str]:
+        """
+        Generate content for a prompt, yielding text chunks as they arrive.
+        
+        Rate limits, concurrency limits and the circuit breaker apply as in
+        generate(). Errors are retried only before the first chunk, and
+        streamed calls are never coalesced. Closing the generator (e.g. when
+        the client disconnects) cancels the upstream call.
+        
+        Args:
+            prompt: Prompt text
+            tool: Calling tool, for its concurrency limit and metrics
+            model: Model name
+            generation_config: Optional Gemini generation config
+            usage: Optional dict filled with prompt_tokens and output_tokens when the stream ends
+        """
+        attempt = 0
+        while True:
+            reserved = estimate_tokens(prompt)
+            await self._admit(reserved)
+            
+            emitted = False
+            usage = {} if usage is None else usage
+            global_limit, tool_limit = self._limits(tool)
+            try:
+                if tool_limit is not None:
+                    await tool_limit.acquire()
+                try:
+                    async with global_limit:
+                        async for text in self._stream(prompt, tool, model, generation_config, usage):
+                            emitted = True
+                            yield text
+                finally:
+                    if tool_limit is not None:
+                        tool_limit.release()
+            except (GeneratorExit, asyncio.CancelledError):
+                self.circuit_breaker.release()
+                raise
+            except Exception as e:
+                quota_error = is_quota_error(e)
+                if quota_error:
+                    self.circuit_breaker.record_failure()
+                else:
+                    self.circuit_breaker.record_success()
+                if emitted or attempt >= self.max_retries or not (quota_error or is_transient_error(e)):
+                    raise
+                
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                attempt += 1
+                llm_metrics.retried(tool)
+                logger.warning(f"LLM stream failed ({e}); retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            
+            self.circuit_breaker.record_success()
+            self.rate_limiter.settle(reserved, usage.get("prompt_tokens", 0) + usage.get("output_tokens", 0))
+            return
+
+    async def _stream(self, prompt: str, tool: str, model: str, generation_config: Optional[Dict[str, Any]],
+                      usage: Dict[str, int]) -> AsyncIterator[str]:
+        llm_metrics.started(tool)
+        start_time = time.time()
+        output = []
+        chunks = self.provider.stream(prompt, model, generation_config, usage)
+        try:
+            async for text in chunks:
+                output.append(text)
+                yield text
+        except (GeneratorExit, asyncio.CancelledError):
+            # Closing the provider stream cancels the upstream request
+            await chunks.aclose()
+            llm_metrics.finished(tool, time.time() - start_time)
+            raise
+        except BaseException:
+            llm_metrics.finished(tool, time.time() - start_time, error=True)
+            raise
+        
+        usage["prompt_tokens"] = int(usage.get("prompt_tokens") or estimate_tokens(prompt))
+        usage["output_tokens"] = int(usage.get("output_tokens") or estimate_tokens("".join(output)))
+        llm_metrics.finished(tool, time.time() - start_time, usage["prompt_tokens"], usage["output_tokens"])
+
+    async def count_tokens(self, prompt: str, model: str) -> Optional[int]:
+        """
+        Exact prompt token count from the model's tokenizer (e.g. Gemini's countTokens API).
+        
+        Counts are cached by model and prompt. A count takes one request from
+        the rate budget and a global concurrency slot; it is skipped (the
+        caller falls back to its estimate) rather than queued when the budget
+        is used up, and while the circuit breaker is not closed.
+        
+        Returns:
+            Token count, or None if the count could not be obtained
+        """
+        key = hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+        tokens = self._token_counts.get(key)
+        if tokens is not None:
+            return tokens
+        
+        if self.circuit_breaker.state != CLOSED:
+            return None
+        try:
+            wait = self.rate_limiter.reserve(0)
+        except RateLimitExceeded:
+            return None
+        if wait > 0:
+            self.rate_limiter.release(0)
+            return None
+        
+        global_limit, _ = self._limits(None)
+        try:
+            async with global_limit:
+                tokens = int(await self.provider.count_tokens(prompt, model))
+        except Exception as e:
+            if is_quota_error(e):
+                self.circuit_breaker.record_failure()
+            logger.warning(f"Token counting failed, using the estimate: {e}")
+            return None
+        
+        self._token_counts.set(key, tokens)
+        return tokens
+
+    def list_models(self) -> List[str]:
+        """Names of the models available to the configured API key."""
+        return self.provider.list_models()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "tool_concurrency": self.tool_concurrency,
+            "provider": self.provider.stats(),
+            "rate_limiter": self.rate_limiter.stats(),
+            "circuit_breaker": self.circuit_breaker.stats(),
+            "single_flight": self.single_flight.stats(),
+            "tools": llm_metrics.snapshot(),
+        }
+
+
+# Global instance for reuse
+_llm_gateway: Optional[LLMGateway] = None
+_llm_gateway_lock = threading.Lock()
+
+
+def create_provider() -> LLMProvider:
+    """
+    Provider selected by LLM_PROVIDER: "gemini" (default) or "mock".
+
+    Raises:
+        LLMUnavailable: If Gemini is selected and the client package or API key is missing
+    """
+    if settings.LLM_PROVIDER == "mock":
+        return MockProvider(
+            latency=settings.LLM_MOCK_LATENCY_MS / 1000,
+            jitter=settings.LLM_MOCK_JITTER_MS / 1000,
+            distribution=settings.LLM_MOCK_LATENCY_DISTRIBUTION,
+            tokens_per_second=settings.LLM_MOCK_TOKENS_PER_SECOND,
+            error_rate=settings.LLM_MOCK_ERROR_RATE,
+            server_error_rate=settings.LLM_MOCK_SERVER_ERROR_RATE,
+            seed=settings.LLM_MOCK_SEED
+        )
+    if settings.LLM_PROVIDER != "gemini":
+        raise LLMUnavailable(f"Unknown LLM provider '{settings.LLM_PROVIDER}'")
+    
+    api_key = get_api_key()
+    if not api_key:
+        raise LLMUnavailable("Gemini API key not configured")
+    return GeminiProvider(api_key, endpoint=settings.GEMINI_API_ENDPOINT, transport=settings.GEMINI_TRANSPORT)
+
+
+def get_llm_gateway() -> LLMGateway:
+    """
+    Get or create the global LLM gateway.
+
+    Raises:
+        LLMUnavailable: If the provider can't be created (e.g. the Gemini API key is missing)
+    """
+    global _llm_gateway
+    if _llm_gateway is None:
+        with _llm_gateway_lock:
+            if _llm_gateway is None:
+                _llm_gateway = LLMGateway(
+                    create_provider(),
+                    settings.LLM_MAX_CONCURRENCY,
+                    settings.LLM_TOOL_CONCURRENCY,
+                    rate_limiter=RateLimiter(settings.LLM_RPM, settings.LLM_TPM, settings.LLM_MAX_QUEUE_SECONDS),
+                    circuit_breaker=CircuitBreaker(settings.LLM_CIRCUIT_THRESHOLD, settings.LLM_CIRCUIT_RESET_SECONDS),
+                    max_retries=settings.LLM_MAX_RETRIES,
+                    backoff_base=settings.LLM_BACKOFF_BASE,
+                    backoff_max=settings.LLM_BACKOFF_MAX,
+                    coalesce=settings.LLM_COALESCE
+                )
+    return _llm_gateway
+
+
+def llm_stats() -> Dict[str, Any]:
+    """Gateway statistics, or just the per-tool call metrics if the gateway isn't created yet."""
+    if _llm_gateway is not None:
+        return _llm_gateway.stats()
+    return {"tools": llm_metrics.snapshot()}
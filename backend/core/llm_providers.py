@@ -0,0 +1,365 @@
+"""
+LLM providers: the model APIs behind the gateway.
+
+A provider sends single requests to a model API; the gateway (core.llm)
+adds concurrency limits, rate limiting, retries, coalescing and metrics
+on top. GeminiProvider calls Google's Gemini API. MockProvider answers
+locally with deterministic canned text after a configurable latency,
+paced by a token throughput, with injected quota and server errors, so
+the backend can be load-tested and benchmarked without network access.
+"""
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from core.dependencies import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    import google.generativeai as genai
+    from google.api_core import exceptions as api_exceptions
+    GEMINI_AVAILABLE = True
+    QUOTA_ERRORS = (api_exceptions.TooManyRequests, api_exceptions.ResourceExhausted)
+    TRANSIENT_ERRORS = (
+        api_exceptions.InternalServerError, api_exceptions.BadGateway, api_exceptions.ServiceUnavailable,
+        api_exceptions.GatewayTimeout, api_exceptions.DeadlineExceeded, ConnectionError, TimeoutError,
+    )
+except ImportError:
+    logger.warning("google-generativeai not available, Gemini features are disabled")
+    GEMINI_AVAILABLE = False
+    QUOTA_ERRORS = ()
+    TRANSIENT_ERRORS = (ConnectionError, TimeoutError)
+
+LATENCY_DISTRIBUTIONS = ("fixed", "normal", "lognormal", "exponential")
+
+
+class LLMUnavailable(Exception):
+    """The LLM client package or API key is missing."""
+
+
+class ProviderResponse:
+    """Text of one call, with its token usage when the API reports it."""
+
+    def __init__(self, text: str, prompt_tokens: Optional[int] = None, output_tokens: Optional[int] = None):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.output_tokens = output_tokens
+
+
+class LLMProvider(ABC):
+    """A model API. Subclasses implement generate, stream, count_tokens and list_models."""
+
+    name = "base"
+
+    @abstractmethod
+    async def generate(self, prompt: str, model: str,
+                       generation_config: Optional[Dict[str, Any]] = None) -> ProviderResponse:
+        """Generate content for a prompt in one request."""
+
+    @abstractmethod
+    def stream(self, prompt: str, model: str, generation_config: Optional[Dict[str, Any]] = None,
+               usage: Optional[Dict[str, int]] = None) -> AsyncIterator[str]:
+        """
+        Async generator of the text chunks of a response, as they arrive.
+
+        Fills usage with prompt_tokens and output_tokens when the API reports
+        them. Closing the generator cancels the request.
+        """
+
+    @abstractmethod
+    async def count_tokens(self, prompt: str, model: str) -> int:
+        """Exact prompt token count from the model's tokenizer."""
+
+    @abstractmethod
+    def list_models(self) -> List[str]:
+        """Names of the available models."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name}
+
+
+class GeminiProvider(LLMProvider):
+    """Google's Gemini API through google-generativeai, with model clients reused across calls."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, endpoint: Optional[str] = None, transport: Optional[str] = None):
+        if not GEMINI_AVAILABLE:
+            raise LLMUnavailable("google-generativeai package is not installed")
+        # A custom endpoint (e.g. the local fake server) is reached over REST
+        self.transport = transport or ("rest" if endpoint else None)
+        genai.configure(
+            api_key=api_key,
+            transport=self.transport,
+            client_options={"api_endpoint": endpoint} if endpoint else None
+        )
+        self.endpoint = endpoint
+        self._models: Dict[str, Any] = {}
+        self._models_lock = threading.Lock()
+
+    def model(self, name: str):
+        """Cached GenerativeModel for a model name; its client connection is reused across calls."""
+        model = self._models.get(name)
+        if model is None:
+            with self._models_lock:
+                model = self._models.get(name)
+                if model is None:
+                    model = self._models[name] = genai.GenerativeModel(name)
+        return model
+
+    async def generate(self, prompt: str, model: str,
+                       generation_config: Optional[Dict[str, Any]] = None) -> ProviderResponse:
+        if self.transport == "rest":
+            # google-generativeai's async API doesn't support the REST transport
+            response = await asyncio.to_thread(
+                self.model(model).generate_content, prompt, generation_config=generation_config
+            )
+        else:
+            response = await self.model(model).generate_content_async(prompt, generation_config=generation_config)
+        metadata = getattr(response, "usage_metadata", None)
+        return ProviderResponse(
+            response.text or "",
+            getattr(metadata, "prompt_token_count", None),
+            getattr(metadata, "candidates_token_count", None)
+        )
+
+    async def stream(self, prompt: str, model: str, generation_config: Optional[Dict[str, Any]] = None,
+                     usage: Optional[Dict[str, int]] = None) -> AsyncIterator[str]:
+        usage = {} if usage is None else usage
+        response = None
+        last = None
+        try:
+            if self.transport == "rest":
+                # Read the sync stream in a worker thread
+                response = await asyncio.to_thread(
+                    self.model(model).generate_content, prompt, generation_config=generation_config, stream=True
+                )
+                chunks = iter(response)
+                while True:
+                    chunk = await asyncio.to_thread(next, chunks, None)
+                    if chunk is None:
+                        break
+                    last = chunk
+                    if chunk.text:
+                        yield chunk.text
+            else:
+                response = await self.model(model).generate_content_async(
+                    prompt, generation_config=generation_config, stream=True
+                )
+                async for chunk in response:
+                    last = chunk
+                    if chunk.text:
+                        yield chunk.text
+        except (GeneratorExit, asyncio.CancelledError):
+            _cancel_stream(response)
+            raise
+
+        metadata = getattr(last, "usage_metadata", None)
+        if getattr(metadata, "prompt_token_count", None):
+            usage["prompt_tokens"] = int(metadata.prompt_token_count)
+        if getattr(metadata, "candidates_token_count", None):
+            usage["output_tokens"] = int(metadata.candidates_token_count)
+
+    async def count_tokens(self, prompt: str, model: str) -> int:
+        if self.transport == "rest":
+            response = await asyncio.to_thread(self.model(model).count_tokens, prompt)
+        else:
+            response = await self.model(model).count_tokens_async(prompt)
+        return int(response.total_tokens)
+
+    def list_models(self) -> List[str]:
+        return [model.name for model in genai.list_models()]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name, "endpoint": self.endpoint, "models": sorted(self._models)}
+
+
+def _cancel_stream(response):
+    """Best-effort cancel of the upstream request behind a streamed response."""
+    iterator = getattr(response, "_iterator", None)
+    for method in ("cancel", "close"):
+        stop = getattr(iterator, method, None)
+        if callable(stop):
+            try:
+                stop()
+            except Exception as e:
+                logger.debug(f"Failed to {method} LLM stream: {e}")
+            return
+
+
+class MockQuotaError(Exception):
+    """Injected 429 from the mock provider."""
+
+
+class MockServiceUnavailable(ConnectionError):
+    """Injected 503 from the mock provider."""
+
+
+def mock_token_count(text: str) -> int:
+    """Words and punctuation marks, roughly what a subword tokenizer counts."""
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+def _schema_value(schema: Dict[str, Any], words: List[str], index: int = 0) -> Any:
+    """Deterministic value matching a (Gemini-style) JSON schema."""
+    kind = str(schema.get("type", "string")).lower()
+    if kind == "object":
+        return {
+            name: _schema_value(prop, words, index + position)
+            for position, (name, prop) in enumerate(schema.get("properties", {}).items())
+        }
+    if kind == "array":
+        count = int(schema.get("min_items") or 5)
+        return [_schema_value(schema.get("items", {}), words, index + item) for item in range(count)]
+    if kind in ("integer", "number"):
+        return index
+    if kind == "boolean":
+        return True
+    start = (index * 7) % max(1, len(words))
+    return " ".join(words[start:start + 12]) or "empty prompt"
+
+
+def canned_text(prompt: str, json_mode: bool = False, schema: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Deterministic response text for a prompt, built from its last words.
+
+    In JSON mode the response follows the schema if one is given, and is
+    otherwise an analysis object (summary, key points, questions).
+    """
+    words = re.findall(r"[A-Za-z]+", prompt)[-40:]
+    sentence = " ".join(words[:25]) or "empty prompt"
+    if json_mode and schema:
+        return json.dumps(_schema_value(schema, words))
+    if json_mode:
+        return json.dumps({
+            "summary": f"Summary: {sentence}.",
+            "key_points": [f"Point about {word}" for word in words[:5]],
+            "questions": [f"What about {word}?" for word in words[5:10]],
+        })
+    return f"Rewritten: {sentence}."
+
+
+class MockProvider(LLMProvider):
+    """
+    Local stand-in for a model API, for load tests and benchmarks.
+
+    Each call waits a time to first token drawn from the latency
+    distribution, then the output is produced at tokens_per_second.
+    Responses are canned and depend only on the prompt; latencies and
+    injected errors come from a seeded random generator.
+    """
+
+    name = "mock"
+
+    def __init__(self, latency: float = 0.3, jitter: float = 0.1, distribution: str = "lognormal",
+                 tokens_per_second: float = 200.0, error_rate: float = 0.0, server_error_rate: float = 0.0,
+                 seed: int = 0):
+        """
+        Args:
+            latency: Mean time to first token in seconds
+            jitter: Standard deviation of the time to first token (normal and lognormal)
+            distribution: fixed, normal, lognormal or exponential
+            tokens_per_second: Output token throughput (0: instant)
+            error_rate: Fraction of calls failing with a 429 quota error
+            server_error_rate: Fraction of calls failing with a 503
+            seed: Seed of the latency and error generator
+        """
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{distribution}', expected one of {LATENCY_DISTRIBUTIONS}")
+        self.latency = latency
+        self.jitter = jitter
+        self.distribution = distribution
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.server_error_rate = server_error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {"calls": 0, "streams": 0, "quota_errors": 0, "server_errors": 0, "output_tokens": 0}
+
+    def _first_token_delay(self) -> float:
+        with self._lock:
+            if self.distribution == "fixed" or self.latency <= 0:
+                return max(0.0, self.latency)
+            if self.distribution == "normal":
+                return max(0.0, self._random.gauss(self.latency, self.jitter))
+            if self.distribution == "exponential":
+                return self._random.expovariate(1 / self.latency)
+            # Lognormal with the configured mean and standard deviation
+            sigma = math.sqrt(math.log(1 + (self.jitter / self.latency) ** 2))
+            return self._random.lognormvariate(math.log(self.latency) - sigma ** 2 / 2, sigma)
+
+    def _admit(self, counter: str):
+        """Count a call and raise an injected error for it, if it draws one."""
+        with self._lock:
+            self.counts[counter] += 1
+            roll = self._random.random()
+            if roll < self.error_rate:
+                self.counts["quota_errors"] += 1
+                raise MockQuotaError("429 Resource has been exhausted (e.g. check quota). [mock]")
+            if roll < self.error_rate + self.server_error_rate:
+                self.counts["server_errors"] += 1
+                raise MockServiceUnavailable("503 The model is overloaded. Please try again later. [mock]")
+
+    def _output_delay(self, tokens: int) -> float:
+        return tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _respond(self, prompt: str, generation_config: Optional[Dict[str, Any]]) -> str:
+        config = generation_config or {}
+        return canned_text(
+            prompt, config.get("response_mime_type") == "application/json", config.get("response_schema")
+        )
+
+    async def generate(self, prompt: str, model: str,
+                       generation_config: Optional[Dict[str, Any]] = None) -> ProviderResponse:
+        await asyncio.sleep(self._first_token_delay())
+        self._admit("calls")
+        text = self._respond(prompt, generation_config)
+        output_tokens = mock_token_count(text)
+        await asyncio.sleep(self._output_delay(output_tokens))
+        with self._lock:
+            self.counts["output_tokens"] += output_tokens
+        return ProviderResponse(text, mock_token_count(prompt), output_tokens)
+
+    async def stream(self, prompt: str, model: str, generation_config: Optional[Dict[str, Any]] = None,
+                     usage: Optional[Dict[str, int]] = None) -> AsyncIterator[str]:
+        usage = {} if usage is None else usage
+        await asyncio.sleep(self._first_token_delay())
+        self._admit("streams")
+        words = self._respond(prompt, generation_config).split(" ")
+        output_tokens = 0
+        for start in range(0, len(words), 4):
+            chunk = " ".join(words[start:start + 4]) + (" " if start + 4 < len(words) else "")
+            tokens = mock_token_count(chunk)
+            await asyncio.sleep(self._output_delay(tokens))
+            output_tokens += tokens
+            yield chunk
+        with self._lock:
+            self.counts["output_tokens"] += output_tokens
+        usage["prompt_tokens"] = mock_token_count(prompt)
+        usage["output_tokens"] = output_tokens
+
+    async def count_tokens(self, prompt: str, model: str) -> int:
+        return mock_token_count(prompt)
+
+    def list_models(self) -> List[str]:
+        return ["models/gemini-1.5-flash", "models/gemini-2.5-flash"]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self.counts)
+        return {
+            "name": self.name,
+            "latency_s": self.latency,
+            "jitter_s": self.jitter,
+            "distribution": self.distribution,
+            "tokens_per_second": self.tokens_per_second,
+            "error_rate": self.error_rate,
+            "server_error_rate": self.server_error_rate,
+            **counts,
+        }
@@ -0,0 +1,45 @@
+"""
+Lightweight in-process metrics shared by the tools.
+"""
+import math
+import threading
+from collections import deque
+from typing import Dict
+
+
+class LatencyStats:
+    """Rolling window of latencies with mean and percentile summaries."""
+
+    def __init__(self, window: int = 1000):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, seconds: float):
+        """Record one latency sample in seconds."""
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        """Summary of the current window (latencies in milliseconds)."""
+        with self._lock:
+            samples = sorted(self._samples)
+
+        if not samples:
+            return {"count": self.count, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+
+        return {
+            "count": self.count,
+            "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+            "p50_ms": round(_percentile(samples, 0.50) * 1000, 3),
+            "p95_ms": round(_percentile(samples, 0.95) * 1000, 3),
+            "p99_ms": round(_percentile(samples, 0.99) * 1000, 3),
+            "max_ms": round(samples[-1] * 1000, 3),
+        }
+
+
+def _percentile(sorted_samples: list, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, math.ceil(q * len(sorted_samples)))
+    return sorted_samples[rank - 1]
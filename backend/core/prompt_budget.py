@@ -0,0 +1,210 @@
+"""
+Token budgets for LLM prompts.
+
+A prompt is made of fixed instructions, document context and (for chat)
+conversation history. When it would exceed the budget, the context and
+history are trimmed deterministically to their share of what the
+instructions leave: whitespace is collapsed first, then the middle of the
+context is cut (keeping its beginning and end) and the oldest history
+lines are dropped. Tokens are estimated locally; prompts close to the
+budget are counted exactly by the model's tokenizer when a counter is
+available.
+"""
+import re
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from core.dependencies import get_logger
+from core.llm import estimate_tokens
+
+logger = get_logger(__name__)
+
+OMISSION = "\n[... {words} words omitted ...]\n"
+# Characters kept free for the omission marker
+_OMISSION_CHARS = 48
+
+
+def compact_whitespace(text: str) -> str:
+    """Collapse runs of spaces and blank lines."""
+    text = re.sub(r"[ \t\f\v\r]+", " ", text)
+    return re.sub(r" ?\n[\n ]*\n ?", "\n\n", text).strip()
+
+
+def trim_text(text: str, max_tokens: int) -> str:
+    """
+    Fit text into max_tokens (estimated).
+
+    Whitespace is collapsed first; if that isn't enough, the middle of the
+    text is replaced by an omission marker, keeping the first two thirds and
+    the last third of the budget, cut at word boundaries.
+
+    Args:
+        text: Text to trim
+        max_tokens: Token budget
+
+    Returns:
+        The text, unchanged if it already fits
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    text = compact_whitespace(text)
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    budget = max_tokens * 4 - _OMISSION_CHARS
+    if budget <= 0:
+        return text[:max(0, max_tokens * 4)]
+
+    head = text[:budget * 2 // 3]
+    tail = text[len(text) - (budget - len(head)):]
+    if " " in head:
+        head = head[:head.rfind(" ")]
+    if " " in tail:
+        tail = tail[tail.find(" ") + 1:]
+    omitted = len(text[len(head):len(text) - len(tail)].split())
+    return head.rstrip() + OMISSION.format(words=omitted) + tail.lstrip()
+
+
+def trim_history(lines: List[str], max_tokens: int) -> Tuple[List[str], int]:
+    """
+    Keep the most recent history lines that fit into max_tokens (estimated).
+
+    The latest line is always kept, trimmed if it alone exceeds the budget.
+
+    Returns:
+        Tuple of (kept lines in order, number of older lines dropped)
+    """
+    kept = []
+    used = 0
+    for line in reversed(lines):
+        tokens = estimate_tokens(line) + 1
+        if kept and used + tokens > max_tokens:
+            break
+        if not kept and tokens > max_tokens:
+            line = trim_text(line, max_tokens - 1)
+            tokens = max_tokens
+        kept.append(line)
+        used += tokens
+    kept.reverse()
+    return kept, len(lines) - len(kept)
+
+
+class BudgetedPrompt:
+    """A prompt fitted into its budget, with the parts used and the token breakdown."""
+
+    def __init__(self, prompt: str, context: str, history: List[str], breakdown: Dict[str, Any]):
+        self.prompt = prompt
+        self.context = context
+        self.history = history
+        self.breakdown = breakdown
+
+
+class PromptBudget:
+    """Fits prompts into a token budget shared by instructions, document context and history."""
+
+    def __init__(self, max_tokens: int, history_share: float = 0.25,
+                 counter: Optional[Callable[[str], Awaitable[Optional[int]]]] = None,
+                 exact_margin: float = 0.1):
+        """
+        Args:
+            max_tokens: Input token budget per prompt
+            history_share: Share of the budget left after the instructions that is kept for history
+            counter: Optional exact token counter (returns None when it can't count)
+            exact_margin: Prompts estimated above (1 - exact_margin) * max_tokens are counted exactly
+        """
+        self.max_tokens = max_tokens
+        self.history_share = min(1.0, max(0.0, history_share))
+        self.counter = counter
+        self.exact_margin = exact_margin
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.trimmed = 0
+        self.exact_counts = 0
+
+    async def _count(self, prompt: str, exact: bool) -> Tuple[int, bool]:
+        if exact and self.counter is not None:
+            tokens = await self.counter(prompt)
+            if tokens is not None:
+                with self._lock:
+                    self.exact_counts += 1
+                return tokens, True
+        return estimate_tokens(prompt), False
+
+    async def fit(self, render: Callable[[str, str], str], context: str = "",
+                  history: Optional[List[str]] = None, label: str = "prompt") -> BudgetedPrompt:
+        """
+        Build a prompt within the budget.
+
+        Args:
+            render: Builds the prompt from (context, history text)
+            context: Document context
+            history: Conversation history lines, oldest first
+            label: Name of the prompt in the log
+
+        Returns:
+            BudgetedPrompt with the prompt text and its token breakdown
+        """
+        history = list(history or [])
+        kept = history
+        trimmed_context = context
+        prompt = render(context, "\n".join(history))
+
+        instructions_tokens = estimate_tokens(render("", ""))
+        context_tokens = estimate_tokens(context)
+        history_tokens = estimate_tokens("\n".join(history))
+
+        near_budget = estimate_tokens(prompt) > self.max_tokens * (1 - self.exact_margin)
+        total, exact = await self._count(prompt, near_budget)
+
+        # Trim to the estimated allocation; if the exact count still exceeds the
+        # budget, shrink the allocation by the overshoot and trim again
+        scale = 1.0
+        trimmed = False
+        for _ in range(3):
+            if total <= self.max_tokens:
+                break
+            if trimmed:
+                scale *= self.max_tokens / total * 0.98
+            trimmed = True
+            available = max(0, int(self.max_tokens * scale) - instructions_tokens)
+            history_budget = min(history_tokens, max(int(available * self.history_share), available - context_tokens))
+            trimmed_context = trim_text(context, available - history_budget)
+            kept, _ = trim_history(history, history_budget) if history else ([], 0)
+            prompt = render(trimmed_context, "\n".join(kept))
+            total, exact = await self._count(prompt, exact)
+
+        with self._lock:
+            self.prompts += 1
+            self.trimmed += int(trimmed)
+
+        breakdown = {
+            "budget": self.max_tokens,
+            "total": total,
+            "exact": exact,
+            "instructions": instructions_tokens,
+            "context": estimate_tokens(trimmed_context),
+            "history": estimate_tokens("\n".join(kept)),
+            "context_trimmed": context_tokens - estimate_tokens(trimmed_context),
+            "history_dropped": len(history) - len(kept),
+        }
+        message = (f"{label}: {total} tokens{' (exact)' if exact else ''} of {self.max_tokens} "
+                   f"(instructions {breakdown['instructions']}, context {breakdown['context']}, "
+                   f"history {breakdown['history']})")
+        if trimmed:
+            message += (f"; trimmed {breakdown['context_trimmed']} context tokens, "
+                        f"dropped {breakdown['history_dropped']} history lines")
+        if total > self.max_tokens:
+            logger.warning(f"Prompt over budget after trimming, {message}")
+        else:
+            logger.info(f"Prompt budget {message}")
+
+        return BudgetedPrompt(prompt, trimmed_context, kept, breakdown)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_tokens": self.max_tokens,
+            "history_share": self.history_share,
+            "prompts": self.prompts,
+            "trimmed": self.trimmed,
+            "exact_counts": self.exact_counts,
+        }
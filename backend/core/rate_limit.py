@@ -0,0 +1,208 @@
+"""
+Client-side rate limiting, retry backoff and circuit breaking for outbound API calls.
+
+Token buckets hand out reservations that may go into debt, so callers
+beyond the budget are queued (they sleep until their turn) in arrival
+order instead of failing. The circuit breaker fails calls fast after
+repeated quota errors, until a cool-down has passed.
+"""
+import random
+import threading
+import time
+from typing import Dict, Any, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class RateLimitExceeded(Exception):
+    """A call would have to wait longer than the allowed queueing time."""
+
+
+class CircuitOpen(Exception):
+    """Calls are failing fast after repeated quota errors."""
+
+
+class TokenBucket:
+    """Token bucket holding up to `capacity` tokens, refilled evenly over `period` seconds."""
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take tokens, going into debt if there aren't enough.
+
+        Returns:
+            Seconds to wait before the reserved tokens are actually available
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= min(amount, self.capacity)
+            return max(0.0, -self._tokens / self.rate)
+
+    def refund(self, amount: float):
+        """Give back tokens (e.g. a reservation that was not used, or an overestimate)."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute budgets (0 disables a budget)."""
+
+    def __init__(self, rpm: int = 0, tpm: int = 0, max_wait: float = 60.0):
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.rejected = 0
+        self.waited_seconds = 0.0
+        self.max_waited = 0.0
+
+    def reserve(self, tokens: int) -> float:
+        """
+        Reserve one request and an estimated number of tokens.
+
+        Returns:
+            Seconds the caller must wait before sending the request
+
+        Raises:
+            RateLimitExceeded: If the wait would exceed max_wait
+        """
+        wait = 0.0
+        if self.requests is not None:
+            wait = self.requests.reserve(1)
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(tokens))
+
+        if wait > self.max_wait:
+            self.release(tokens)
+            with self._lock:
+                self.rejected += 1
+            raise RateLimitExceeded(f"Rate limit exceeded: request would wait {wait:.1f}s for quota")
+
+        if wait > 0:
+            with self._lock:
+                self.queued += 1
+                self.waited_seconds += wait
+                self.max_waited = max(self.max_waited, wait)
+        return wait
+
+    def release(self, tokens: int):
+        """Return a reservation for a request that was not sent."""
+        if self.requests is not None:
+            self.requests.refund(1)
+        if self.tokens is not None:
+            self.tokens.refund(tokens)
+
+    def settle(self, reserved: int, actual: int):
+        """Correct the token budget once the real usage of a request is known."""
+        if self.tokens is None or actual == reserved:
+            return
+        if actual < reserved:
+            self.tokens.refund(reserved - actual)
+        else:
+            self.tokens.reserve(actual - reserved)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rpm": int(self.requests.capacity) if self.requests else None,
+            "tpm": int(self.tokens.capacity) if self.tokens else None,
+            "requests_available": round(self.requests.available, 2) if self.requests else None,
+            "tokens_available": round(self.tokens.available) if self.tokens else None,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "mean_wait_s": round(self.waited_seconds / self.queued, 3) if self.queued else 0.0,
+            "max_wait_s": round(self.max_waited, 3),
+        }
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds; then lets one trial call through (half-open),
+    closing again if it succeeds.
+    """
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.opens = 0
+        self.rejected = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Check whether a call may proceed.
+
+        Raises:
+            CircuitOpen: While the circuit is open, or a half-open trial call is already running
+        """
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+            if self.state == CLOSED:
+                return
+            if self.state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return
+            self.rejected += 1
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+        raise CircuitOpen(f"API quota exceeded; failing fast for {retry_in:.0f}s before retrying")
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def release(self):
+        """Forget a call that was abandoned (e.g. cancelled) before its outcome was known."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == HALF_OPEN or self.failures >= self.threshold:
+                if self.state != OPEN:
+                    self.opens += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "opens": self.opens,
+                "rejected": self.rejected,
+            }
+
+
+def backoff_delay(attempt: int, base: float = 0.5, maximum: float = 8.0) -> float:
+    """Full-jitter exponential backoff: a random delay up to base * 2**attempt, capped at maximum."""
+    return random.uniform(0, min(maximum, base * (2 ** attempt)))
@@ -0,0 +1,73 @@
+"""
+Single-flight deduplication of identical concurrent async calls.
+
+The first caller for a key starts the work in its own task; callers with
+the same key that arrive while it is in flight wait for that task and get
+the same result (or exception). The task is cancelled only when every
+waiting caller has been cancelled.
+"""
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution."""
+
+    def __init__(self):
+        # Tasks belong to one event loop; keep in-flight calls per loop
+        self._flights: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn() for key, or join the call already in flight for key.
+
+        Returns:
+            The result of the shared call
+        """
+        loop = asyncio.get_running_loop()
+        flights: Dict[str, _Flight] = self._flights.setdefault(loop, {})
+        flight = flights.get(key)
+        if flight is None:
+            flight = flights[key] = _Flight(loop.create_task(fn()))
+            flight.task.add_done_callback(lambda _: flights.pop(key, None) if flights.get(key) is flight else None)
+            with self._lock:
+                self.leaders += 1
+        else:
+            with self._lock:
+                self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def is_in_flight(self, key: str) -> bool:
+        """Whether a call for key is in flight on the running event loop."""
+        flights = self._flights.get(asyncio.get_running_loop())
+        return bool(flights) and key in flights
+
+    def stats(self) -> Dict[str, Any]:
+        in_flight = sum(len(flights) for flights in list(self._flights.values()))
+        calls = self.leaders + self.coalesced
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_fraction": round(self.coalesced / calls, 4) if calls else 0.0,
+            "in_flight": in_flight,
+        }
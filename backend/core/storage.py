@@ -0,0 +1,52 @@
+"""
+Atomic on-disk storage helpers shared by file-based caches.
+
+Writers stage data in a temp file in the destination directory and rename
+it into place with os.replace, so concurrent readers (including other
+uvicorn workers) only ever see complete files.
+"""
+import gzip
+import json
+import os
+import tempfile
+from typing import Any, Optional
+
+from core.dependencies import get_logger
+
+logger = get_logger(__name__)
+
+
+def write_json_gz_atomic(path: str, value: Any, compresslevel: int = 6):
+    """Write value as gzip-compressed JSON to path, atomically."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json.gz")
+    try:
+        with os.fdopen(fd, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=compresslevel, mtime=0) as f:
+                f.write(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def read_json_gz(path: str) -> Optional[Any]:
+    """Read a gzip-compressed JSON file, or None if it is missing or unreadable."""
+    try:
+        with gzip.open(path, "rb") as f:
+            return json.loads(f.read().decode("utf-8"))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Discarding unreadable file {path}: {e}")
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
@@ -0,0 +1,27 @@
+"""
+Helpers for streaming JSON events as NDJSON or Server-Sent Events.
+"""
+import json
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+
+STREAM_FORMATS = ("ndjson", "sse")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+# Keep proxies (nginx) from buffering the stream
+STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def stream_format(request: Request, requested: Optional[str] = None) -> str:
+    """Pick the stream format from an explicit choice or the Accept header (default NDJSON)."""
+    if requested in STREAM_FORMATS:
+        return requested
+    return "sse" if "text/event-stream" in request.headers.get("accept", "") else "ndjson"
+
+
+def format_event(event: Dict[str, Any], fmt: str) -> str:
+    """Serialize one event; SSE uses the event's "type" as the event name."""
+    data = json.dumps(event, ensure_ascii=False)
+    if fmt == "sse":
+        return f"event: {event.get('type', 'message')}\ndata: {data}\n\n"
+    return data + "\n"
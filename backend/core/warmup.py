@@ -0,0 +1,149 @@
+"""
+Background model warmup and readiness tracking.
+
+Heavyweight models (Stable Diffusion, the RoBERTa AI detector) take from
+seconds to minutes to load. The warmup manager loads them in background
+threads at startup, runs a dummy inference so the first real request does
+not pay for kernel compilation, and records per-model state for the
+readiness endpoint.
+"""
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Any
+
+from core.dependencies import get_logger
+
+logger = get_logger(__name__)
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class ModelWarmup:
+    """State of a single registered model."""
+
+    def __init__(self, name: str, loader: Callable[[], Any], warmup: Optional[Callable[[Any], Any]] = None):
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.state = PENDING
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.load_time: Optional[float] = None
+        self.warmup_time: Optional[float] = None
+        self.done = threading.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "error": self.error,
+            "load_time": round(self.load_time, 3) if self.load_time is not None else None,
+            "warmup_time": round(self.warmup_time, 3) if self.warmup_time is not None else None,
+            "elapsed": round(time.time() - self.started_at, 3) if self.started_at and not self.done.is_set() else None,
+        }
+
+
+class WarmupManager:
+    """Loads registered models in the background and tracks readiness."""
+
+    def __init__(self):
+        self._models: Dict[str, ModelWarmup] = {}
+        self._enabled: List[str] = []
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = threading.Event()
+
+    def register(self, name: str, loader: Callable[[], Any], warmup: Optional[Callable[[Any], Any]] = None):
+        """
+        Register a model for warmup.
+
+        Args:
+            name: Model name used in readiness output and configuration
+            loader: Callable that loads the model and returns it
+            warmup: Optional callable receiving the loaded model that runs a dummy inference
+        """
+        if name in self._enabled:
+            # Already warming up (or warmed up); keep its state
+            return
+        self._models[name] = ModelWarmup(name, loader, warmup)
+
+    def start(self, names: List[str]):
+        """Start background warmup for the given registered models (models already started are skipped)."""
+        for name in names:
+            if name not in self._models:
+                logger.warning(f"Unknown warmup model '{name}', skipping")
+                continue
+            if name in self._enabled:
+                continue
+            self._enabled.append(name)
+            self._tasks.append(asyncio.create_task(asyncio.to_thread(self._run, self._models[name])))
+
+    async def stop(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait up to timeout seconds for loads still in progress to finish.
+
+        Loads run in worker threads and can't be interrupted; models that
+        finish loading after stop() skip their warmup inference, and loads
+        still running after the timeout are logged and left to their threads.
+
+        Returns:
+            Whether all loads finished in time
+        """
+        self._stopping.set()
+        tasks, self._tasks = self._tasks, []
+        pending = [task for task in tasks if not task.done()]
+        if not pending:
+            return True
+
+        logger.info(f"Waiting up to {timeout}s for model warmup to finish...")
+        _, pending = await asyncio.wait(pending, timeout=timeout)
+        if pending:
+            running = [name for name in self._enabled if not self._models[name].done.is_set()]
+            logger.warning(f"Model warmup still running after {timeout}s: {', '.join(running)}")
+        return not pending
+
+    def _run(self, model: ModelWarmup):
+        model.state = LOADING
+        model.started_at = time.time()
+        logger.info(f"Warming up model '{model.name}'...")
+        try:
+            start_time = time.time()
+            loaded = model.loader()
+            model.load_time = time.time() - start_time
+
+            if model.warmup is not None and not self._stopping.is_set():
+                start_time = time.time()
+                model.warmup(loaded)
+                model.warmup_time = time.time() - start_time
+
+            model.state = READY
+            logger.info(f"Model '{model.name}' ready (load {model.load_time:.2f}s, warmup {model.warmup_time or 0:.2f}s)")
+        except Exception as e:
+            model.state = FAILED
+            model.error = str(e)
+            logger.error(f"Warmup of model '{model.name}' failed: {e}")
+        finally:
+            model.done.set()
+
+    def get_state(self, name: str) -> Optional[str]:
+        """Get the warmup state of a model, or None if it is not being warmed up."""
+        if name not in self._enabled:
+            return None
+        return self._models[name].state
+
+    def is_loading(self, name: str) -> bool:
+        """Whether the model is still being loaded by the warmup manager."""
+        return self.get_state(name) in (PENDING, LOADING)
+
+    def readiness(self) -> Dict[str, Any]:
+        """Per-model readiness report for all enabled models."""
+        models = {name: self._models[name].to_dict() for name in self._enabled}
+        return {
+            "ready": all(m["state"] == READY for m in models.values()),
+            "models": models,
+        }
+
+
+warmup_manager = WarmupManager()
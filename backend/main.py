@@ -2,6 +2,7 @@
 Main FastAPI application for AI Tools Backend.
 """
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 from contextlib import asynccontextmanager
@@ -12,9 +13,12 @@ load_dotenv("config.env")
 
 from core.config import settings
 from core.dependencies import get_logger
+from core.warmup import warmup_manager
 from tools.text_humanizer.router import router as text_humanizer_router
 from tools.pdf_summarizer.router import router as pdf_summarizer_router
 from tools.image_generator.router import router as image_generator_router
+from tools.text_humanizer import detection as text_humanizer_detection
+from tools.image_generator import router as image_generator
 
 logger = get_logger(__name__)
 
@@ -33,9 +37,18 @@ async def lifespan(app: FastAPI):
     logger.info("   ✅ PDF chat interface ready!")
     logger.info("🎨 Loading image generation systems...")
     logger.info("   ✅ Local CPU-based Stable Diffusion ready!")
-    logger.info("   ✅ Local model loading in progress...")
     logger.info("   ✅ Multiple style support ready!")
     
+    # Load heavyweight models in the background; /ready reports progress
+    warmup_manager.register(image_generator.WARMUP_NAME, image_generator.load_for_warmup, image_generator.warmup)
+    warmup_manager.register(
+        text_humanizer_detection.AI_DETECTOR_WARMUP_NAME,
+        text_humanizer_detection.load_ai_detector_for_warmup,
+        text_humanizer_detection.warmup_ai_detector
+    )
+    warmup_manager.start(settings.WARMUP_MODELS)
+    logger.info(f"🔥 Warming up models in background: {', '.join(settings.WARMUP_MODELS) or 'none'}")
+    
     logger.info(f"🌐 Backend will be available at: http://{settings.HOST}:{settings.PORT}")
     logger.info(f"📚 API documentation at: http://{settings.HOST}:{settings.PORT}/docs")
     
@@ -43,6 +56,7 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("🛑 Shutting down AI Tools Backend...")
+    await warmup_manager.stop(settings.WARMUP_STOP_TIMEOUT)
 
 # Create FastAPI app
 app = FastAPI(
@@ -85,6 +99,18 @@ async def health_check():
         "version": settings.VERSION
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check: reports per-model warmup state, 503 until all configured models are ready."""
+    readiness = warmup_manager.readiness()
+    return JSONResponse(
+        status_code=200 if readiness["ready"] else 503,
+        content={
+            "status": "ready" if readiness["ready"] else "not_ready",
+            "models": readiness["models"]
+        }
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
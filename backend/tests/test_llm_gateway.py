@@ -0,0 +1,288 @@
+"""
+LLM gateway tests against the mock provider: rate limiting, retries with
+backoff, the circuit breaker and single-flight coalescing.
+"""
+import asyncio
+import time
+
+import pytest
+
+from core.llm import LLMGateway, llm_metrics
+from core.llm_providers import MockProvider, MockQuotaError
+from core.rate_limit import CLOSED, OPEN, HALF_OPEN, RateLimiter, RateLimitExceeded, CircuitBreaker, CircuitOpen
+
+MODEL = "mock-model"
+
+
+class FlakyProvider(MockProvider):
+    """Mock provider with a fixed latency whose next `failures` calls fail with a 429."""
+
+    def __init__(self, latency: float = 0.0, failures: int = 0):
+        super().__init__(latency=latency, distribution="fixed", tokens_per_second=0.0)
+        self.failures = failures
+
+    def _admit(self, counter: str):
+        super()._admit(counter)
+        if self.failures > 0:
+            self.failures -= 1
+            self.counts["quota_errors"] += 1
+            raise MockQuotaError("429 Resource has been exhausted (e.g. check quota). [mock]")
+
+
+def make_gateway(provider, rate_limiter=None, circuit_breaker=None, max_retries=0, coalesce=True):
+    return LLMGateway(
+        provider, max_concurrency=8, rate_limiter=rate_limiter, circuit_breaker=circuit_breaker,
+        max_retries=max_retries, backoff_base=0.01, backoff_max=0.05, coalesce=coalesce
+    )
+
+
+def drain(limiter: RateLimiter):
+    """Use up the request budget, so the next call has to wait 1 / rate seconds."""
+    limiter.requests.reserve(limiter.requests.capacity)
+
+
+async def open_circuit(gateway: LLMGateway, provider: FlakyProvider):
+    """Fail calls until the breaker opens."""
+    breaker = gateway.circuit_breaker
+    provider.failures = breaker.threshold
+    for _ in range(breaker.threshold):
+        with pytest.raises(MockQuotaError):
+            await gateway.generate("fail", "test", MODEL)
+    assert breaker.state == OPEN
+
+
+# Rate limiting
+
+def test_rate_limiter_queues_then_rejects_past_max_wait():
+    limiter = RateLimiter(rpm=2, max_wait=60.0)
+
+    assert limiter.reserve(0) == 0
+    assert limiter.reserve(0) == 0
+    assert limiter.reserve(0) == pytest.approx(30.0, abs=0.1)
+    assert limiter.reserve(0) == pytest.approx(60.0, abs=0.1)
+    with pytest.raises(RateLimitExceeded):
+        limiter.reserve(0)
+
+    stats = limiter.stats()
+    assert stats["queued"] == 2
+    assert stats["rejected"] == 1
+    # The rejected reservation was refunded
+    assert limiter.requests.available == pytest.approx(-2.0, abs=0.01)
+
+
+def test_gateway_waits_for_rate_budget():
+    async def run():
+        provider = FlakyProvider()
+        limiter = RateLimiter(rpm=600, max_wait=5.0)
+        gateway = make_gateway(provider, rate_limiter=limiter)
+        drain(limiter)
+
+        start = time.monotonic()
+        result = await gateway.generate("queued", "test", MODEL)
+        return time.monotonic() - start, result, provider, limiter
+
+    elapsed, result, provider, limiter = asyncio.run(run())
+    assert result.text
+    assert elapsed >= 0.09
+    assert provider.counts["calls"] == 1
+    assert limiter.queued == 1
+
+
+def test_gateway_rejects_call_past_max_wait():
+    async def run():
+        provider = FlakyProvider()
+        limiter = RateLimiter(rpm=600, max_wait=0.01)
+        gateway = make_gateway(provider, rate_limiter=limiter)
+        drain(limiter)
+
+        with pytest.raises(RateLimitExceeded):
+            await gateway.generate("rejected", "test", MODEL)
+        return provider, limiter, gateway
+
+    provider, limiter, gateway = asyncio.run(run())
+    assert provider.counts["calls"] == 0
+    assert limiter.rejected == 1
+    assert gateway.circuit_breaker.state == CLOSED
+
+
+def test_quota_errors_are_retried_with_backoff():
+    async def run():
+        provider = FlakyProvider(failures=2)
+        gateway = make_gateway(provider, max_retries=3)
+        return await gateway.generate("retried", "test-retries", MODEL), provider, gateway
+
+    retries = llm_metrics.snapshot().get("test-retries", {}).get("retries", 0)
+    result, provider, gateway = asyncio.run(run())
+    assert result.text
+    assert provider.counts["calls"] == 3
+    assert llm_metrics.snapshot()["test-retries"]["retries"] == retries + 2
+    assert gateway.circuit_breaker.state == CLOSED
+
+
+def test_retries_give_up_after_max_retries():
+    async def run():
+        provider = FlakyProvider(failures=10)
+        gateway = make_gateway(provider, max_retries=2)
+        with pytest.raises(MockQuotaError):
+            await gateway.generate("exhausted", "test", MODEL)
+        return provider
+
+    assert asyncio.run(run()).counts["calls"] == 3
+
+
+# Circuit breaker
+
+def test_breaker_opens_half_opens_and_closes():
+    async def run():
+        provider = FlakyProvider()
+        breaker = CircuitBreaker(threshold=2, reset_timeout=0.1)
+        gateway = make_gateway(provider, circuit_breaker=breaker)
+        await open_circuit(gateway, provider)
+        calls = provider.counts["calls"]
+
+        # Open: fails fast without calling the provider
+        with pytest.raises(CircuitOpen):
+            await gateway.generate("fast fail", "test", MODEL)
+        assert provider.counts["calls"] == calls
+        assert breaker.stats()["rejected"] == 1
+
+        # Half-open after the cool-down: the trial call succeeds and closes the circuit
+        await asyncio.sleep(breaker.reset_timeout)
+        await gateway.generate("trial", "test", MODEL)
+        return breaker
+
+    breaker = asyncio.run(run())
+    assert breaker.state == CLOSED
+    assert breaker.failures == 0
+
+
+def test_failed_half_open_trial_reopens_breaker():
+    async def run():
+        provider = FlakyProvider()
+        breaker = CircuitBreaker(threshold=2, reset_timeout=0.1)
+        gateway = make_gateway(provider, circuit_breaker=breaker)
+        await open_circuit(gateway, provider)
+        await asyncio.sleep(breaker.reset_timeout)
+
+        provider.failures = 1
+        with pytest.raises(MockQuotaError):
+            await gateway.generate("trial", "test", MODEL)
+        return breaker
+
+    breaker = asyncio.run(run())
+    assert breaker.state == OPEN
+    assert breaker.opens == 2
+
+
+def test_half_open_lets_one_trial_through():
+    async def run():
+        provider = FlakyProvider()
+        breaker = CircuitBreaker(threshold=1, reset_timeout=0.1)
+        gateway = make_gateway(provider, circuit_breaker=breaker, coalesce=False)
+        await open_circuit(gateway, provider)
+        await asyncio.sleep(breaker.reset_timeout)
+
+        provider.latency = 0.1
+        return await asyncio.gather(
+            gateway.generate("trial", "test", MODEL),
+            gateway.generate("second", "test", MODEL),
+            return_exceptions=True
+        )
+
+    trial, second = asyncio.run(run())
+    assert trial.text
+    assert isinstance(second, CircuitOpen)
+
+
+def test_half_open_trial_released_after_rate_limit_exceeded():
+    async def run():
+        provider = FlakyProvider()
+        limiter = RateLimiter(rpm=600, max_wait=0.01)
+        breaker = CircuitBreaker(threshold=1, reset_timeout=0.1)
+        gateway = make_gateway(provider, rate_limiter=limiter, circuit_breaker=breaker)
+        await open_circuit(gateway, provider)
+        await asyncio.sleep(breaker.reset_timeout)
+
+        # The trial call is rejected by the rate limiter before it is sent
+        drain(limiter)
+        with pytest.raises(RateLimitExceeded):
+            await gateway.generate("rejected trial", "test", MODEL)
+        assert breaker.state == HALF_OPEN
+
+        # ... so the next call gets to be the trial
+        limiter.requests.refund(limiter.requests.capacity)
+        await gateway.generate("trial", "test", MODEL)
+        return breaker
+
+    assert asyncio.run(run()).state == CLOSED
+
+
+@pytest.mark.parametrize("queued", [False, True], ids=["in_flight", "queued_for_rate_budget"])
+def test_half_open_trial_released_after_cancellation(queued):
+    async def run():
+        provider = FlakyProvider()
+        limiter = RateLimiter(rpm=6, max_wait=60.0)
+        breaker = CircuitBreaker(threshold=1, reset_timeout=0.1)
+        gateway = make_gateway(provider, rate_limiter=limiter, circuit_breaker=breaker)
+        await open_circuit(gateway, provider)
+        await asyncio.sleep(breaker.reset_timeout)
+
+        if queued:
+            drain(limiter)
+        else:
+            provider.latency = 10.0
+        task = asyncio.create_task(gateway.generate("cancelled trial", "test", MODEL))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert breaker.state == HALF_OPEN
+
+        provider.latency = 0.0
+        limiter.requests.refund(limiter.requests.capacity)
+        await gateway.generate("trial", "test", MODEL)
+        return breaker
+
+    assert asyncio.run(run()).state == CLOSED
+
+
+# Single-flight coalescing
+
+def test_identical_concurrent_calls_share_one_request():
+    async def run():
+        provider = FlakyProvider(latency=0.05)
+        gateway = make_gateway(provider)
+        results = await asyncio.gather(*(gateway.generate("same prompt", "test", MODEL) for _ in range(5)))
+        return results, provider, gateway
+
+    results, provider, gateway = asyncio.run(run())
+    assert provider.counts["calls"] == 1
+    assert len({result.text for result in results}) == 1
+    stats = gateway.single_flight.stats()
+    assert stats["leaders"] == 1
+    assert stats["coalesced"] == 4
+    assert stats["in_flight"] == 0
+
+
+def test_calls_are_not_coalesced_across_prompts_or_when_disabled():
+    async def run(coalesce, prompts):
+        provider = FlakyProvider(latency=0.05)
+        gateway = make_gateway(provider, coalesce=coalesce)
+        await asyncio.gather(*(gateway.generate(prompt, "test", MODEL) for prompt in prompts))
+        return provider.counts["calls"]
+
+    assert asyncio.run(run(True, ["first prompt", "second prompt"])) == 2
+    assert asyncio.run(run(False, ["same prompt"] * 3)) == 3
+
+
+def test_coalesced_callers_share_the_error():
+    async def run():
+        provider = FlakyProvider(latency=0.05, failures=1)
+        gateway = make_gateway(provider)
+        return await asyncio.gather(
+            *(gateway.generate("same prompt", "test", MODEL) for _ in range(3)), return_exceptions=True
+        ), provider
+
+    results, provider = asyncio.run(run())
+    assert provider.counts["calls"] == 1
+    assert all(isinstance(result, MockQuotaError) for result in results)
@@ -3,6 +3,7 @@ Local CPU-based image generator using Stable Diffusion
 """
 import torch
 import time
+import threading
 import io
 import base64
 import logging
@@ -24,6 +25,7 @@ class LocalImageGenerator:
         self.model_id = model_id
         self.pipe = None
         self.device = "cpu"
+        self._load_lock = threading.Lock()
         
         # Style prompts for enhancement
         self.style_prompts = {
@@ -50,11 +52,18 @@ class LocalImageGenerator:
         }
     
     def load_model(self):
-        """Load the model (call once at startup)"""
+        """Load the model (safe to call repeatedly and from several threads)"""
+        with self._load_lock:
+            if self.pipe is not None:
+                return True
+            return self._load_model()
+    
+    def _load_model(self):
+        """Load the pipeline from disk or the Hugging Face hub."""
         try:
             logger.info(f"Loading {self.model_id} on {self.device}...")
             
-            self.pipe = StableDiffusionPipeline.from_pretrained(
+            pipe = StableDiffusionPipeline.from_pretrained(
                 self.model_id,
                 torch_dtype=torch.float32,  # Use float32 for CPU stability
                 safety_checker=None,
@@ -62,9 +71,11 @@ class LocalImageGenerator:
             )
             
             # CPU optimizations for memory efficiency
-            self.pipe.enable_attention_slicing()
-            self.pipe.enable_vae_slicing()
+            pipe.enable_attention_slicing()
+            pipe.enable_vae_slicing()
             
+            # Publish only the fully configured pipeline; requests check self.pipe without the lock
+            self.pipe = pipe
             logger.info("Model loaded successfully!")
             return True
             
@@ -72,6 +83,18 @@ class LocalImageGenerator:
             logger.error(f"Failed to load model: {e}")
             return False
     
+    def warmup(self):
+        """Run a tiny dummy inference so the first real request doesn't pay for kernel setup."""
+        if self.pipe is None:
+            raise Exception("Model not loaded. Call load_model() first.")
+        self.pipe(
+            prompt="warmup",
+            num_inference_steps=1,
+            guidance_scale=1.0,
+            width=64,
+            height=64
+        )
+    
     def _enhance_prompt(self, prompt: str, style: ImageStyle) -> str:
         """Enhance the prompt with style-specific keywords."""
         style_keywords = self.style_prompts.get(style, "")
@@ -12,6 +12,7 @@ from .models import (
     ModelInfo, StyleInfo, HealthResponse
 )
 from .generator import ImageGenerator
+from core.warmup import warmup_manager
 
 logger = logging.getLogger(__name__)
 
@@ -21,25 +22,53 @@ router = APIRouter(prefix="/image-generator", tags=["Image Generator"])
 # Global image generator instance
 _image_generator = None
 
+# Name of the Stable Diffusion model in the warmup manager
+WARMUP_NAME = "stable_diffusion"
+
 def get_image_generator() -> ImageGenerator:
-    """Dependency to get image generator instance."""
+    """Dependency to get image generator instance (without loading the model)."""
     global _image_generator
     
     if _image_generator is None:
         # Initialize with or without API token (local mode works without it)
         api_token = os.getenv("HUGGINGFACE_API_TOKEN")
         _image_generator = ImageGenerator(api_token)
+    
+    return _image_generator
+
+def get_loaded_image_generator() -> ImageGenerator:
+    """Dependency to get image generator instance with the local model loaded."""
+    generator = get_image_generator()
+    
+    if generator.local_generator.pipe is None:
+        if warmup_manager.is_loading(WARMUP_NAME):
+            raise HTTPException(
+                status_code=503,
+                detail="Stable Diffusion model is still loading. Check /ready and retry shortly.",
+                headers={"Retry-After": "30"}
+            )
         
         # Load the local model
         logger.info("Loading local Stable Diffusion model...")
-        if not _image_generator.local_generator.load_model():
+        if not generator.local_generator.load_model():
             raise HTTPException(
                 status_code=500,
                 detail="Failed to load local Stable Diffusion model. Check your installation."
             )
         logger.info("Local model loaded successfully!")
     
-    return _image_generator
+    return generator
+
+def load_for_warmup() -> ImageGenerator:
+    """Load the local model for the warmup manager."""
+    generator = get_image_generator()
+    if not generator.local_generator.load_model():
+        raise RuntimeError("Failed to load local Stable Diffusion model")
+    return generator
+
+def warmup(generator: ImageGenerator):
+    """Run a dummy inference on the loaded model."""
+    generator.local_generator.warmup()
 
 @router.get("/health", response_model=HealthResponse)
 async def health_check(generator: ImageGenerator = Depends(get_image_generator)):
@@ -87,7 +116,7 @@ async def get_styles(generator: ImageGenerator = Depends(get_image_generator)):
 @router.post("/generate", response_model=GenerateImageResponse)
 async def generate_images(
     request: GenerateImageRequest,
-    generator: ImageGenerator = Depends(get_image_generator)
+    generator: ImageGenerator = Depends(get_loaded_image_generator)
 ):
     """
     Generate images based on the provided prompt and parameters.
@@ -125,7 +154,7 @@ async def generate_images(
 @router.post("/variations", response_model=GenerateImageResponse)
 async def generate_variations(
     request: ImageVariationRequest,
-    generator: ImageGenerator = Depends(get_image_generator)
+    generator: ImageGenerator = Depends(get_loaded_image_generator)
 ):
     """
     Generate variations of an existing image.
@@ -259,5 +288,6 @@ async def test_endpoint():
         "status": "working",
         "message": "Local image generator router is working",
         "local_mode": True,
-        "model_loaded": _image_generator is not None
+        "model_loaded": _image_generator is not None and _image_generator.local_generator.pipe is not None,
+        "warmup_state": warmup_manager.get_state(WARMUP_NAME)
     }
@@ -0,0 +1,157 @@
+"""
+Rolling compaction of PDF chat history.
+
+The last turns of a conversation are sent verbatim; older messages are
+folded into a rolling summary, a batch at a time. The summary is cached
+per session with a digest of the messages it covers, so each fold only
+summarizes the new messages together with the previous summary, and an
+edited or unrelated history is never matched to the wrong summary.
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from core.cache import TieredCache
+from core.config import settings
+from core.llm import LLMResult
+from core.prompt_budget import PromptBudget
+
+logger = logging.getLogger(__name__)
+
+HISTORY_SUMMARY_PROMPT = """
+Update the running summary of a conversation between a user and an assistant about a PDF document.
+Keep the user's questions, the key facts and figures of the answers, and anything the user asked
+the assistant to remember. Write plain prose without an introduction, in at most {max_words} words.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+"""
+
+# Rolling summaries keyed by session: {"count": messages covered, "digest": their digest, "summary": text}
+chat_summary_cache = TieredCache(
+    max_size=settings.PDF_CHAT_SUMMARY_CACHE_SIZE,
+    ttl=settings.PDF_CHAT_SUMMARY_CACHE_TTL,
+    shared_path=settings.PDF_SUMMARY_CACHE_PATH
+)
+
+
+def history_digest(lines: List[str]) -> str:
+    """Digest of formatted history lines."""
+    digest = hashlib.sha256()
+    for line in lines:
+        digest.update(line.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def session_key(session_id: Optional[str], document: str, first_message: str) -> str:
+    """
+    Cache key of a chat session: its id, or else the document and opening message.
+    """
+    if session_id:
+        return f"session:{session_id}"
+    return "anonymous:" + hashlib.sha256(f"{document}\0{first_message}".encode("utf-8")).hexdigest()
+
+
+class HistoryCompactor:
+    """Keeps chat prompts bounded by folding older messages into a cached rolling summary."""
+
+    def __init__(self, generate: Callable[[str], Awaitable[LLMResult]], budget: PromptBudget,
+                 recent_turns: int = 4, batch: int = 4, summary_words: int = 250,
+                 cache: TieredCache = chat_summary_cache):
+        """
+        Args:
+            generate: Generates text for a prompt
+            budget: Prompt budget for the fold prompts
+            recent_turns: Turns (user and assistant message pairs) always sent verbatim
+            batch: Minimum number of older messages folded at once
+            summary_words: Maximum length of the rolling summary
+            cache: Rolling summaries by session
+        """
+        self.generate = generate
+        self.budget = budget
+        self.recent_messages = max(0, recent_turns) * 2
+        self.batch = max(1, batch)
+        self.summary_words = summary_words
+        self.cache = cache
+        self._lock = threading.Lock()
+        self.folds = 0
+        self.rebuilds = 0
+        self.summary_hits = 0
+        self.messages_folded = 0
+
+    async def compact(self, key: str, lines: List[str]) -> Tuple[Optional[str], List[str], int]:
+        """
+        Split formatted history lines into a rolling summary and the messages sent verbatim.
+
+        Older messages are folded once at least a batch of them is not yet in
+        the summary, so between folds a few extra messages are sent verbatim.
+        If folding fails, the history is sent verbatim.
+
+        Args:
+            key: Session cache key (see session_key)
+            lines: Formatted history lines, oldest first
+
+        Returns:
+            Tuple of (summary or None, verbatim lines, number of messages in the summary)
+        """
+        foldable = len(lines) - self.recent_messages
+        if foldable <= 0:
+            return None, lines, 0
+
+        summary, count = None, 0
+        # The cache may be SQLite-backed; keep its reads and writes off the event loop
+        entry = await asyncio.to_thread(self.cache.get, key)
+        if entry and entry["count"] <= len(lines) and entry["digest"] == history_digest(lines[:entry["count"]]):
+            summary, count = entry["summary"], entry["count"]
+            with self._lock:
+                self.summary_hits += 1
+        elif entry:
+            with self._lock:
+                self.rebuilds += 1
+
+        if foldable - count >= self.batch:
+            try:
+                summary = await self._fold(summary, lines[count:foldable])
+            except Exception as e:
+                logger.warning(f"Chat history fold failed, sending {foldable - count} older messages verbatim: {e}")
+            else:
+                with self._lock:
+                    self.folds += 1
+                    self.messages_folded += foldable - count
+                count = foldable
+                await asyncio.to_thread(
+                    self.cache.set, key, {"count": count, "digest": history_digest(lines[:count]), "summary": summary}
+                )
+
+        return summary, lines[count:], count
+
+    async def _fold(self, summary: Optional[str], lines: List[str]) -> str:
+        """Fold new messages into the summary."""
+        fitted = await self.budget.fit(
+            lambda context, _: HISTORY_SUMMARY_PROMPT.format(
+                max_words=self.summary_words, summary=summary or "(none)", messages=context
+            ),
+            context="\n".join(lines),
+            label="chat history summary"
+        )
+        response = await self.generate(fitted.prompt)
+        if not response.text or not response.text.strip():
+            raise ValueError("No history summary generated")
+        return response.text.strip()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "recent_messages": self.recent_messages,
+            "batch": self.batch,
+            "folds": self.folds,
+            "rebuilds": self.rebuilds,
+            "summary_hits": self.summary_hits,
+            "messages_folded": self.messages_folded,
+            "cache": self.cache.stats(),
+        }
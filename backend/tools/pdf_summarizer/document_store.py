@@ -0,0 +1,196 @@
+"""
+Server-side store of extracted PDF documents.
+
+Upload saves the extracted text, page offsets and metadata under a random
+document_id, so summarize, chat, key-points and questions can reference the
+document instead of receiving its full text on every call. Derived
+artifacts (e.g. search indexes) are stored next to the document.
+
+Documents are gzip-compressed JSON files in a directory shared by all
+workers on the host, with a small in-process cache in front. Expiry is
+sliding: every access extends a document's lifetime by the TTL.
+"""
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Dict, Any, Optional
+
+from core.cache import TTLCache
+from core.config import settings
+from core.storage import read_json_gz, write_json_gz_atomic
+
+logger = logging.getLogger(__name__)
+
+_DOCUMENT_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class DocumentStore:
+    """TTL-evicted store of extracted documents and their derived artifacts."""
+
+    def __init__(self, directory: str, ttl: float, memory_size: int = 32):
+        self.directory = directory
+        self.ttl = ttl
+        self._memory = TTLCache(memory_size, ttl)
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, document_id: str, artifact: Optional[str] = None) -> str:
+        name = f"{document_id}.{artifact}" if artifact else document_id
+        return os.path.join(self.directory, f"{name}.json.gz")
+
+    def _is_expired(self, path: str) -> bool:
+        try:
+            return os.path.getmtime(path) + self.ttl < time.time()
+        except FileNotFoundError:
+            return True
+
+    def put(self, text: str, metadata: Dict[str, Any]) -> str:
+        """
+        Store an extracted document.
+
+        Args:
+            text: Extracted text
+            metadata: Extraction metadata (page_offsets is stored alongside the text)
+
+        Returns:
+            The new document_id
+        """
+        document_id = uuid.uuid4().hex
+        metadata = dict(metadata)
+        document = {
+            "document_id": document_id,
+            "text": text,
+            "page_offsets": metadata.pop("page_offsets", []),
+            "metadata": metadata,
+            "created": time.time(),
+        }
+        write_json_gz_atomic(self._path(document_id), document, compresslevel=3)
+        self._memory.set(document_id, document)
+        self._maybe_sweep()
+        return document_id
+
+    def get(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Get a document (text, page_offsets, metadata), or None if unknown or expired."""
+        if not _DOCUMENT_ID.match(document_id or ""):
+            return None
+
+        path = self._path(document_id)
+        if self._is_expired(path):
+            self._memory.delete(document_id)
+            return None
+
+        document = self._memory.get(document_id)
+        if document is None:
+            document = read_json_gz(path)
+            if document is None:
+                return None
+            self._memory.set(document_id, document)
+
+        self._touch(path)
+        return document
+
+    def get_artifact(self, document_id: str, name: str) -> Optional[Any]:
+        """Get a derived artifact stored for a document."""
+        if not _DOCUMENT_ID.match(document_id or "") or self._is_expired(self._path(document_id)):
+            return None
+        key = f"{document_id}.{name}"
+        value = self._memory.get(key)
+        if value is None:
+            value = read_json_gz(self._path(document_id, name))
+            if value is not None:
+                self._memory.set(key, value)
+        return value
+
+    def set_artifact(self, document_id: str, name: str, value: Any):
+        """Store a derived artifact for a document; it expires with the document."""
+        if not _DOCUMENT_ID.match(document_id or ""):
+            raise ValueError(f"Invalid document id: {document_id}")
+        write_json_gz_atomic(self._path(document_id, name), value, compresslevel=3)
+        self._memory.set(f"{document_id}.{name}", value)
+
+    def delete(self, document_id: str):
+        """Remove a document and its artifacts."""
+        if not _DOCUMENT_ID.match(document_id or ""):
+            return
+        for name in os.listdir(self.directory):
+            if name.startswith(document_id):
+                self._remove(os.path.join(self.directory, name))
+                self._memory.delete(name[:-len(".json.gz")])
+
+    @staticmethod
+    def _touch(path: str):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _maybe_sweep(self):
+        with self._lock:
+            if time.time() - self._last_sweep < self.ttl / 10:
+                return
+            self._last_sweep = time.time()
+        self.collect_expired()
+
+    def collect_expired(self) -> int:
+        """
+        Delete expired documents and their artifacts.
+
+        Returns:
+            Number of documents removed
+        """
+        removed = 0
+        names = os.listdir(self.directory)
+        for name in names:
+            # Temp files left behind by a crashed writer
+            path = os.path.join(self.directory, name)
+            if name.startswith(".tmp-") and self._is_expired(path):
+                self._remove(path)
+        expired = {
+            name.split(".", 1)[0] for name in names
+            if _DOCUMENT_ID.match(name.split(".", 1)[0]) and name.count(".") == 2
+            and self._is_expired(os.path.join(self.directory, name))
+        }
+        for name in names:
+            if name.split(".", 1)[0] in expired:
+                self._remove(os.path.join(self.directory, name))
+        for document_id in expired:
+            self._memory.delete(document_id)
+            removed += 1
+        if removed:
+            logger.info(f"Document store removed {removed} expired documents")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        documents = sum(1 for name in os.listdir(self.directory) if name.count(".") == 2)
+        return {
+            "directory": self.directory,
+            "ttl": self.ttl,
+            "documents": documents,
+            "memory": self._memory.stats(),
+        }
+
+
+# Global instance for reuse
+_document_store: Optional[DocumentStore] = None
+_document_store_lock = threading.Lock()
+
+
+def get_document_store() -> DocumentStore:
+    """Get or create the global document store."""
+    global _document_store
+    if _document_store is None:
+        with _document_store_lock:
+            if _document_store is None:
+                _document_store = DocumentStore(settings.PDF_DOCUMENT_DIR, settings.PDF_DOCUMENT_TTL)
+    return _document_store
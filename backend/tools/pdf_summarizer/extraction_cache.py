@@ -0,0 +1,171 @@
+"""
+Content-addressed on-disk cache of PDF extraction results.
+
+Entries are keyed by the SHA-256 of the uploaded bytes plus the extractor
+version, stored as gzip-compressed JSON (text, per-page offsets, metadata)
+and written atomically, so every uvicorn worker on the host can share the
+same directory. Least recently used entries (by file mtime, refreshed on
+every hit) are removed once the directory grows past its size limit.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+from core.config import settings
+from core.storage import read_json_gz, write_json_gz_atomic
+
+from .pdf_extractor import EXTRACTOR_VERSION
+
+logger = logging.getLogger(__name__)
+
+# Temp files older than this were left behind by a crashed writer
+STALE_TEMP_SECONDS = 3600
+
+
+class ExtractionCache:
+    """Shared on-disk cache of extracted PDF text."""
+
+    def __init__(self, directory: str, max_bytes: int, version: str = EXTRACTOR_VERSION):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = version
+        self._lock = threading.Lock()
+        self._bytes_since_gc = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, content_hash: str) -> str:
+        return os.path.join(self.directory, content_hash[:2], f"{content_hash}-v{self.version}.json.gz")
+
+    def get(self, content_hash: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Look up a previous extraction of the same bytes.
+
+        Returns:
+            Tuple of (text, metadata) or None on a miss
+        """
+        path = self._path(content_hash)
+        entry = read_json_gz(path)
+        if entry is None or entry.get("version") != self.version:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            # Mark as recently used for LRU collection
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+
+        metadata = entry["metadata"]
+        metadata["page_offsets"] = entry["page_offsets"]
+        return entry["text"], metadata
+
+    def set(self, content_hash: str, text: str, metadata: Dict[str, Any]):
+        """Store an extraction result."""
+        metadata = dict(metadata)
+        entry = {
+            "version": self.version,
+            "text": text,
+            "page_offsets": metadata.pop("page_offsets", []),
+            "metadata": metadata,
+        }
+        path = self._path(content_hash)
+        try:
+            write_json_gz_atomic(path, entry)
+            size = os.path.getsize(path)
+        except OSError as e:
+            logger.warning(f"Failed to write extraction cache entry: {e}")
+            return
+
+        with self._lock:
+            self._bytes_since_gc += size
+            collect = self._bytes_since_gc > self.max_bytes // 10
+            if collect:
+                self._bytes_since_gc = 0
+        if collect:
+            self.collect_garbage()
+
+    def collect_garbage(self) -> int:
+        """
+        Remove least recently used entries until the cache is under 80% of max_bytes.
+
+        Safe to run concurrently from several workers: files deleted by
+        someone else are skipped.
+
+        Returns:
+            Number of entries removed
+        """
+        entries = []
+        total = 0
+        now = time.time()
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if name.startswith(".tmp-"):
+                    if now - stat.st_mtime > STALE_TEMP_SECONDS:
+                        self._remove(path)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        removed = 0
+        if total > self.max_bytes:
+            target = int(self.max_bytes * 0.8)
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                if self._remove(path):
+                    removed += 1
+                total -= size
+            with self._lock:
+                self.evictions += removed
+            logger.info(f"Extraction cache GC removed {removed} entries, {total} bytes remain")
+        return removed
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "directory": self.directory,
+            "max_bytes": self.max_bytes,
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Global instance for reuse
+_extraction_cache: Optional[ExtractionCache] = None
+_extraction_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> Optional[ExtractionCache]:
+    """Get or create the global extraction cache, or None if it is disabled."""
+    global _extraction_cache
+    if not settings.PDF_CACHE_DIR:
+        return None
+    if _extraction_cache is None:
+        with _extraction_cache_lock:
+            if _extraction_cache is None:
+                _extraction_cache = ExtractionCache(settings.PDF_CACHE_DIR, settings.PDF_CACHE_MAX_BYTES)
+    return _extraction_cache
@@ -2,7 +2,7 @@
 Pydantic models for PDF Summarizer API.
 """
 from pydantic import BaseModel, Field
-from typing import Optional, List, Literal
+from typing import Optional, List, Literal, Dict
 from enum import Enum
 
 
@@ -17,7 +17,8 @@ class SummaryStyle(str, Enum):
 
 class SummarizeRequest(BaseModel):
     """Request model for PDF summarization."""
-    text: str = Field(..., description="Extracted text from PDF")
+    text: Optional[str] = Field(default=None, description="Extracted text from PDF")
+    document_id: Optional[str] = Field(default=None, description="Uploaded document id (instead of text)")
     style: SummaryStyle = Field(default=SummaryStyle.CONCISE, description="Summary style")
     max_length: Optional[int] = Field(default=500, description="Maximum summary length")
     language: Optional[str] = Field(default="en", description="Output language")
@@ -30,6 +31,35 @@ class SummarizeResponse(BaseModel):
     original_length: int = Field(..., description="Original text length")
     summary_length: int = Field(..., description="Summary length")
     processing_time: float = Field(..., description="Processing time in seconds")
+    mode: Optional[str] = Field(default=None, description="'single' prompt or 'map_reduce' over sections")
+    sections: Optional[int] = Field(default=None, description="Sections summarized in the map phase")
+    phase_times: Optional[Dict[str, float]] = Field(default=None, description="Seconds spent in the map and reduce phases")
+    concurrency: Optional[int] = Field(default=None, description="Peak number of section summaries generated at once")
+    cache_hits: Optional[int] = Field(default=None, description="Section summaries reused from earlier requests")
+
+
+class AnalyzeRequest(BaseModel):
+    """Request model for the combined summary, key points and questions analysis."""
+    text: Optional[str] = Field(default=None, description="Extracted text from PDF")
+    document_id: Optional[str] = Field(default=None, description="Uploaded document id (instead of text)")
+    style: SummaryStyle = Field(default=SummaryStyle.CONCISE, description="Summary style")
+    max_length: Optional[int] = Field(default=500, description="Maximum summary length")
+    language: Optional[str] = Field(default="en", description="Output language")
+    max_points: int = Field(default=10, description="Maximum number of key points")
+    num_questions: int = Field(default=5, description="Number of questions")
+
+
+class AnalyzeResponse(BaseModel):
+    """Response model for the combined analysis."""
+    summary: str = Field(..., description="Generated summary")
+    style: SummaryStyle = Field(..., description="Used summary style")
+    key_points: List[str] = Field(..., description="Key points")
+    questions: List[str] = Field(..., description="Questions about the content")
+    processing_time: float = Field(..., description="Processing time in seconds")
+    mode: str = Field(..., description="'bundle' (one structured call) or 'fallback' (separate calls)")
+    prompt_tokens: int = Field(..., description="Prompt tokens sent to the model")
+    separate_prompt_tokens: int = Field(..., description="Estimated prompt tokens of separate summarize, key points and questions calls")
+    tokens_saved: int = Field(..., description="Prompt tokens saved compared to separate calls")
 
 
 class ChatMessage(BaseModel):
@@ -42,13 +72,28 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     """Request model for PDF chat."""
     messages: List[ChatMessage] = Field(..., description="Chat history")
-    pdf_context: str = Field(..., description="PDF content context")
+    pdf_context: Optional[str] = Field(default=None, description="PDF content context")
+    document_id: Optional[str] = Field(default=None, description="Uploaded document id (instead of pdf_context)")
+    session_id: Optional[str] = Field(default=None, description="Chat session id, for the rolling history summary")
 
 
 class ChatResponse(BaseModel):
     """Response model for PDF chat."""
     response: str = Field(..., description="AI response")
     processing_time: float = Field(..., description="Processing time in seconds")
+    prompt_tokens: Optional[int] = Field(default=None, description="Prompt tokens sent to the model")
+    context_mode: Optional[str] = Field(default=None, description="'full' document text or 'retrieval' excerpts")
+    source_pages: Optional[List[int]] = Field(default=None, description="Pages of the excerpts used as context")
+    history_summarized: Optional[int] = Field(default=None, description="Earlier messages sent as a rolling summary")
+
+
+class PageExtraction(BaseModel):
+    """Model for how a single PDF page was extracted."""
+    page: int = Field(..., description="Page number (1-based)")
+    method: str = Field(..., description="Extraction method used for the page")
+    time_ms: float = Field(..., description="Extraction time for the page in milliseconds")
+    text_length: int = Field(..., description="Extracted text length")
+    needs_ocr: bool = Field(default=False, description="Page is image-only and needs OCR")
 
 
 class PDFInfo(BaseModel):
@@ -58,10 +103,17 @@ class PDFInfo(BaseModel):
     size_bytes: int = Field(..., description="File size in bytes")
     text_length: int = Field(..., description="Extracted text length")
     extraction_time: float = Field(..., description="Text extraction time")
+    parse_count: Optional[int] = Field(default=None, description="Times the PDF was parsed while handling the request")
+    methods: Optional[Dict[str, int]] = Field(default=None, description="Number of pages handled by each extraction method")
+    ocr_pages: Optional[List[int]] = Field(default=None, description="Image-only pages that need OCR")
+    page_details: Optional[List[PageExtraction]] = Field(default=None, description="Per-page extraction method and timing")
+    content_hash: Optional[str] = Field(default=None, description="SHA-256 of the uploaded file")
+    cached: bool = Field(default=False, description="Served from the extraction cache")
 
 
 class PDFExtractResponse(BaseModel):
     """Response model for PDF text extraction."""
     text: str = Field(..., description="Extracted text")
     info: PDFInfo = Field(..., description="PDF metadata")
+    document_id: Optional[str] = Field(default=None, description="Id to reference the document in later requests")
 
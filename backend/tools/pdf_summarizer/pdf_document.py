@@ -0,0 +1,147 @@
+"""
+Parse-once PDF document handle.
+
+A PDFDocument wraps the uploaded content (bytes, or a memory map of the
+spooled upload) and opens each parser at most once, on first use, so
+validation, page count, metadata and text extraction for a request all
+share the same parsed document.
+"""
+import io
+import logging
+import mmap
+from typing import Dict, Any, Optional, Union
+
+import pdfplumber
+import PyPDF2
+
+logger = logging.getLogger(__name__)
+
+
+class _ContentReader(io.RawIOBase):
+    """Seekable file-like view of bytes or an mmap, with its own position and no copy of the content."""
+
+    def __init__(self, content: Union[bytes, mmap.mmap]):
+        self._content = content
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._content)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._content) if size is None or size < 0 else min(self._pos + size, len(self._content))
+        data = self._content[self._pos:end]
+        self._pos = max(self._pos, end)
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class PDFDocument:
+    """Lazily parsed PDF shared by every step of a request."""
+
+    def __init__(self, content: Union[bytes, mmap.mmap], filename: str, path: Optional[str] = None):
+        self.content = content
+        self.filename = filename
+        # File holding the content on disk, if any (e.g. a spooled upload)
+        self.path = path
+        self._plumber = None
+        self._reader = None
+        # Parser failures, re-raised instead of parsing again
+        self._errors: Dict[str, Exception] = {}
+        # Parses per parser, including ones done by extraction worker processes
+        self.parses: Dict[str, int] = {}
+
+    def __enter__(self) -> "PDFDocument":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Release parser resources."""
+        if self._plumber is not None:
+            self._plumber.close()
+            self._plumber = None
+        self._reader = None
+
+    def record_parse(self, parser: str, count: int = 1):
+        """Count a parse of this document."""
+        self.parses[parser] = self.parses.get(parser, 0) + count
+
+    @property
+    def parse_count(self) -> int:
+        """Total number of times this document has been parsed."""
+        return sum(self.parses.values())
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self.content)
+
+    @property
+    def plumber(self) -> pdfplumber.PDF:
+        """The pdfplumber document, parsed on first access."""
+        if self._plumber is None:
+            self._plumber = self._parse('pdfplumber', pdfplumber.open)
+        return self._plumber
+
+    @property
+    def reader(self) -> PyPDF2.PdfReader:
+        """The PyPDF2 reader, parsed on first access."""
+        if self._reader is None:
+            self._reader = self._parse('pypdf2', PyPDF2.PdfReader)
+        return self._reader
+
+    def _parse(self, parser: str, open_document):
+        if parser in self._errors:
+            raise self._errors[parser]
+        self.record_parse(parser)
+        try:
+            return open_document(_ContentReader(self.content))
+        except Exception as e:
+            self._errors[parser] = e
+            raise
+
+    @property
+    def page_count(self) -> int:
+        """Number of pages, from whichever parser is already open (PyPDF2 is the cheaper one to open)."""
+        if self._plumber is not None:
+            return len(self._plumber.pages)
+        return len(self.reader.pages)
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Document information dictionary (title, author, ...)."""
+        try:
+            return dict(self.plumber.metadata or {})
+        except Exception as e:
+            logger.warning(f"Failed to read PDF metadata: {e}")
+            return {}
+
+    def is_valid(self) -> bool:
+        """Whether the bytes are a PDF with at least one page."""
+        if not self.filename.lower().endswith('.pdf'):
+            return False
+        if self.content[:4] != b'%PDF':
+            return False
+        try:
+            return self.page_count > 0
+        except Exception as e:
+            logger.error(f"PDF validation failed: {e}")
+            return False
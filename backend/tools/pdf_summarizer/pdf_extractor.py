@@ -7,13 +7,19 @@ Handles extraction of text from various types of PDFs including:
 - PDFs with complex layouts
 """
 import pdfplumber
-import PyPDF2
-import io
+import os
 import time
 import logging
-from typing import Tuple, Optional
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple, Optional, List, Dict, Iterator
 from pathlib import Path
 
+from core.config import settings
+
+from .pdf_document import PDFDocument
+
 # Try to import magic, but handle Windows compatibility
 try:
     import magic
@@ -23,170 +29,429 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Process pools shared by all requests, keyed by worker count, created on first use
+_process_pools: Dict[int, ProcessPoolExecutor] = {}
+
+
+def _get_process_pool(workers: int) -> ProcessPoolExecutor:
+    """Get or create the extraction process pool with the given worker count."""
+    if workers not in _process_pools:
+        # spawn: forking a threaded server process is not safe
+        _process_pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _process_pools[workers]
+
+
+# Bump when extraction output changes; cached extractions from other versions are ignored
+EXTRACTOR_VERSION = "3"
+
+# Per-page extraction methods
+METHOD_PYPDF2 = 'pypdf2'
+METHOD_LAYOUT = 'pdfplumber'
+METHOD_COLUMNS = 'pdfplumber-columns'
+METHOD_NONE = 'none'
+
+STRATEGIES = ('adaptive', 'layout')
+
+
+def needs_layout_analysis(text: str, x_starts: Optional[List[float]] = None, width: Optional[float] = None) -> bool:
+    """
+    Heuristic: whether PyPDF2's text for a page should be redone with pdfplumber.
+    
+    Escalates pages with no text, with side-by-side columns (many text runs
+    starting both near the left margin and mid-page, which PyPDF2 would
+    interleave line by line), or with broken spacing (most "words" a single
+    character).
+    
+    Args:
+        text: Text PyPDF2 extracted from the page
+        x_starts: x coordinates where PyPDF2's text runs start
+        width: Page width in the same units
+    """
+    if not text or not text.strip():
+        return True
+    
+    if x_starts and width and len(x_starts) >= 10:
+        left = sum(1 for x in x_starts if x < 0.3 * width)
+        middle = sum(1 for x in x_starts if 0.35 * width <= x <= 0.7 * width)
+        if left >= 0.25 * len(x_starts) and middle >= 0.25 * len(x_starts):
+            return True
+    
+    words = text.split()
+    if len(words) >= 20:
+        single = sum(1 for word in words if len(word) == 1)
+        if single / len(words) > 0.5:
+            return True
+    
+    return False
+
+
+def _find_column_gutter(page) -> Optional[float]:
+    """x position of an empty vertical band in the middle of the page that splits two text columns."""
+    words = page.extract_words()
+    if len(words) < 20:
+        return None
+    
+    x0, x1 = float(page.bbox[0]), float(page.bbox[2])
+    width = x1 - x0
+    slots = 100
+    covered = [False] * slots
+    for word in words:
+        first = int((float(word['x0']) - x0) / width * slots)
+        last = int((float(word['x1']) - x0) / width * slots)
+        for slot in range(max(first, 0), min(last, slots - 1) + 1):
+            covered[slot] = True
+    
+    # Look for a gap of at least 2% of the page width between 30% and 70%
+    gap_start = None
+    for slot in range(30, 71):
+        if not covered[slot]:
+            if gap_start is None:
+                gap_start = slot
+        elif gap_start is not None:
+            if slot - gap_start >= 2 and any(covered[:gap_start]) and any(covered[slot:]):
+                return x0 + (gap_start + slot) / 2 / slots * width
+            gap_start = None
+    return None
+
+
+def extract_page_layout(page) -> Tuple[str, str, bool]:
+    """
+    Extract one pdfplumber page with layout analysis.
+    
+    Returns:
+        Tuple of (text, method, needs_ocr)
+    """
+    gutter = _find_column_gutter(page)
+    if gutter is not None:
+        x0, top, x1, bottom = page.bbox
+        left = page.crop((x0, top, gutter, bottom)).extract_text() or ""
+        right = page.crop((gutter, top, x1, bottom)).extract_text() or ""
+        text = '\n'.join(part for part in (left, right) if part)
+        method = METHOD_COLUMNS
+    else:
+        text = page.extract_text() or ""
+        method = METHOD_LAYOUT
+    
+    if not text.strip():
+        # Nothing extractable; a page made of images is a scan that needs OCR
+        return "", METHOD_NONE, bool(page.images)
+    return text, method, False
+
+
+def _extract_pages_worker(path: str, page_numbers: List[int]) -> List[Tuple[str, str, bool, float]]:
+    """Worker: open the PDF independently and run layout extraction on the given pages."""
+    results = []
+    with pdfplumber.open(path) as pdf:
+        for page_num in page_numbers:
+            start_time = time.time()
+            page = pdf.pages[page_num]
+            try:
+                text, method, needs_ocr = extract_page_layout(page)
+            except Exception as e:
+                logger.warning(f"Failed to extract text from page {page_num + 1}: {e}")
+                text, method, needs_ocr = "", METHOD_NONE, False
+            # Release cached layout objects; long ranges otherwise grow memory
+            page.close()
+            results.append((text, method, needs_ocr, time.time() - start_time))
+    return results
+
+
+def partition_pages(page_numbers: List[int], workers: int) -> List[List[int]]:
+    """Split pages into consecutive chunks, a few per worker so uneven pages balance out."""
+    if not page_numbers:
+        return []
+    size = max(1, -(-len(page_numbers) // (workers * 4)))
+    return [page_numbers[i:i + size] for i in range(0, len(page_numbers), size)]
+
 
 class PDFExtractor:
-    """Handles PDF text extraction with multiple fallback methods."""
+    """Handles PDF text extraction, choosing an extraction method per page."""
     
-    def __init__(self):
+    def __init__(self, workers: Optional[int] = None, parallel_min_pages: Optional[int] = None,
+                 strategy: str = 'adaptive'):
+        """
+        Args:
+            workers: Processes for parallel layout extraction (default: PDF_EXTRACT_WORKERS)
+            parallel_min_pages: Pages needing layout analysis before the pool is used
+            strategy: 'adaptive' (PyPDF2 first, pdfplumber where needed) or 'layout' (pdfplumber for every page)
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown extraction strategy: {strategy}")
         self.supported_extensions = {'.pdf'}
+        self.workers = settings.PDF_EXTRACT_WORKERS if workers is None else workers
+        self.parallel_min_pages = settings.PDF_PARALLEL_MIN_PAGES if parallel_min_pages is None else parallel_min_pages
+        self.strategy = strategy
+    
+    def open(self, file_content: bytes, filename: str, path: Optional[str] = None) -> PDFDocument:
+        """
+        Wrap uploaded bytes in a document handle; parsing happens on first use.
+        
+        Args:
+            file_content: PDF bytes (or a memory map of them)
+            filename: Original file name
+            path: File already holding the content on disk, which worker processes can open directly
+        """
+        return PDFDocument(file_content, filename, path)
     
-    def extract_text(self, file_content: bytes, filename: str) -> Tuple[str, dict]:
+    def extract_text(self, document: PDFDocument) -> Tuple[str, dict]:
         """
-        Extract text from PDF file content.
+        Extract text from a PDF document.
+        
+        Each page is read with PyPDF2 first; pages that come back empty or
+        look like a column layout are escalated to pdfplumber's layout
+        analysis, and image-only pages are flagged for OCR.
         
         Args:
-            file_content: PDF file bytes
-            filename: Original filename
+            document: Document handle (see open())
             
         Returns:
             Tuple of (extracted_text, metadata)
         """
         start_time = time.time()
+        self._check_extension(document)
         
-        # Validate file extension
-        file_path = Path(filename)
-        if file_path.suffix.lower() not in self.supported_extensions:
-            raise ValueError(f"Unsupported file type: {file_path.suffix}")
+        page_details = None
+        if self.strategy == 'adaptive':
+            try:
+                page_details = [self._extract_page_pypdf2(page, page_num)
+                                for page_num, page in enumerate(document.reader.pages, 1)]
+                escalate = [i for i, page in enumerate(page_details) if page['escalate']]
+            except Exception as e:
+                logger.warning(f"PyPDF2 could not read the document, using layout analysis for all pages: {e}")
+        
+        if page_details is None:
+            page_details = [{'page': i + 1, 'text': "", 'method': METHOD_NONE, 'time': 0.0}
+                            for i in range(len(document.plumber.pages))]
+            escalate = list(range(len(page_details)))
         
-        # Try pdfplumber first (better for complex layouts)
-        text, metadata = self._extract_with_pdfplumber(file_content, filename)
+        if escalate:
+            logger.info(f"Layout analysis for {len(escalate)}/{len(page_details)} pages")
+            self._extract_with_pdfplumber(document, escalate, page_details)
         
-        # If pdfplumber fails or returns minimal text, try PyPDF2
-        if not text or len(text.strip()) < 100:
-            logger.info("pdfplumber extraction yielded minimal text, trying PyPDF2")
-            text, metadata = self._extract_with_pypdf2(file_content, filename)
+        return self.build_result(document, page_details, time.time() - start_time)
+    
+    def iter_pages(self, document: PDFDocument) -> Iterator[dict]:
+        """
+        Extract pages one at a time, in order, yielding each as soon as it is done.
+        
+        Uses the same per-page method selection as extract_text, without the
+        process pool, so the first pages arrive quickly.
         
-        extraction_time = time.time() - start_time
-        metadata['extraction_time'] = extraction_time
-        metadata['text_length'] = len(text)
+        Yields:
+            Page details: page (1-based), text, method, time (seconds), needs_ocr
+        """
+        self._check_extension(document)
         
-        logger.info(f"PDF extraction completed in {extraction_time:.2f}s, extracted {len(text)} characters")
+        pages = None
+        if self.strategy == 'adaptive':
+            try:
+                pages = document.reader.pages
+                page_count = len(pages)
+            except Exception as e:
+                logger.warning(f"PyPDF2 could not read the document, using layout analysis for all pages: {e}")
+                pages = None
+        if pages is None:
+            page_count = len(document.plumber.pages)
+        
+        for index in range(page_count):
+            if pages is not None:
+                details = self._extract_page_pypdf2(pages[index], index + 1)
+            else:
+                details = {'page': index + 1, 'text': "", 'method': METHOD_NONE, 'time': 0.0, 'escalate': True}
+            if details['escalate']:
+                text, method, needs_ocr, elapsed = self._extract_page_layout(document, index)
+                details.update(text=text, method=method, needs_ocr=needs_ocr, time=details['time'] + elapsed)
+            yield details
+    
+    def build_result(self, document: PDFDocument, page_details: List[dict], extraction_time: float) -> Tuple[str, dict]:
+        """
+        Join extracted pages into the document text and metadata.
+        
+        Args:
+            document: Document handle the pages came from
+            page_details: Per-page details in page order
+            extraction_time: Total extraction time in seconds
+            
+        Returns:
+            Tuple of (extracted_text, metadata)
+        """
+        # Join page texts, recording each page's [start, end) offsets in the result
+        text_parts = []
+        page_offsets = []
+        offset = 0
+        for page in page_details:
+            if page['text']:
+                if text_parts:
+                    offset += 2
+                text_parts.append(page['text'])
+                page_offsets.append([offset, offset + len(page['text'])])
+                offset += len(page['text'])
+            else:
+                page_offsets.append([offset, offset])
+        text = '\n\n'.join(text_parts)
+        
+        methods: Dict[str, int] = {}
+        for page in page_details:
+            methods[page['method']] = methods.get(page['method'], 0) + 1
+        ocr_pages = [page['page'] for page in page_details if page.get('needs_ocr')]
+        
+        metadata = {
+            'filename': document.filename,
+            'pages': len(page_details),
+            'size_bytes': document.size_bytes,
+            'method': self.strategy,
+            'methods': methods,
+            'ocr_pages': ocr_pages,
+            'page_details': [
+                {
+                    'page': page['page'],
+                    'method': page['method'],
+                    'time_ms': round(page['time'] * 1000, 2),
+                    'text_length': len(page['text']),
+                    'needs_ocr': bool(page.get('needs_ocr'))
+                }
+                for page in page_details
+            ],
+            'page_offsets': page_offsets,
+            'extraction_time': extraction_time,
+            'text_length': len(text),
+            'parse_count': document.parse_count
+        }
+        
+        logger.info(f"PDF extraction completed in {extraction_time:.2f}s, extracted {len(text)} characters, "
+                    f"methods {methods}, parsed {document.parse_count}x {document.parses}")
+        if ocr_pages:
+            logger.info(f"Pages needing OCR: {ocr_pages}")
         
         return text, metadata
     
-    def _extract_with_pdfplumber(self, file_content: bytes, filename: str) -> Tuple[str, dict]:
-        """Extract text using pdfplumber."""
+    def _check_extension(self, document: PDFDocument):
+        file_path = Path(document.filename)
+        if file_path.suffix.lower() not in self.supported_extensions:
+            raise ValueError(f"Unsupported file type: {file_path.suffix}")
+    
+    def _extract_page_pypdf2(self, page, page_num: int) -> dict:
+        """Fast path: extract one page with PyPDF2 and decide whether it needs layout analysis."""
+        page_start = time.time()
+        x_starts = []
+        
+        def record_position(run_text, cm, tm, font, font_size):
+            if run_text.strip():
+                x_starts.append(tm[4] * cm[0] + cm[4])
+        
         try:
-            with pdfplumber.open(io.BytesIO(file_content)) as pdf:
-                text_parts = []
-                pages = len(pdf.pages)
-                
-                for page_num, page in enumerate(pdf.pages, 1):
-                    try:
-                        page_text = page.extract_text()
-                        if page_text:
-                            text_parts.append(page_text)
-                        logger.debug(f"Extracted text from page {page_num}")
-                    except Exception as e:
-                        logger.warning(f"Failed to extract text from page {page_num}: {e}")
-                        continue
-                
-                text = '\n\n'.join(text_parts)
-                
-                metadata = {
-                    'filename': filename,
-                    'pages': pages,
-                    'size_bytes': len(file_content),
-                    'method': 'pdfplumber'
-                }
-                
-                return text, metadata
-                
+            page_text = page.extract_text(visitor_text=record_position) or ""
+            width = float(page.mediabox.width)
         except Exception as e:
-            logger.error(f"pdfplumber extraction failed: {e}")
-            return "", {}
+            logger.warning(f"Failed to extract text from page {page_num} using PyPDF2: {e}")
+            page_text, width = "", None
+        
+        escalate = needs_layout_analysis(page_text, x_starts, width)
+        return {
+            'page': page_num,
+            'text': "" if escalate else page_text,
+            'method': METHOD_PYPDF2,
+            'time': time.time() - page_start,
+            'escalate': escalate
+        }
     
-    def _extract_with_pypdf2(self, file_content: bytes, filename: str) -> Tuple[str, dict]:
-        """Extract text using PyPDF2 as fallback."""
+    def _extract_page_layout(self, document: PDFDocument, index: int) -> Tuple[str, str, bool, float]:
+        """Layout path: extract one page (0-based index) with pdfplumber."""
+        page_start = time.time()
         try:
-            pdf_file = io.BytesIO(file_content)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            
-            text_parts = []
-            pages = len(pdf_reader.pages)
-            
-            for page_num, page in enumerate(pdf_reader.pages, 1):
-                try:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text_parts.append(page_text)
-                    logger.debug(f"Extracted text from page {page_num} using PyPDF2")
-                except Exception as e:
-                    logger.warning(f"Failed to extract text from page {page_num} using PyPDF2: {e}")
-                    continue
-            
-            text = '\n\n'.join(text_parts)
-            
-            metadata = {
-                'filename': filename,
-                'pages': pages,
-                'size_bytes': len(file_content),
-                'method': 'pypdf2'
-            }
-            
-            return text, metadata
-            
+            text, method, needs_ocr = extract_page_layout(document.plumber.pages[index])
         except Exception as e:
-            logger.error(f"PyPDF2 extraction failed: {e}")
-            return "", {}
+            logger.warning(f"Failed to extract text from page {index + 1}: {e}")
+            text, method, needs_ocr = "", METHOD_NONE, False
+        return text, method, needs_ocr, time.time() - page_start
+    
+    def _extract_with_pdfplumber(self, document: PDFDocument, page_numbers: List[int], page_details: List[dict]):
+        """Layout pass: re-extract the given pages with pdfplumber, updating page_details in place."""
+        if self.workers > 1 and len(page_numbers) >= self.parallel_min_pages:
+            results = self._extract_pages_parallel(document, page_numbers)
+        else:
+            results = [self._extract_page_layout(document, page_num) for page_num in page_numbers]
+        
+        for page_num, (text, method, needs_ocr, elapsed) in zip(page_numbers, results):
+            details = page_details[page_num]
+            details['text'] = text
+            details['method'] = method
+            details['needs_ocr'] = needs_ocr
+            details['time'] += elapsed
+    
+    def _extract_pages_parallel(self, document: PDFDocument, page_numbers: List[int]) -> List[Tuple[str, str, bool, float]]:
+        """
+        Run layout extraction for the given pages across the process pool.
+        
+        Every worker opens the document's file independently: the spooled
+        upload when it is on disk, otherwise a temp file the content is
+        written to once. Results are returned in the order of page_numbers.
+        """
+        start_time = time.time()
+        chunks = partition_pages(page_numbers, self.workers)
+        
+        spooled = document.path is not None
+        if spooled:
+            path = document.path
+        else:
+            fd, path = tempfile.mkstemp(suffix='.pdf')
+        try:
+            if not spooled:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(document.content)
+            
+            pool = _get_process_pool(self.workers)
+            futures = [pool.submit(_extract_pages_worker, path, chunk) for chunk in chunks]
+            results = [result for future in futures for result in future.result()]
+            # Each chunk is parsed separately in its worker
+            document.record_parse('pdfplumber-worker', len(chunks))
+        finally:
+            if not spooled:
+                os.remove(path)
+        
+        elapsed = time.time() - start_time
+        pages = len(page_numbers)
+        logger.info(f"Parallel extraction: {pages} pages in {len(chunks)} chunks on {self.workers} workers, "
+                    f"{elapsed:.2f}s ({pages / elapsed if elapsed > 0 else 0:.1f} pages/s)")
+        return results
     
-    def validate_pdf(self, file_content: bytes, filename: str) -> bool:
+    def validate_pdf(self, document: PDFDocument) -> bool:
         """
         Validate if the file is a valid PDF.
         
         Args:
-            file_content: File bytes
-            filename: Original filename
+            document: Document handle
             
         Returns:
             True if valid PDF, False otherwise
         """
-        try:
-            # Check file extension
-            if not filename.lower().endswith('.pdf'):
-                return False
-            
-            # Check PDF magic number
-            if not file_content.startswith(b'%PDF'):
-                return False
-            
-            # Try to open with pdfplumber
-            with pdfplumber.open(io.BytesIO(file_content)) as pdf:
-                if len(pdf.pages) == 0:
-                    return False
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"PDF validation failed: {e}")
-            return False
+        return document.is_valid()
     
-    def get_pdf_info(self, file_content: bytes, filename: str) -> dict:
+    def get_pdf_info(self, document: PDFDocument) -> dict:
         """
         Get basic information about the PDF without extracting text.
         
         Args:
-            file_content: PDF file bytes
-            filename: Original filename
+            document: Document handle
             
         Returns:
             Dictionary with PDF metadata
         """
         try:
-            with pdfplumber.open(io.BytesIO(file_content)) as pdf:
-                return {
-                    'filename': filename,
-                    'pages': len(pdf.pages),
-                    'size_bytes': len(file_content),
-                    'valid': True
-                }
+            return {
+                'filename': document.filename,
+                'pages': document.page_count,
+                'size_bytes': document.size_bytes,
+                'metadata': document.metadata,
+                'parse_count': document.parse_count,
+                'valid': True
+            }
         except Exception as e:
             logger.error(f"Failed to get PDF info: {e}")
             return {
-                'filename': filename,
+                'filename': document.filename,
                 'pages': 0,
-                'size_bytes': len(file_content),
+                'size_bytes': document.size_bytes,
                 'valid': False,
                 'error': str(e)
             }
-
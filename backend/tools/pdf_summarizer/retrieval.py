@@ -0,0 +1,215 @@
+"""
+BM25 passage retrieval for PDF chat.
+
+At upload the document is split into overlapping passages and indexed in an
+inverted BM25 index (stored with the document). Each chat turn then sends
+Gemini only the top-k passages for the question plus a short outline,
+instead of the whole document.
+"""
+import bisect
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+from core.metrics import LatencyStats
+
+# Bump when chunking or scoring changes; stored indexes from other versions are rebuilt
+INDEX_VERSION = 1
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by can could did do does for from had has have how i if in into is it its
+may might more most not of on or our should so than that the their them then there these they this those
+to was we were what when where which while who why will with would you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords."""
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def chunk_document(text: str, page_offsets: Optional[List[List[int]]] = None,
+                   chunk_words: int = 180, overlap_words: int = 40) -> List[Dict[str, Any]]:
+    """
+    Split text into overlapping word windows.
+
+    Args:
+        text: Document text
+        page_offsets: Per-page [start, end) offsets into text, to label passages with pages
+        chunk_words: Words per passage
+        overlap_words: Words shared by consecutive passages
+
+    Returns:
+        List of passages: {"start", "end", "page"} (text offsets and page number)
+    """
+    words = [(match.start(), match.end()) for match in re.finditer(r"\S+", text)]
+    if not words:
+        return []
+
+    page_starts = [start for start, end in page_offsets or [] if end > start]
+    page_numbers = [number for number, (start, end) in enumerate(page_offsets or [], 1) if end > start]
+
+    passages = []
+    step = max(1, chunk_words - overlap_words)
+    for first in range(0, len(words), step):
+        last = min(first + chunk_words, len(words)) - 1
+        start, end = words[first][0], words[last][1]
+        passages.append({"start": start, "end": end, "page": _page_at(start, page_starts, page_numbers)})
+        if last == len(words) - 1:
+            break
+    return passages
+
+
+def _page_at(offset: int, page_starts: List[int], page_numbers: List[int]) -> Optional[int]:
+    position = bisect.bisect_right(page_starts, offset) - 1
+    return page_numbers[position] if position >= 0 else None
+
+
+def build_outline(text: str, max_items: int = 20) -> List[str]:
+    """
+    Short outline of the document: lines that look like headings
+    (numbered sections, "Chapter ..." or short title-case lines).
+    """
+    outline = []
+    seen = set()
+    for line in text.splitlines():
+        line = line.strip()
+        if not 3 <= len(line) <= 80 or line.endswith(('.', ',', ';')) or line.lower() in seen:
+            continue
+        words = line.split()
+        numbered = re.match(r"^(\d+(\.\d+)*\.?|chapter|section|part|appendix)\s", line, re.IGNORECASE)
+        titled = len(words) <= 8 and sum(word[0].isupper() for word in words if word[0].isalpha()) >= max(1, len(words) - 1)
+        if numbered or titled:
+            outline.append(line)
+            seen.add(line.lower())
+            if len(outline) >= max_items:
+                break
+    return outline
+
+
+class BM25Index:
+    """Inverted BM25 index over document passages (stored as offsets into the text)."""
+
+    def __init__(self, text: str, passages: List[Dict[str, Any]], postings: Dict[str, List[List[int]]],
+                 lengths: List[int], outline: Optional[List[str]] = None):
+        self.text = text
+        self.passages = passages
+        self.postings = postings
+        self.lengths = lengths
+        self.outline = outline or []
+        self.average_length = sum(lengths) / len(lengths) if lengths else 0.0
+
+    @classmethod
+    def build(cls, text: str, page_offsets: Optional[List[List[int]]] = None) -> "BM25Index":
+        """Chunk a document and index its passages."""
+        passages = chunk_document(text, page_offsets)
+        postings: Dict[str, List[List[int]]] = {}
+        lengths = []
+        for index, passage in enumerate(passages):
+            tokens = tokenize(text[passage["start"]:passage["end"]])
+            lengths.append(len(tokens))
+            for term, frequency in Counter(tokens).items():
+                postings.setdefault(term, []).append([index, frequency])
+        return cls(text, passages, postings, lengths, build_outline(text))
+
+    def search(self, query: str, k: int = 6) -> List[Tuple[Dict[str, Any], float]]:
+        """Top-k passages for the query as (passage, score), best first."""
+        scores: Dict[int, float] = {}
+        count = len(self.passages)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for index, frequency in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[index] / (self.average_length or 1))
+                scores[index] = scores.get(index, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.passages[index], score) for index, score in best]
+
+    def passage_text(self, passage: Dict[str, Any]) -> str:
+        return self.text[passage["start"]:passage["end"]]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable form, without the document text."""
+        return {
+            "version": INDEX_VERSION,
+            "passages": self.passages,
+            "postings": self.postings,
+            "lengths": self.lengths,
+            "outline": self.outline,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], text: str) -> Optional["BM25Index"]:
+        """Load a stored index for the given text, or None if it was built by another index version."""
+        if data.get("version") != INDEX_VERSION:
+            return None
+        return cls(text, data["passages"], data["postings"], data["lengths"], data.get("outline"))
+
+
+def build_chat_context(index: BM25Index, query: str, k: int) -> Tuple[str, List[int]]:
+    """
+    Prompt context for one chat turn: the outline plus the top-k passages in document order.
+
+    Returns:
+        Tuple of (context text, page numbers of the passages used)
+    """
+    results = index.search(query, k)
+    if not results:
+        # Nothing matched (e.g. "summarize this"): fall back to the opening passages
+        results = [(passage, 0.0) for passage in index.passages[:k]]
+    results.sort(key=lambda item: item[0]["start"])
+
+    parts = []
+    if index.outline:
+        parts.append("Document outline:\n" + "\n".join(f"- {item}" for item in index.outline))
+    for passage, _ in results:
+        label = f"[Page {passage['page']}]" if passage.get("page") else "[Excerpt]"
+        parts.append(f"{label}\n{index.passage_text(passage)}")
+
+    pages = sorted({passage["page"] for passage, _ in results if passage.get("page")})
+    return "\n\n".join(parts), pages
+
+
+class ChatContextMetrics:
+    """Prompt size and answer latency per chat context mode ("full" or "retrieval")."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._modes: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, mode: str, prompt_tokens: int, seconds: float, retrieval_seconds: float = 0.0):
+        with self._lock:
+            stats = self._modes.setdefault(mode, {
+                "turns": 0, "prompt_tokens": 0, "latency": LatencyStats(), "retrieval": LatencyStats()
+            })
+            stats["turns"] += 1
+            stats["prompt_tokens"] += prompt_tokens
+        stats["latency"].record(seconds)
+        stats["retrieval"].record(retrieval_seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            modes = dict(self._modes)
+        return {
+            mode: {
+                "turns": stats["turns"],
+                "mean_prompt_tokens": round(stats["prompt_tokens"] / stats["turns"], 1) if stats["turns"] else 0.0,
+                "latency": stats["latency"].snapshot(),
+                "retrieval": stats["retrieval"].snapshot(),
+            }
+            for mode, stats in modes.items()
+        }
+
+
+chat_context_metrics = ChatContextMetrics()
+
@@ -1,18 +1,33 @@
 """
 FastAPI router for PDF Summarizer endpoints.
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from fastapi.responses import JSONResponse
-import os
+from fastapi import APIRouter, HTTPException, Depends, Request, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import hashlib
+import time
 import logging
-from typing import Optional
+import threading
+from typing import Iterator, Optional, Tuple
+
+from core.cache import TTLCache
+from core.config import settings
+from core.llm import get_llm_gateway, LLMUnavailable, llm_stats
+from core.streaming import stream_format, format_event, MEDIA_TYPES, STREAM_HEADERS
 
 from .models import (
-    SummarizeRequest, SummarizeResponse, ChatRequest, ChatResponse,
+    SummarizeRequest, SummarizeResponse, AnalyzeRequest, AnalyzeResponse, ChatRequest, ChatResponse,
     PDFExtractResponse, PDFInfo, SummaryStyle
 )
 from .pdf_extractor import PDFExtractor
-from .summarizer import PDFSummarizer
+from .extraction_cache import get_extraction_cache
+from .document_store import get_document_store
+from .retrieval import BM25Index, build_chat_context, chat_context_metrics
+from .pdf_document import PDFDocument
+from .upload import receive_upload, SpooledUpload, UploadTooLarge, InvalidUpload, UPLOAD_OPENAPI
+from .summarizer import PDFSummarizer, MODEL_NAME, section_summary_cache
+from .chat_history import session_key
 
 logger = logging.getLogger(__name__)
 
@@ -22,60 +37,249 @@ router = APIRouter(prefix="/pdf-summarizer", tags=["PDF Summarizer"])
 # Initialize components
 pdf_extractor = PDFExtractor()
 
+# Search indexes of chat contexts sent as text rather than a document_id, by text hash,
+# so later turns of the conversation don't rebuild them
+context_index_cache = TTLCache(max_size=settings.PDF_CHAT_INDEX_CACHE_SIZE, ttl=3600.0)
+
+_summarizer: Optional[PDFSummarizer] = None
+_summarizer_lock = threading.Lock()
+
 def get_summarizer() -> PDFSummarizer:
-    """Dependency to get PDF summarizer instance."""
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="Gemini API key not configured")
-    return PDFSummarizer(api_key)
+    """Dependency to get the shared PDF summarizer instance."""
+    global _summarizer
+    if _summarizer is None:
+        with _summarizer_lock:
+            if _summarizer is None:
+                try:
+                    _summarizer = PDFSummarizer(get_llm_gateway())
+                except LLMUnavailable as e:
+                    raise HTTPException(status_code=500, detail=str(e))
+    return _summarizer
+
+
+INSUFFICIENT_TEXT = "Could not extract sufficient text from PDF. The PDF might be scanned or image-based."
+
+
+async def _receive_pdf(request: Request) -> SpooledUpload:
+    """Receive a multipart PDF upload, mapping upload errors to HTTP errors."""
+    try:
+        upload = await receive_upload(request)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not upload.filename.lower().endswith('.pdf'):
+        upload.close()
+        raise HTTPException(status_code=400, detail="Only PDF files are supported")
+    return upload
+
+
+def _get_cached_extraction(upload: SpooledUpload) -> Optional[Tuple[str, dict]]:
+    """Look up a previous extraction of the same bytes in the extraction cache."""
+    extraction_cache = get_extraction_cache()
+    if not extraction_cache:
+        return None
+    
+    start_time = time.time()
+    cached = extraction_cache.get(upload.sha256)
+    if cached:
+        text, metadata = cached
+        metadata.update(
+            filename=upload.filename,
+            extraction_time=time.time() - start_time,
+            parse_count=0
+        )
+        logger.info(f"Extraction cache hit for {upload.sha256[:12]} ({metadata['pages']} pages)")
+    return cached
+
+
+def _open_upload(upload: SpooledUpload) -> PDFDocument:
+    """Document handle on an upload's content (blocking: reads or memory-maps the spooled file)."""
+    return pdf_extractor.open(upload.content(), upload.filename, path=upload.path)
+
+
+def _extract_upload(upload: SpooledUpload) -> Tuple[str, dict]:
+    """Validate and extract an uploaded PDF (blocking)."""
+    # Parse once from the spooled file; validation and extraction share the document handle
+    with _open_upload(upload) as document:
+        if not pdf_extractor.validate_pdf(document):
+            raise HTTPException(status_code=400, detail="Invalid or corrupted PDF file")
+        return pdf_extractor.extract_text(document)
+
+
+def _resolve_text(text: Optional[str], document_id: Optional[str], name: str = "Text") -> str:
+    """Get the text to work on, from the document store when a document_id is given (blocking: disk read)."""
+    if document_id:
+        document = get_document_store().get(document_id)
+        if document is None:
+            raise HTTPException(status_code=404, detail="Document not found or expired. Please upload the PDF again.")
+        return document['text']
+    
+    if not text or len(text.strip()) < 50:
+        raise HTTPException(status_code=400, detail=f"{name} must be at least 50 characters long")
+    return text
+
+
+def _store_document(text: str, metadata: dict) -> str:
+    """Save an extracted document with its search index; returns the document_id."""
+    document_store = get_document_store()
+    document_id = document_store.put(text, metadata)
+    if len(text) > settings.PDF_CHAT_FULL_CONTEXT_CHARS:
+        start_time = time.time()
+        index = BM25Index.build(text, metadata.get('page_offsets'))
+        document_store.set_artifact(document_id, "bm25", index.to_dict())
+        logger.info(f"Indexed {len(index.passages)} passages in {time.time() - start_time:.3f}s")
+    return document_id
+
+
+def _get_search_index(document_id: Optional[str], text: str) -> BM25Index:
+    """
+    Stored search index of a document, rebuilding it if missing or outdated (blocking).
+    
+    Without a document_id, the index of the text is cached in memory.
+    """
+    if not document_id:
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        index = context_index_cache.get(key)
+        if index is None:
+            index = BM25Index.build(text)
+            context_index_cache.set(key, index)
+        return index
+    
+    document_store = get_document_store()
+    data = document_store.get_artifact(document_id, "bm25")
+    index = BM25Index.from_dict(data, text) if data else None
+    if index is not None:
+        return index
+    
+    document = document_store.get(document_id)
+    index = BM25Index.build(text, document['page_offsets'] if document else None)
+    document_store.set_artifact(document_id, "bm25", index.to_dict())
+    return index
+
+
+def _prepare_chat_context(request: ChatRequest) -> Tuple[str, str, Optional[list], float]:
+    """
+    Validate a chat request and build its PDF context.
+    
+    Long documents are reduced to the passages relevant to the recent questions.
+    Blocking (document store reads, index building): run it in the threadpool.
+    
+    Returns:
+        Tuple of (context, context mode "full" or "retrieval", source pages, retrieval seconds)
+    """
+    if not request.messages:
+        raise HTTPException(status_code=400, detail="At least one message is required")
+    
+    pdf_context = _resolve_text(request.pdf_context, request.document_id, name="PDF context")
+    if len(pdf_context) <= settings.PDF_CHAT_FULL_CONTEXT_CHARS:
+        return pdf_context, "full", None, 0.0
+    
+    start_time = time.time()
+    index = _get_search_index(request.document_id, pdf_context)
+    query = " ".join([message.content for message in request.messages if message.role == "user"][-2:])
+    pdf_context, source_pages = build_chat_context(index, query, settings.PDF_CHAT_TOP_K)
+    return pdf_context, "retrieval", source_pages, time.time() - start_time
+
 
+def _chat_session(request: ChatRequest) -> str:
+    """Session key for the rolling history summary of a chat request."""
+    return session_key(request.session_id, request.document_id or request.pdf_context or "",
+                       request.messages[0].content)
 
-@router.post("/upload", response_model=PDFExtractResponse)
+
+def _llm_error(error_msg: str, default_detail: str) -> Tuple[int, str]:
+    """Map a generation error message to an HTTP status code and user-facing detail."""
+    if "quota" in error_msg.lower() or "429" in error_msg:
+        return 429, "API quota exceeded. Please wait a few minutes or check your billing plan."
+    elif "rate limit" in error_msg.lower():
+        return 429, "Rate limit exceeded. Please wait before making another request."
+    elif "model" in error_msg.lower() and "not found" in error_msg.lower():
+        return 503, "AI model not available. Please check the model configuration."
+    elif "api key" in error_msg.lower():
+        return 401, "Invalid API key. Please check your Gemini API configuration."
+    return 500, f"{default_detail}: {error_msg}"
+
+
+async def _stream_events(http_request: Request, upstream, fmt: str, default_detail: str):
+    """
+    Forward generation events to the client; an error becomes a final error event.
+    
+    Stops and closes the upstream generation (cancelling the Gemini call)
+    when the client disconnects.
+    """
+    try:
+        async for event in upstream:
+            if await http_request.is_disconnected():
+                logger.info("Client disconnected, cancelling generation")
+                break
+            yield format_event(event, fmt)
+    except Exception as e:
+        logger.error(f"Streaming generation failed: {e}")
+        status_code, detail = _llm_error(str(e), default_detail)
+        yield format_event({"type": "error", "status_code": status_code, "detail": detail}, fmt)
+    finally:
+        await upstream.aclose()
+
+
+def _build_pdf_info(metadata: dict, content_hash: str, cached: bool) -> PDFInfo:
+    return PDFInfo(
+        filename=metadata['filename'],
+        pages=metadata['pages'],
+        size_bytes=metadata['size_bytes'],
+        text_length=metadata['text_length'],
+        extraction_time=metadata['extraction_time'],
+        parse_count=metadata['parse_count'],
+        methods=metadata['methods'],
+        ocr_pages=metadata['ocr_pages'],
+        page_details=metadata['page_details'],
+        content_hash=content_hash,
+        cached=cached
+    )
+
+
+@router.post("/upload", response_model=PDFExtractResponse, openapi_extra=UPLOAD_OPENAPI)
 async def upload_and_extract_pdf(
-    file: UploadFile = File(...),
+    request: Request,
     summarizer: PDFSummarizer = Depends(get_summarizer)
 ):
     """
     Upload a PDF file and extract its text content.
     
+    The multipart body is streamed to a spooled temp file and hashed as it
+    arrives; uploads over PDF_MAX_UPLOAD_BYTES are rejected with 413.
+    
     Args:
-        file: PDF file to upload
+        request: Multipart request with the PDF in the `file` field
         summarizer: PDF summarizer instance
         
     Returns:
         Extracted text and PDF metadata
     """
     try:
-        # Validate file
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="Only PDF files are supported")
-        
-        # Read file content
-        file_content = await file.read()
-        
-        # Validate PDF
-        if not pdf_extractor.validate_pdf(file_content, file.filename):
-            raise HTTPException(status_code=400, detail="Invalid or corrupted PDF file")
-        
-        # Extract text
-        text, metadata = pdf_extractor.extract_text(file_content, file.filename)
+        with await _receive_pdf(request) as upload:
+            # Identical uploads are served from the content-addressed extraction cache
+            cached = await run_in_threadpool(_get_cached_extraction, upload)
+            
+            if cached:
+                text, metadata = cached
+            else:
+                # Parsing blocks (on the process pool for large documents), so it runs off the event loop
+                text, metadata = await run_in_threadpool(_extract_upload, upload)
         
         if not text or len(text.strip()) < 50:
-            raise HTTPException(
-                status_code=400, 
-                detail="Could not extract sufficient text from PDF. The PDF might be scanned or image-based."
-            )
+            raise HTTPException(status_code=400, detail=INSUFFICIENT_TEXT)
         
-        # Create response
-        pdf_info = PDFInfo(
-            filename=metadata['filename'],
-            pages=metadata['pages'],
-            size_bytes=metadata['size_bytes'],
-            text_length=metadata['text_length'],
-            extraction_time=metadata['extraction_time']
-        )
+        extraction_cache = get_extraction_cache()
+        if extraction_cache and not cached:
+            # Writing the entry may start a garbage collection pass over the cache directory
+            await run_in_threadpool(extraction_cache.set, upload.sha256, text, metadata)
+        
+        document_id = await run_in_threadpool(_store_document, text, metadata)
         
-        return PDFExtractResponse(text=text, info=pdf_info)
+        pdf_info = _build_pdf_info(metadata, upload.sha256, bool(cached))
+        return PDFExtractResponse(text=text, info=pdf_info, document_id=document_id)
         
     except HTTPException:
         raise
@@ -84,16 +288,146 @@ async def upload_and_extract_pdf(
         raise HTTPException(status_code=500, detail=f"Failed to process PDF: {str(e)}")
 
 
+@router.post("/upload/stream", openapi_extra=UPLOAD_OPENAPI)
+async def upload_and_stream_pdf(
+    request: Request,
+    stream: Optional[str] = Query(default=None, alias="format")
+):
+    """
+    Upload a PDF file and stream its text page by page.
+    
+    Emits one event per page as soon as it is extracted
+    ({"type": "page", "page", "text", "method", "time_ms", "needs_ocr"}),
+    then a final {"type": "metadata", "info": PDFInfo, "document_id"} event, or
+    {"type": "error", "detail"} if extraction fails part way.
+    
+    Args:
+        request: Multipart request with the PDF in the `file` field
+        stream: `format` query parameter, "ndjson" or "sse" (default: SSE if the Accept header asks for it, else NDJSON)
+        
+    Returns:
+        Streaming NDJSON or Server-Sent Events response
+    """
+    fmt = stream_format(request, stream)
+    upload = await _receive_pdf(request)
+    document = None
+    try:
+        cached = await run_in_threadpool(_get_cached_extraction, upload)
+        if not cached:
+            document = await run_in_threadpool(_open_upload, upload)
+            if not await run_in_threadpool(pdf_extractor.validate_pdf, document):
+                raise HTTPException(status_code=400, detail="Invalid or corrupted PDF file")
+    except BaseException:
+        if document is not None:
+            document.close()
+        upload.close()
+        raise
+    
+    # Pages are extracted in worker threads under this lock, and the handles are closed
+    # under it too, so closing waits for a page still being extracted (e.g. on disconnect)
+    extraction_lock = threading.Lock()
+    pages = pdf_extractor.iter_pages(document) if document is not None else None
+    
+    def close():
+        with extraction_lock:
+            if pages is not None:
+                pages.close()
+            if document is not None:
+                document.close()
+            upload.close()
+    
+    async def events():
+        try:
+            if cached:
+                async for event in _cached_page_events(*cached, upload.sha256):
+                    yield format_event(event, fmt)
+            else:
+                async for event in _extracted_page_events(document, pages, extraction_lock, upload.sha256):
+                    yield format_event(event, fmt)
+        except Exception as e:
+            logger.error(f"Streaming PDF extraction failed: {e}")
+            yield format_event({"type": "error", "detail": f"Failed to process PDF: {str(e)}"}, fmt)
+        finally:
+            # Not awaited: after a disconnect the await would be cancelled as well
+            asyncio.get_running_loop().run_in_executor(None, close)
+    
+    return StreamingResponse(events(), media_type=MEDIA_TYPES[fmt], headers=STREAM_HEADERS)
+
+
+def _next_page(pages: Iterator[dict], lock: threading.Lock) -> Optional[dict]:
+    """Extract the next page (None at the end), holding the lock so the document isn't closed meanwhile."""
+    with lock:
+        return next(pages, None)
+
+
+async def _extracted_page_events(document: PDFDocument, pages: Iterator[dict], lock: threading.Lock,
+                                 content_hash: str):
+    """
+    Extract pages in a worker thread, yielding an event per page, then the metadata event.
+    
+    The caller closes the page iterator and the document under the same lock.
+    """
+    start_time = time.time()
+    page_details = []
+    while True:
+        page = await run_in_threadpool(_next_page, pages, lock)
+        if page is None:
+            break
+        page_details.append(page)
+        yield {
+            "type": "page",
+            "page": page['page'],
+            "text": page['text'],
+            "method": page['method'],
+            "time_ms": round(page['time'] * 1000, 2),
+            "needs_ocr": bool(page.get('needs_ocr'))
+        }
+    
+    text, metadata = pdf_extractor.build_result(document, page_details, time.time() - start_time)
+    if not text or len(text.strip()) < 50:
+        yield {"type": "error", "detail": INSUFFICIENT_TEXT}
+        return
+    
+    extraction_cache = get_extraction_cache()
+    if extraction_cache:
+        await run_in_threadpool(extraction_cache.set, content_hash, text, metadata)
+    document_id = await run_in_threadpool(_store_document, text, metadata)
+    yield {
+        "type": "metadata",
+        "info": _build_pdf_info(metadata, content_hash, False).model_dump(),
+        "document_id": document_id
+    }
+
+
+async def _cached_page_events(text: str, metadata: dict, content_hash: str):
+    """Replay a cached extraction as page events, using the stored page offsets."""
+    for details, (start, end) in zip(metadata['page_details'], metadata['page_offsets']):
+        yield {
+            "type": "page",
+            "page": details['page'],
+            "text": text[start:end],
+            "method": details['method'],
+            "time_ms": details['time_ms'],
+            "needs_ocr": details['needs_ocr']
+        }
+    document_id = await run_in_threadpool(_store_document, text, metadata)
+    yield {
+        "type": "metadata",
+        "info": _build_pdf_info(metadata, content_hash, True).model_dump(),
+        "document_id": document_id
+    }
+
+
 @router.post("/summarize", response_model=SummarizeResponse)
 async def summarize_text(
     request: SummarizeRequest,
     summarizer: PDFSummarizer = Depends(get_summarizer)
 ):
     """
-    Generate a summary of the provided text.
+    Generate a summary of the provided text or uploaded document.
     
     Args:
-        request: Summarization request with text and parameters
+        request: Summarization request with text (or document_id) and parameters
         summarizer: PDF summarizer instance
         
     Returns:
@@ -101,23 +435,40 @@ async def summarize_text(
     """
     try:
         # Validate input
-        if not request.text or len(request.text.strip()) < 50:
-            raise HTTPException(status_code=400, detail="Text must be at least 50 characters long")
+        text = await run_in_threadpool(_resolve_text, request.text, request.document_id)
         
-        # Generate summary
-        result = summarizer.summarize(
-            text=request.text,
-            style=request.style,
-            max_length=request.max_length,
-            language=request.language
-        )
+        # Generate summary; long texts (and texts summarized before) are summarized section by
+        # section, concurrently, and the cached section summaries are reused for other styles,
+        # lengths and languages
+        if await summarizer.use_sections(text, settings.PDF_SUMMARY_SECTION_TOKENS,
+                                         settings.PDF_SUMMARY_REUSE_MIN_TOKENS):
+            result = await summarizer.summarize_map_reduce(
+                text=text,
+                style=request.style,
+                max_length=request.max_length,
+                language=request.language,
+                section_tokens=settings.PDF_SUMMARY_SECTION_TOKENS,
+                concurrency=settings.PDF_SUMMARY_CONCURRENCY
+            )
+        else:
+            result = await summarizer.summarize(
+                text=text,
+                style=request.style,
+                max_length=request.max_length,
+                language=request.language
+            )
         
         return SummarizeResponse(
             summary=result['summary'],
             style=result['style'],
             original_length=result['original_length'],
             summary_length=result['summary_length'],
-            processing_time=result['processing_time']
+            processing_time=result['processing_time'],
+            mode=result.get('mode', 'single'),
+            sections=result.get('sections'),
+            phase_times=result.get('phase_times'),
+            concurrency=result.get('concurrency'),
+            cache_hits=result.get('cache_hits')
         )
         
     except HTTPException:
@@ -127,6 +478,94 @@ async def summarize_text(
         raise HTTPException(status_code=500, detail=f"Failed to generate summary: {str(e)}")
 
 
+@router.post("/summarize/stream")
+async def summarize_text_stream(
+    request: SummarizeRequest,
+    http_request: Request,
+    stream: Optional[str] = Query(default=None, alias="format"),
+    summarizer: PDFSummarizer = Depends(get_summarizer)
+):
+    """
+    Generate a summary, streaming it as it is generated.
+    
+    Emits {"type": "chunk", "text"} events as Gemini produces them, then a
+    final {"type": "done", "processing_time", "first_chunk_time",
+    "original_length", "summary_length", ...} event, or
+    {"type": "error", "status_code", "detail"}. Long texts are summarized by
+    section first and the final synthesis is streamed. The Gemini call is
+    cancelled if the client disconnects.
+    
+    Args:
+        request: Summarization request with text (or document_id) and parameters
+        http_request: Incoming request, to detect client disconnects
+        stream: `format` query parameter, "sse" (default) or "ndjson"
+        summarizer: PDF summarizer instance
+        
+    Returns:
+        Streaming Server-Sent Events (or NDJSON) response
+    """
+    fmt = stream_format(http_request, stream or "sse")
+    text = await run_in_threadpool(_resolve_text, request.text, request.document_id)
+    
+    map_reduce = await summarizer.use_sections(text, settings.PDF_SUMMARY_SECTION_TOKENS,
+                                               settings.PDF_SUMMARY_REUSE_MIN_TOKENS)
+    upstream = summarizer.summarize_stream(
+        text=text,
+        style=request.style,
+        max_length=request.max_length,
+        language=request.language,
+        map_reduce=map_reduce,
+        section_tokens=settings.PDF_SUMMARY_SECTION_TOKENS,
+        concurrency=settings.PDF_SUMMARY_CONCURRENCY
+    )
+    return StreamingResponse(
+        _stream_events(http_request, upstream, fmt, "Failed to generate summary"),
+        media_type=MEDIA_TYPES[fmt],
+        headers=STREAM_HEADERS
+    )
+
+
+@router.post("/analyze", response_model=AnalyzeResponse)
+async def analyze_text(
+    request: AnalyzeRequest,
+    summarizer: PDFSummarizer = Depends(get_summarizer)
+):
+    """
+    Generate a summary, key points and questions in one call.
+    
+    Sends the text to Gemini once and asks for a structured JSON response,
+    instead of separate /summarize, /key-points and /questions calls.
+    
+    Args:
+        request: Analysis request with text (or document_id) and parameters
+        summarizer: PDF summarizer instance
+        
+    Returns:
+        Summary, key points, questions and prompt token savings
+    """
+    try:
+        text = await run_in_threadpool(_resolve_text, request.text, request.document_id)
+        
+        result = await summarizer.analyze(
+            text=text,
+            style=request.style,
+            max_length=request.max_length,
+            language=request.language,
+            max_points=request.max_points,
+            num_questions=request.num_questions
+        )
+        
+        return AnalyzeResponse(**result)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        error_msg = str(e)
+        logger.error(f"Analysis failed: {error_msg}")
+        status_code, detail = _llm_error(error_msg, "Failed to analyze text")
+        raise HTTPException(status_code=status_code, detail=detail)
+
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat_about_pdf(
     request: ChatRequest,
@@ -136,29 +575,32 @@ async def chat_about_pdf(
     Chat with AI about PDF content.
     
     Args:
-        request: Chat request with messages and PDF context
+        request: Chat request with messages and PDF context (or document_id)
         summarizer: PDF summarizer instance
         
     Returns:
         AI response and metadata
     """
     try:
-        # Validate input
-        if not request.messages:
-            raise HTTPException(status_code=400, detail="At least one message is required")
-        
-        if not request.pdf_context or len(request.pdf_context.strip()) < 50:
-            raise HTTPException(status_code=400, detail="PDF context must be at least 50 characters long")
+        # Validate input; long documents: send only the passages relevant to the recent questions
+        pdf_context, context_mode, source_pages, retrieval_time = await run_in_threadpool(_prepare_chat_context, request)
         
         # Generate chat response
-        result = summarizer.chat_about_pdf(
+        result = await summarizer.chat_about_pdf(
             messages=request.messages,
-            pdf_context=request.pdf_context
+            pdf_context=pdf_context,
+            excerpts=context_mode == "retrieval",
+            session=_chat_session(request)
         )
+        chat_context_metrics.record(context_mode, result['prompt_tokens'], result['processing_time'], retrieval_time)
         
         return ChatResponse(
             response=result['response'],
-            processing_time=result['processing_time']
+            processing_time=result['processing_time'],
+            prompt_tokens=result['prompt_tokens'],
+            history_summarized=result['history_summarized'],
+            context_mode=context_mode,
+            source_pages=source_pages
         )
         
     except HTTPException:
@@ -168,22 +610,61 @@ async def chat_about_pdf(
         logger.error(f"Chat generation failed: {error_msg}")
         
         # Check for specific error types and return appropriate status codes
-        if "quota" in error_msg.lower() or "429" in error_msg:
-            raise HTTPException(status_code=429, detail="API quota exceeded. Please wait a few minutes or check your billing plan.")
-        elif "rate limit" in error_msg.lower():
-            raise HTTPException(status_code=429, detail="Rate limit exceeded. Please wait before making another request.")
-        elif "model" in error_msg.lower() and "not found" in error_msg.lower():
-            raise HTTPException(status_code=503, detail="AI model not available. Please check the model configuration.")
-        elif "api key" in error_msg.lower():
-            raise HTTPException(status_code=401, detail="Invalid API key. Please check your Gemini API configuration.")
-        else:
-            raise HTTPException(status_code=500, detail=f"Failed to generate chat response: {error_msg}")
+        status_code, detail = _llm_error(error_msg, "Failed to generate chat response")
+        raise HTTPException(status_code=status_code, detail=detail)
+
+
+@router.post("/chat/stream")
+async def chat_about_pdf_stream(
+    request: ChatRequest,
+    http_request: Request,
+    stream: Optional[str] = Query(default=None, alias="format"),
+    summarizer: PDFSummarizer = Depends(get_summarizer)
+):
+    """
+    Chat with AI about PDF content, streaming the answer as it is generated.
+    
+    Emits {"type": "context", "context_mode", "source_pages"}, then
+    {"type": "chunk", "text"} events as Gemini produces them, then a final
+    {"type": "done", "processing_time", "first_chunk_time", "response_length", "prompt_tokens"}
+    event, or {"type": "error", "status_code", "detail"}. The Gemini call is
+    cancelled if the client disconnects.
+    
+    Args:
+        request: Chat request with messages and PDF context (or document_id)
+        http_request: Incoming request, to detect client disconnects
+        stream: `format` query parameter, "sse" (default) or "ndjson"
+        summarizer: PDF summarizer instance
+        
+    Returns:
+        Streaming Server-Sent Events (or NDJSON) response
+    """
+    fmt = stream_format(http_request, stream or "sse")
+    pdf_context, context_mode, source_pages, retrieval_time = await run_in_threadpool(_prepare_chat_context, request)
+    
+    async def events():
+        yield {"type": "context", "context_mode": context_mode, "source_pages": source_pages}
+        async for event in summarizer.chat_stream(request.messages, pdf_context, excerpts=context_mode == "retrieval",
+                                                  session=_chat_session(request)):
+            if event["type"] == "done":
+                event.update(context_mode=context_mode, source_pages=source_pages)
+                chat_context_metrics.record(
+                    context_mode, event['prompt_tokens'] or 0, event['processing_time'], retrieval_time
+                )
+            yield event
+    
+    return StreamingResponse(
+        _stream_events(http_request, events(), fmt, "Failed to generate chat response"),
+        media_type=MEDIA_TYPES[fmt],
+        headers=STREAM_HEADERS
+    )
 
 
 @router.post("/key-points")
 async def extract_key_points(
-    text: str,
+    text: Optional[str] = None,
     max_points: int = 10,
+    document_id: Optional[str] = None,
     summarizer: PDFSummarizer = Depends(get_summarizer)
 ):
     """
@@ -192,16 +673,16 @@ async def extract_key_points(
     Args:
         text: Text to analyze
         max_points: Maximum number of key points to extract
+        document_id: Uploaded document to analyze instead of text
         summarizer: PDF summarizer instance
         
     Returns:
         List of key points
     """
     try:
-        if not text or len(text.strip()) < 50:
-            raise HTTPException(status_code=400, detail="Text must be at least 50 characters long")
+        text = await run_in_threadpool(_resolve_text, text, document_id)
         
-        key_points = summarizer.extract_key_points(text, max_points)
+        key_points = await summarizer.extract_key_points(text, max_points)
         
         return {
             "key_points": key_points,
@@ -217,8 +698,9 @@ async def extract_key_points(
 
 @router.post("/questions")
 async def generate_questions(
-    text: str,
+    text: Optional[str] = None,
     num_questions: int = 5,
+    document_id: Optional[str] = None,
     summarizer: PDFSummarizer = Depends(get_summarizer)
 ):
     """
@@ -227,16 +709,16 @@ async def generate_questions(
     Args:
         text: Text to analyze
         num_questions: Number of questions to generate
+        document_id: Uploaded document to analyze instead of text
         summarizer: PDF summarizer instance
         
     Returns:
         List of questions
     """
     try:
-        if not text or len(text.strip()) < 50:
-            raise HTTPException(status_code=400, detail="Text must be at least 50 characters long")
+        text = await run_in_threadpool(_resolve_text, text, document_id)
         
-        questions = summarizer.generate_questions(text, num_questions)
+        questions = await summarizer.generate_questions(text, num_questions)
         
         return {
             "questions": questions,
@@ -293,38 +775,51 @@ async def health_check():
             "AI summarization",
             "Chat interface",
             "Key points extraction",
-            "Question generation"
+            "Question generation",
+            "Combined analysis"
         ]
     }
 
+@router.get("/metrics")
+async def get_metrics():
+    """Extraction cache, document store, chat context and history, summary cache, prompt budget and LLM statistics for this worker."""
+    extraction_cache = get_extraction_cache()
+    return {
+        "extraction_cache": extraction_cache.stats() if extraction_cache else None,
+        "document_store": get_document_store().stats(),
+        "chat_context": chat_context_metrics.snapshot(),
+        "chat_context_index_cache": context_index_cache.stats(),
+        "section_summary_cache": section_summary_cache.stats(),
+        "prompt_budget": _summarizer.budget.stats() if _summarizer else None,
+        "chat_history": _summarizer.history.stats() if _summarizer else None,
+        "llm": llm_stats()
+    }
+
 @router.get("/debug")
 async def debug_info():
     """Debug endpoint to check API configuration."""
     try:
-        import os
-        import google.generativeai as genai
-        
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
+        try:
+            llm = get_llm_gateway()
+        except LLMUnavailable as e:
             return {
                 "status": "error",
-                "message": "GEMINI_API_KEY not found in environment variables",
+                "message": str(e),
                 "api_key_configured": False
             }
         
-        # Test API connection
-        genai.configure(api_key=api_key)
-        models = genai.list_models()
-        available_models = [model.name for model in models if "gemini" in model.name.lower()]
+        # Test API connection with the shared client
+        models = await run_in_threadpool(llm.list_models)
+        available_models = [name for name in models if "gemini" in name.lower()]
         
         return {
             "status": "healthy",
             "message": "API configuration check completed",
             "api_key_configured": True,
-            "api_key_length": len(api_key) if api_key else 0,
             "available_gemini_models": available_models,
-            "current_model": "gemini-1.5-pro",
-            "model_available": "gemini-1.5-pro" in available_models
+            "current_model": MODEL_NAME,
+            "model_available": MODEL_NAME in available_models,
+            "gateway": llm.stats()
         }
         
     except Exception as e:
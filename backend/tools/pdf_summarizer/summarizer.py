@@ -2,24 +2,201 @@
 AI PDF Summarizer Module
 
 Uses Google's Gemini AI to generate intelligent summaries from PDF text
-with multiple styles and customization options.
+with multiple styles and customization options. Calls go through the
+shared async LLM gateway, and prompts are fitted into the prompt token
+budget.
 """
-import google.generativeai as genai
+import asyncio
+import hashlib
+import json
+import re
 import time
 import logging
-from typing import Optional
+from typing import Optional, List, Dict, Any, Tuple, AsyncIterator
+from core.cache import TieredCache
+from core.config import settings
+from core.llm import LLMGateway, LLMResult, estimate_tokens
+from core.prompt_budget import PromptBudget
 from .models import SummaryStyle
+from .chat_history import HistoryCompactor
 
 logger = logging.getLogger(__name__)
 
+MODEL_NAME = 'models/gemini-1.5-flash'
+
+# Tool name for the gateway's per-tool concurrency limit and metrics
+TOOL_NAME = "pdf_summarizer"
+
+# Bump when SECTION_PROMPT changes; cached section summaries from other versions are ignored
+SECTION_PROMPT_VERSION = "1"
+
+# Style-neutral prompt for the map phase; the requested style is applied when reducing
+SECTION_PROMPT = """
+Summarize part {index} of {count} of a longer document.
+Keep every key fact, figure, name, date, definition and conclusion, in the order they appear.
+Write plain prose in the language of the text, without an introduction or commentary.
+Maximum length: {max_length} words.
+
+Text:
+{text}
+"""
+
+REDUCE_NOTE = "The text below summarizes a longer document section by section."
+
+KEY_POINTS_PROMPT = """
+Extract the {max_points} most important key points from the following text.
+Present them as a numbered list of concise statements.
+
+Text:
+{text}
+"""
+
+QUESTIONS_PROMPT = """
+Generate {num_questions} insightful questions about the following text.
+These should be questions that someone might ask to better understand the content.
+
+Text:
+{text}
+"""
+
+# Summary, key points and questions in a single structured response
+ANALYSIS_PROMPT = """
+Analyze the following text and respond with a JSON object with these fields:
+- "summary": {summary_instructions}
+- "key_points": the {max_points} most important key points, as concise statements
+- "questions": {num_questions} insightful questions someone might ask to better understand the content
+
+Text:
+{text}
+"""
+
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "summary": {"type": "string"},
+        "key_points": {"type": "array", "items": {"type": "string"}},
+        "questions": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["summary", "key_points", "questions"],
+}
+
+# Section summaries keyed by (text hash, section, model, prompt version). They don't depend
+# on style, length or language, so those requests only need a new reduce call.
+section_summary_cache = TieredCache(
+    max_size=settings.PDF_SUMMARY_CACHE_SIZE,
+    ttl=settings.PDF_SUMMARY_CACHE_TTL,
+    shared_path=settings.PDF_SUMMARY_CACHE_PATH
+)
+
+
+def parse_analysis(raw: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse a structured analysis response, tolerating code fences and text
+    around the JSON object.
+    
+    Returns:
+        Dictionary with summary, key_points and questions, or None if the response is unusable
+    """
+    raw = (raw or "").strip()
+    raw = re.sub(r"^```(?:json)?\s*|\s*```$", "", raw)
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        start, end = raw.find("{"), raw.rfind("}")
+        if start < 0 or end <= start:
+            return None
+        try:
+            data = json.loads(raw[start:end + 1])
+        except ValueError:
+            return None
+    
+    if not isinstance(data, dict) or not isinstance(data.get("summary"), str) or not data["summary"].strip():
+        return None
+    
+    def clean_list(items) -> List[str]:
+        if isinstance(items, str):
+            items = items.split("\n")
+        if not isinstance(items, list):
+            return []
+        # Drop list markers the model may add ("1.", "2)", "-", "•"), not leading numbers
+        cleaned = (re.sub(r"^\s*(?:\d+[.)]|[-•*])\s+", "", str(item)).strip() for item in items)
+        return [item for item in cleaned if item]
+    
+    return {
+        "summary": data["summary"].strip(),
+        "key_points": clean_list(data.get("key_points")),
+        "questions": clean_list(data.get("questions")),
+    }
+
+
+def split_sections(text: str, max_tokens: int) -> List[str]:
+    """
+    Split text into sections of at most max_tokens (estimated), at paragraph
+    boundaries where possible.
+    
+    Args:
+        text: Text to split
+        max_tokens: Token budget per section
+        
+    Returns:
+        List of sections, in document order
+    """
+    max_chars = max_tokens * 4
+    sections = []
+    current = []
+    current_chars = 0
+    
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        
+        # Paragraphs over the budget are split at word boundaries
+        pieces = [paragraph]
+        if len(paragraph) > max_chars:
+            pieces, piece = [], []
+            piece_chars = 0
+            for word in paragraph.split():
+                if piece and piece_chars + len(word) + 1 > max_chars:
+                    pieces.append(" ".join(piece))
+                    piece, piece_chars = [], 0
+                piece.append(word)
+                piece_chars += len(word) + 1
+            if piece:
+                pieces.append(" ".join(piece))
+        
+        for piece in pieces:
+            if current and current_chars + len(piece) + 2 > max_chars:
+                sections.append("\n\n".join(current))
+                current, current_chars = [], 0
+            current.append(piece)
+            current_chars += len(piece) + 2
+    
+    if current:
+        sections.append("\n\n".join(current))
+    return sections
+
 
 class PDFSummarizer:
     """Handles AI-powered PDF summarization using Gemini."""
     
-    def __init__(self, api_key: str):
-        """Initialize the summarizer with Gemini API key."""
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('models/gemini-1.5-flash')
+    def __init__(self, llm: LLMGateway, budget: Optional[PromptBudget] = None):
+        """Initialize the summarizer with the shared LLM gateway and a prompt budget."""
+        self.llm = llm
+        self.model_name = MODEL_NAME
+        self.budget = budget or PromptBudget(
+            settings.PROMPT_MAX_TOKENS,
+            settings.PROMPT_HISTORY_SHARE,
+            counter=self._count_tokens if settings.PROMPT_EXACT_COUNT else None,
+            exact_margin=settings.PROMPT_EXACT_COUNT_MARGIN
+        )
+        self.history = HistoryCompactor(
+            self._generate,
+            self.budget,
+            recent_turns=settings.PDF_CHAT_RECENT_TURNS,
+            batch=settings.PDF_CHAT_COMPACT_BATCH,
+            summary_words=settings.PDF_CHAT_SUMMARY_WORDS
+        )
         
         # Define summary style prompts
         self.style_prompts = {
@@ -73,8 +250,26 @@ class PDFSummarizer:
             """
         }
     
-    def summarize(self, text: str, style: SummaryStyle = SummaryStyle.CONCISE, 
-                 max_length: int = 500, language: str = "en") -> dict:
+    async def _count_tokens(self, prompt: str) -> Optional[int]:
+        return await self.llm.count_tokens(prompt, self.model_name)
+    
+    async def _style_prompt(self, text: str, style: SummaryStyle, max_length: int, language: str,
+                            note: str = "") -> str:
+        """Style prompt for the text, fitted into the prompt budget."""
+        template = self.style_prompts[style]
+        fitted = await self.budget.fit(
+            lambda context, _: note + template.format(text=context, max_length=max_length, language=language),
+            context=text,
+            label=f"summary ({style.value})"
+        )
+        return fitted.prompt
+    
+    async def _generate(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None) -> LLMResult:
+        return await self.llm.generate(prompt, tool=TOOL_NAME, model=self.model_name,
+                                       generation_config=generation_config)
+    
+    async def summarize(self, text: str, style: SummaryStyle = SummaryStyle.CONCISE, 
+                        max_length: int = 500, language: str = "en") -> dict:
         """
         Generate a summary of the provided text.
         
@@ -91,14 +286,10 @@ class PDFSummarizer:
         
         try:
             # Prepare the prompt
-            prompt = self.style_prompts[style].format(
-                text=text,
-                max_length=max_length,
-                language=language
-            )
+            prompt = await self._style_prompt(text, style, max_length, language)
             
             # Generate summary
-            response = self.model.generate_content(prompt)
+            response = await self._generate(prompt)
             
             if not response.text:
                 raise ValueError("No summary generated")
@@ -128,47 +319,362 @@ class PDFSummarizer:
             logger.error(f"Summarization failed: {e}")
             raise RuntimeError(f"Failed to generate summary: {str(e)}")
     
-    def chat_about_pdf(self, messages: list, pdf_context: str) -> dict:
+    async def use_sections(self, text: str, section_tokens: int, reuse_min_tokens: int) -> bool:
         """
-        Chat with AI about PDF content.
+        Whether to summarize a text by section (map-reduce) instead of in one prompt.
+        
+        Texts over section_tokens always are. Shorter texts over
+        reuse_min_tokens are only once they have been summarized before (e.g.
+        the user now asks for another style): the first summary is a single
+        call, the second generates and caches the section summaries, and later
+        ones only run the cheap reduce step over them.
+        """
+        tokens = estimate_tokens(text)
+        if tokens > section_tokens:
+            return True
+        if tokens <= reuse_min_tokens:
+            return False
+        
+        text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        key = f"{text_hash}:{section_tokens}:summarized:{self.model_name}"
+        seen = await asyncio.to_thread(section_summary_cache.get, key) is not None
+        if not seen:
+            await asyncio.to_thread(section_summary_cache.set, key, True)
+        return seen
+    
+    async def summarize_map_reduce(self, text: str, style: SummaryStyle = SummaryStyle.CONCISE,
+                                   max_length: int = 500, language: str = "en",
+                                   section_tokens: int = 6000, concurrency: int = 4) -> dict:
+        """
+        Summarize a long text map-reduce: sections are summarized concurrently,
+        then the section summaries are combined into the requested style.
+        
+        Section summaries are cached, so summarizing the same text again in
+        another style, length or language only runs the reduce step.
         
         Args:
-            messages: List of chat messages
-            pdf_context: PDF content for context
+            text: Text to summarize
+            style: Summary style to use
+            max_length: Maximum summary length in words
+            language: Output language
+            section_tokens: Token budget per section
+            concurrency: Maximum section summaries generated at once
             
         Returns:
-            Dictionary containing AI response and metadata
+            Dictionary containing summary and metadata, with per-phase timings
         """
         start_time = time.time()
         
         try:
-            # Build context-aware prompt
-            context_prompt = f"""
-            You are an AI assistant that helps users understand PDF documents. 
-            Here is the content of the PDF they're asking about:
+            section_summaries, map_stats = await self._map_sections(text, section_tokens, concurrency)
+            map_time = time.time() - start_time
             
-            {pdf_context}
+            # Reduce: apply the requested style to the combined section summaries
+            prompt = await self._reduce_prompt(section_summaries, style, max_length, language)
+            reduce_start = time.time()
+            response = await self._generate(prompt)
+            if not response.text:
+                raise ValueError("No summary generated")
+            reduce_time = time.time() - reduce_start
             
-            Please answer their questions based on this content. If the question cannot be answered 
-            from the PDF content, politely say so. Be helpful, accurate, and concise.
-            """
+            summary = response.text.strip()
+            processing_time = time.time() - start_time
+            original_length = len(text.split())
+            summary_length = len(summary.split())
+            
+            result = {
+                'summary': summary,
+                'style': style,
+                'original_length': original_length,
+                'summary_length': summary_length,
+                'processing_time': processing_time,
+                'compression_ratio': round((1 - summary_length / original_length) * 100, 1) if original_length > 0 else 0,
+                'mode': 'map_reduce',
+                'phase_times': {'map': round(map_time, 3), 'reduce': round(reduce_time, 3)},
+                **map_stats
+            }
+            
+            logger.info(f"Map-reduce summary of {map_stats['sections']} sections ({map_stats['cache_hits']} cached) "
+                        f"generated in {processing_time:.2f}s (map {map_time:.2f}s at concurrency "
+                        f"{map_stats['concurrency']}, reduce {reduce_time:.2f}s)")
             
+            return result
+            
+        except Exception as e:
+            logger.error(f"Map-reduce summarization failed: {e}")
+            raise RuntimeError(f"Failed to generate summary: {str(e)}")
+    
+    async def _map_sections(self, text: str, section_tokens: int, concurrency: int) -> Tuple[List[str], dict]:
+        """
+        Map phase: summarize the sections of a text concurrently, reusing cached section summaries.
+        
+        Returns:
+            Tuple of (section summaries in order, {"sections", "concurrency", "cache_hits"})
+        """
+        sections = split_sections(text, section_tokens)
+        # Enough detail per section for the reduce step, without exceeding its budget
+        section_length = max(150, min(600, section_tokens // (4 * max(1, len(sections))) * 3))
+        
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        active = {"now": 0, "peak": 0}
+        text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        cache_hits = 0
+        
+        async def summarize_section(index: int, section: str) -> str:
+            nonlocal cache_hits
+            key = f"{text_hash}:{section_tokens}:{index}:{self.model_name}:{SECTION_PROMPT_VERSION}"
+            cached = section_summary_cache.get(key)
+            if cached is not None:
+                cache_hits += 1
+                return cached
+            
+            async with semaphore:
+                active["now"] += 1
+                active["peak"] = max(active["peak"], active["now"])
+                try:
+                    prompt = SECTION_PROMPT.format(
+                        index=index + 1, count=len(sections), max_length=section_length, text=section
+                    )
+                    response = await self._generate(prompt)
+                    if not response.text:
+                        raise ValueError(f"No summary generated for section {index + 1}")
+                    summary = response.text.strip()
+                    section_summary_cache.set(key, summary)
+                    return summary
+                finally:
+                    active["now"] -= 1
+        
+        section_summaries = await asyncio.gather(
+            *(summarize_section(index, section) for index, section in enumerate(sections))
+        )
+        return list(section_summaries), {
+            'sections': len(sections), 'concurrency': active["peak"], 'cache_hits': cache_hits
+        }
+    
+    async def _reduce_prompt(self, section_summaries: List[str], style: SummaryStyle, max_length: int,
+                             language: str) -> str:
+        """Prompt applying the requested style to the combined section summaries."""
+        combined = "\n\n".join(
+            f"Section {index}:\n{summary}" for index, summary in enumerate(section_summaries, 1)
+        )
+        return await self._style_prompt(combined, style, max_length, language, note=REDUCE_NOTE + "\n")
+    
+    async def summarize_stream(self, text: str, style: SummaryStyle = SummaryStyle.CONCISE,
+                               max_length: int = 500, language: str = "en", map_reduce: bool = False,
+                               section_tokens: int = 6000, concurrency: int = 4) -> AsyncIterator[dict]:
+        """
+        Generate a summary, streaming the text as the model produces it.
+        
+        With map_reduce, the section summaries are generated (or read from
+        the cache) first and the final synthesis is streamed.
+        
+        Args:
+            text: Text to summarize
+            style: Summary style to use
+            max_length: Maximum summary length in words
+            language: Output language
+            map_reduce: Summarize by section first
+            section_tokens: Token budget per section
+            concurrency: Maximum section summaries generated at once
+            
+        Yields:
+            {"type": "chunk", "text"} events, then a final {"type": "done", ...} event with metrics
+        """
+        start_time = time.time()
+        map_stats = {}
+        if map_reduce:
+            section_summaries, map_stats = await self._map_sections(text, section_tokens, concurrency)
+            prompt = await self._reduce_prompt(section_summaries, style, max_length, language)
+        else:
+            prompt = await self._style_prompt(text, style, max_length, language)
+        
+        first_chunk_time = None
+        parts = []
+        usage = {}
+        async for chunk in self.llm.stream(prompt, tool=TOOL_NAME, model=self.model_name, usage=usage):
+            if first_chunk_time is None:
+                first_chunk_time = time.time() - start_time
+            parts.append(chunk)
+            yield {"type": "chunk", "text": chunk}
+        
+        summary = "".join(parts).strip()
+        if not summary:
+            raise ValueError("No summary generated")
+        processing_time = time.time() - start_time
+        original_length = len(text.split())
+        summary_length = len(summary.split())
+        
+        logger.info(f"Streamed summary in {processing_time:.2f}s (first chunk after {first_chunk_time:.2f}s)")
+        yield {
+            "type": "done",
+            "style": style.value,
+            "mode": "map_reduce" if map_reduce else "single",
+            "original_length": original_length,
+            "summary_length": summary_length,
+            "compression_ratio": round((1 - summary_length / original_length) * 100, 1) if original_length > 0 else 0,
+            "processing_time": processing_time,
+            "first_chunk_time": first_chunk_time,
+            "prompt_tokens": usage.get("prompt_tokens"),
+            **map_stats
+        }
+    
+    async def analyze(self, text: str, style: SummaryStyle = SummaryStyle.CONCISE, max_length: int = 500,
+                      language: str = "en", max_points: int = 10, num_questions: int = 5) -> dict:
+        """
+        Generate a summary, key points and questions in one structured call.
+        
+        Falls back to concurrent summarize / key points / questions calls
+        if the structured response can't be parsed; API errors are raised.
+        
+        Args:
+            text: Text to analyze
+            style: Summary style to use
+            max_length: Maximum summary length in words
+            language: Output language of the summary
+            max_points: Maximum number of key points
+            num_questions: Number of questions
+            
+        Returns:
+            Dictionary with summary, key_points, questions and token usage
+        """
+        start_time = time.time()
+        
+        # Summary instructions of the style prompt, without its text placeholder
+        summary_instructions = " ".join(
+            self.style_prompts[style].split("Text to summarize:")[0].format(
+                text="", max_length=max_length, language=language
+            ).split()
+        )
+        fitted = await self.budget.fit(
+            lambda context, _: ANALYSIS_PROMPT.format(
+                summary_instructions=summary_instructions,
+                max_points=max_points,
+                num_questions=num_questions,
+                text=context
+            ),
+            context=text,
+            label="analysis"
+        )
+        prompt = fitted.prompt
+        text = fitted.context
+        # What the three separate calls would have sent
+        separate_tokens = sum(estimate_tokens(p) for p in (
+            self.style_prompts[style].format(text=text, max_length=max_length, language=language),
+            KEY_POINTS_PROMPT.format(max_points=max_points, text=text),
+            QUESTIONS_PROMPT.format(num_questions=num_questions, text=text),
+        ))
+        
+        # Gateway errors (quota, rate limit, open circuit) propagate; only an
+        # unparseable response falls back to separate calls
+        response = await self._generate(
+            prompt,
+            generation_config={"response_mime_type": "application/json", "response_schema": ANALYSIS_SCHEMA}
+        )
+        prompt_tokens = response.prompt_tokens
+        analysis = parse_analysis(response.text)
+        if analysis is None:
+            logger.warning("Could not parse structured analysis response, falling back to separate calls")
+        
+        if analysis is not None:
+            mode = "bundle"
+            analysis["key_points"] = analysis["key_points"][:max_points]
+            analysis["questions"] = analysis["questions"][:num_questions]
+        else:
+            mode = "fallback"
+            summary, key_points, questions = await asyncio.gather(
+                self.summarize(text, style, max_length, language),
+                self.extract_key_points(text, max_points),
+                self.generate_questions(text, num_questions),
+            )
+            analysis = {"summary": summary['summary'], "key_points": key_points, "questions": questions}
+            prompt_tokens += separate_tokens
+        
+        processing_time = time.time() - start_time
+        result = {
+            **analysis,
+            'style': style,
+            'processing_time': processing_time,
+            'mode': mode,
+            'prompt_tokens': prompt_tokens,
+            'separate_prompt_tokens': separate_tokens,
+            'tokens_saved': separate_tokens - prompt_tokens
+        }
+        
+        logger.info(f"Analysis ({mode}) generated in {processing_time:.2f}s: {prompt_tokens} prompt tokens "
+                    f"vs ~{separate_tokens} for separate calls")
+        
+        return result
+    
+    async def _chat_prompt(self, messages: list, pdf_context: str, excerpts: bool = False,
+                           session: Optional[str] = None) -> Tuple[str, int]:
+        """
+        Chat prompt: the PDF context followed by the conversation, fitted into the prompt budget.
+        
+        With a session key, older messages are replaced by the session's rolling summary.
+        
+        Returns:
+            Tuple of (prompt, number of messages sent as the summary)
+        """
+        # Build context-aware prompt
+        if excerpts:
+            context_intro = "Here is an outline of the PDF they're asking about and the excerpts most relevant to their question:"
+        else:
+            context_intro = "Here is the content of the PDF they're asking about:"
+        
+        def render(context: str, conversation: str) -> str:
+            context_prompt = f"""
+        You are an AI assistant that helps users understand PDF documents. 
+        {context_intro}
+        
+        {context}
+        
+        Please answer their questions based on this content. If the question cannot be answered 
+        from the PDF content, politely say so. Be helpful, accurate, and concise.
+        """
             # Combine context with conversation history
-            full_prompt = context_prompt + "\n\nConversation:\n"
-            for msg in messages:
-                # Handle both dict and object formats
-                if isinstance(msg, dict):
-                    role = msg.get('role', 'user')
-                    content = msg.get('content', '')
-                else:
-                    role = getattr(msg, 'role', 'user')
-                    content = getattr(msg, 'content', '')
-                full_prompt += f"{role.title()}: {content}\n"
-            
-            full_prompt += "\nAssistant:"
+            return context_prompt + "\n\nConversation:\n" + conversation + "\n\nAssistant:"
+        
+        history = []
+        for msg in messages:
+            # Handle both dict and object formats
+            if isinstance(msg, dict):
+                role = msg.get('role', 'user')
+                content = msg.get('content', '')
+            else:
+                role = getattr(msg, 'role', 'user')
+                content = getattr(msg, 'content', '')
+            history.append(f"{role.title()}: {content}")
+        
+        summarized = 0
+        if session is not None:
+            summary, history, summarized = await self.history.compact(session, history)
+            if summary:
+                history = [f"Summary of the earlier conversation: {summary}"] + history
+        
+        fitted = await self.budget.fit(render, context=pdf_context, history=history, label="chat")
+        return fitted.prompt, summarized
+    
+    async def chat_about_pdf(self, messages: list, pdf_context: str, excerpts: bool = False,
+                             session: Optional[str] = None) -> dict:
+        """
+        Chat with AI about PDF content.
+        
+        Args:
+            messages: List of chat messages
+            pdf_context: PDF content for context
+            excerpts: Whether pdf_context holds retrieved excerpts rather than the full text
+            session: Optional session key; older messages are then sent as a rolling summary
+            
+        Returns:
+            Dictionary containing AI response and metadata
+        """
+        start_time = time.time()
+        
+        try:
+            full_prompt, summarized = await self._chat_prompt(messages, pdf_context, excerpts, session)
             
             # Generate response
-            response = self.model.generate_content(full_prompt)
+            response = await self._generate(full_prompt)
             
             if not response.text:
                 raise ValueError("No response generated")
@@ -178,7 +684,9 @@ class PDFSummarizer:
             
             result = {
                 'response': ai_response,
-                'processing_time': processing_time
+                'processing_time': processing_time,
+                'prompt_tokens': response.prompt_tokens,
+                'history_summarized': summarized
             }
             
             logger.info(f"Chat response generated in {processing_time:.2f}s")
@@ -189,7 +697,48 @@ class PDFSummarizer:
             logger.error(f"Chat generation failed: {e}")
             raise RuntimeError(f"Failed to generate chat response: {str(e)}")
     
-    def extract_key_points(self, text: str, max_points: int = 10) -> list:
+    async def chat_stream(self, messages: list, pdf_context: str, excerpts: bool = False,
+                          session: Optional[str] = None) -> AsyncIterator[dict]:
+        """
+        Chat with AI about PDF content, streaming the answer as it is generated.
+        
+        Args:
+            messages: List of chat messages
+            pdf_context: PDF content for context
+            excerpts: Whether pdf_context holds retrieved excerpts rather than the full text
+            session: Optional session key; older messages are then sent as a rolling summary
+            
+        Yields:
+            {"type": "chunk", "text"} events, then a final {"type": "done", ...} event with metrics
+        """
+        start_time = time.time()
+        full_prompt, summarized = await self._chat_prompt(messages, pdf_context, excerpts, session)
+        
+        first_chunk_time = None
+        parts = []
+        usage = {}
+        async for chunk in self.llm.stream(full_prompt, tool=TOOL_NAME, model=self.model_name, usage=usage):
+            if first_chunk_time is None:
+                first_chunk_time = time.time() - start_time
+            parts.append(chunk)
+            yield {"type": "chunk", "text": chunk}
+        
+        ai_response = "".join(parts).strip()
+        if not ai_response:
+            raise ValueError("No response generated")
+        processing_time = time.time() - start_time
+        
+        logger.info(f"Streamed chat response in {processing_time:.2f}s (first chunk after {first_chunk_time:.2f}s)")
+        yield {
+            "type": "done",
+            "processing_time": processing_time,
+            "first_chunk_time": first_chunk_time,
+            "response_length": len(ai_response),
+            "prompt_tokens": usage.get("prompt_tokens"),
+            "history_summarized": summarized
+        }
+    
+    async def extract_key_points(self, text: str, max_points: int = 10) -> list:
         """
         Extract key points from PDF text.
         
@@ -201,15 +750,14 @@ class PDFSummarizer:
             List of key points
         """
         try:
-            prompt = f"""
-            Extract the {max_points} most important key points from the following text.
-            Present them as a numbered list of concise statements.
-            
-            Text:
-            {text}
-            """
+            fitted = await self.budget.fit(
+                lambda context, _: KEY_POINTS_PROMPT.format(max_points=max_points, text=context),
+                context=text,
+                label="key points"
+            )
+            prompt = fitted.prompt
             
-            response = self.model.generate_content(prompt)
+            response = await self._generate(prompt)
             
             if not response.text:
                 return []
@@ -232,7 +780,7 @@ class PDFSummarizer:
             logger.error(f"Key points extraction failed: {e}")
             return []
     
-    def generate_questions(self, text: str, num_questions: int = 5) -> list:
+    async def generate_questions(self, text: str, num_questions: int = 5) -> list:
         """
         Generate questions about the PDF content.
         
@@ -244,15 +792,14 @@ class PDFSummarizer:
             List of questions
         """
         try:
-            prompt = f"""
-            Generate {num_questions} insightful questions about the following text.
-            These should be questions that someone might ask to better understand the content.
-            
-            Text:
-            {text}
-            """
+            fitted = await self.budget.fit(
+                lambda context, _: QUESTIONS_PROMPT.format(num_questions=num_questions, text=context),
+                context=text,
+                label="questions"
+            )
+            prompt = fitted.prompt
             
-            response = self.model.generate_content(prompt)
+            response = await self._generate(prompt)
             
             if not response.text:
                 return []
@@ -0,0 +1,213 @@
+"""
+Streaming PDF upload handling.
+
+The multipart request body is parsed as it arrives: file bytes go straight
+into a spool (in memory, spilling to a named temp file past
+PDF_SPOOL_MEMORY_BYTES) and a SHA-256 hash, and the upload is rejected as
+soon as it passes the size limit. Large uploads are then parsed through a
+memory map of the spooled file instead of an in-memory copy, so memory per
+upload stays bounded regardless of PDF size, and extraction worker
+processes open the spooled file by its path.
+"""
+import hashlib
+import io
+import logging
+import mmap
+import tempfile
+from typing import BinaryIO, Optional, Union
+
+import multipart
+from multipart.multipart import parse_options_header
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Allowance for multipart boundaries and part headers when checking Content-Length
+MULTIPART_OVERHEAD = 64 * 1024
+
+# OpenAPI description of the multipart body, since the endpoint reads the raw stream
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}}
+                }
+            }
+        }
+    }
+}
+
+
+class UploadTooLarge(Exception):
+    """The upload exceeds the configured size limit."""
+
+
+class InvalidUpload(Exception):
+    """The request is not a multipart upload with a file field."""
+
+
+class SpooledUpload:
+    """An uploaded file spooled to memory or disk, with its size and SHA-256."""
+
+    def __init__(self, filename: str, file: BinaryIO, size: int, sha256: str, spool_bytes: int):
+        self.filename = filename
+        self.file = file
+        self.size = size
+        self.sha256 = sha256
+        self._spool_bytes = spool_bytes
+        self._map: Optional[mmap.mmap] = None
+
+    def content(self) -> Union[bytes, mmap.mmap]:
+        """
+        The file content for parsing: bytes for small in-memory uploads,
+        otherwise a read-only memory map of the spooled temp file.
+        """
+        if self.path is not None:
+            if self._map is None:
+                self._map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._map
+        self.file.seek(0)
+        return self.file.read()
+
+    @property
+    def path(self) -> Optional[str]:
+        """Path of the spooled file on disk, or None for uploads kept in memory."""
+        return self.file.name if self.size > self._spool_bytes else None
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self.file.close()
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _spill_to_disk(memory: io.BytesIO) -> BinaryIO:
+    """Move an in-memory spool to a named temp file (removed when closed)."""
+    file = tempfile.NamedTemporaryFile(prefix="upload-", suffix=".pdf")
+    file.write(memory.getbuffer())
+    return file
+
+
+async def receive_upload(request: Request, field: str = "file", max_bytes: Optional[int] = None,
+                         spool_bytes: Optional[int] = None) -> SpooledUpload:
+    """
+    Stream a multipart upload into a spooled temp file, hashing it on the way.
+
+    Args:
+        request: Incoming request with a multipart/form-data body
+        field: Name of the file field
+        max_bytes: Maximum file size (default: PDF_MAX_UPLOAD_BYTES)
+        spool_bytes: Size kept in memory before spilling to disk (default: PDF_SPOOL_MEMORY_BYTES)
+
+    Returns:
+        The spooled upload; the caller must close it
+
+    Raises:
+        UploadTooLarge: If the file is larger than max_bytes
+        InvalidUpload: If the body is not multipart or has no file in `field`
+    """
+    max_bytes = settings.PDF_MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    spool_bytes = settings.PDF_SPOOL_MEMORY_BYTES if spool_bytes is None else spool_bytes
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise InvalidUpload("Expected a multipart/form-data upload")
+
+    # Reject before reading the body when the client declares an oversized request
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + MULTIPART_OVERHEAD:
+        raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+
+    spool: BinaryIO = io.BytesIO()
+    digest = hashlib.sha256()
+    state = {"size": 0, "filename": None, "in_file": False, "done": False,
+             "header_field": b"", "header_value": b"", "headers": {}}
+    pending = []
+
+    def on_part_begin():
+        state["headers"] = {}
+
+    def on_header_field(data, start, end):
+        state["header_field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["header_value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["header_field"].lower()] = state["header_value"]
+        state["header_field"] = b""
+        state["header_value"] = b""
+
+    def on_headers_finished():
+        _, options = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        is_file = options.get(b"name") == field.encode() and b"filename" in options
+        # Only the first file part in the field is kept
+        state["in_file"] = is_file and not state["done"]
+        if state["in_file"]:
+            state["filename"] = options[b"filename"].decode("utf-8", "replace")
+
+    def on_part_data(data, start, end):
+        if not state["in_file"]:
+            return
+        chunk = data[start:end]
+        state["size"] += len(chunk)
+        if state["size"] > max_bytes:
+            raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+        digest.update(chunk)
+        pending.append(chunk)
+
+    def on_part_end():
+        if state["in_file"]:
+            state["in_file"] = False
+            state["done"] = True
+
+    parser = multipart.MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if pending:
+                data = b"".join(pending)
+                pending.clear()
+                if state["size"] > spool_bytes:
+                    # On disk: don't block the event loop on file writes
+                    if isinstance(spool, io.BytesIO):
+                        spool = await run_in_threadpool(_spill_to_disk, spool)
+                    await run_in_threadpool(spool.write, data)
+                else:
+                    spool.write(data)
+        parser.finalize()
+    except BaseException:
+        spool.close()
+        raise
+
+    if not state["done"] or not state["filename"]:
+        spool.close()
+        raise InvalidUpload(f"No file uploaded in field '{field}'")
+
+    spool.flush()
+    upload = SpooledUpload(state["filename"], spool, state["size"], digest.hexdigest(), spool_bytes)
+    logger.info(f"Received upload {upload.filename}: {upload.size} bytes, "
+                f"{'on disk' if upload.size > spool_bytes else 'in memory'}, sha256 {upload.sha256[:12]}")
+    return upload
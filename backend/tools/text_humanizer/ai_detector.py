@@ -448,6 +448,7 @@ class AIContentDetector:
                 "lexical_diversity": round(diversity_score, 3),
                 "ai_pattern_density": round(pattern_density, 3)
             },
+            "threshold": round(threshold, 3),
             "analysis": analysis
         }
     
@@ -0,0 +1,437 @@
+"""
+AI detection entry points shared by the text humanizer endpoints.
+
+Modes:
+- statistical: the statistical detector, falling back to the transformer on errors
+- cascade: the statistical detector scores first; the transformer only runs
+  when the statistical score falls within a band around its threshold
+- ensemble: statistical, transformer and semantic detectors (plus the
+  n-gram detector when trained weights exist) run concurrently with
+  per-detector deadlines and a weighted combined score
+- ngram: the hashed n-gram linear detector only
+"""
+import asyncio
+import copy
+import hashlib
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple
+
+from core.cache import TieredCache
+from core.config import settings
+from core.dependencies import get_logger
+from core.metrics import LatencyStats
+from core.warmup import warmup_manager
+
+logger = get_logger(__name__)
+
+DETECTION_MODES = ("statistical", "cascade", "ensemble", "ngram")
+
+# Name of the transformer AI detector in the warmup manager
+AI_DETECTOR_WARMUP_NAME = "ai_detector"
+
+# Decision thresholds of the detectors whose results don't carry one.
+# The transformer value must match huggingface_ai_detector.AI_THRESHOLD
+# (kept here to avoid importing torch).
+TRANSFORMER_THRESHOLD = 0.55
+SEMANTIC_THRESHOLD = 0.6
+
+# Detector versions used in cache keys; bump when a detector's output changes
+DETECTOR_VERSIONS = {
+    "statistical": "1",
+    "transformer": "fakespot-ai/roberta-base-ai-text-detection-v1:1",
+    "semantic": "1",
+}
+
+
+def available_modes() -> Tuple[str, ...]:
+    """Detection modes that can run here: ngram needs trained weights."""
+    from .ngram_detector import is_available as ngram_available
+    return tuple(mode for mode in DETECTION_MODES if mode != "ngram" or ngram_available())
+
+
+def load_ai_detector_for_warmup():
+    """Load the Hugging Face AI detector for the warmup manager (imports torch lazily)."""
+    from .huggingface_ai_detector import get_ai_detector
+    return get_ai_detector()
+
+
+def warmup_ai_detector(detector):
+    """Run a dummy inference on the loaded Hugging Face AI detector."""
+    from .huggingface_ai_detector import warmup
+    warmup(detector)
+
+
+class CascadeMetrics:
+    """Counters and latency for cascade detection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = 0
+        self.escalated = 0
+        self.skipped = 0
+        self.latency = LatencyStats()
+
+    def record(self, escalated: bool, skipped: bool, seconds: float):
+        with self._lock:
+            self.total += 1
+            self.escalated += int(escalated)
+            self.skipped += int(skipped)
+        self.latency.record(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "requests": self.total,
+            "escalated": self.escalated,
+            "escalation_skipped": self.skipped,
+            "escalated_fraction": round(self.escalated / self.total, 4) if self.total else 0.0,
+            "latency": self.latency.snapshot(),
+        }
+
+
+cascade_metrics = CascadeMetrics()
+
+
+# Detection results keyed by (content hash, detector name, detector version)
+detection_cache = TieredCache(
+    max_size=settings.DETECTION_CACHE_SIZE,
+    ttl=settings.DETECTION_CACHE_TTL,
+    shared_path=settings.DETECTION_CACHE_PATH
+)
+
+
+def _is_error_result(result: Dict[str, Any]) -> bool:
+    """Whether a detector result reports an inference error (the transformer returns these instead of raising)."""
+    return str(result.get("analysis", "")).startswith("Error occurred")
+
+
+def _cached(name: str, detector: Callable[[str], Dict[str, Any]], text: str, version: Optional[str] = None) -> Dict[str, Any]:
+    """Run a detector through the detection cache. Returns a copy callers may modify."""
+    version = version or DETECTOR_VERSIONS[name]
+    key = f"{hashlib.sha256(text.encode('utf-8')).hexdigest()}:{name}:{version}"
+    result = detection_cache.get(key)
+    if result is None:
+        result = detector(text)
+        # The transformer reports inference errors as results; don't cache those
+        if not _is_error_result(result):
+            detection_cache.set(key, result)
+    return copy.deepcopy(result)
+
+
+def _statistical_detect(text: str) -> Dict[str, Any]:
+    from .ai_detector import detect_ai_content
+    return _cached("statistical", detect_ai_content, text)
+
+
+def _transformer_detect(text: str) -> Dict[str, Any]:
+    from .huggingface_ai_detector import detect_ai_content
+    return _cached("transformer", detect_ai_content, text)
+
+
+def _semantic_detect(text: str) -> Dict[str, Any]:
+    from .semantic_ai_detector import detect_ai_content
+    return _cached("semantic", detect_ai_content, text)
+
+
+def _ngram_detect(text: str) -> Dict[str, Any]:
+    from .ngram_detector import get_ngram_detector
+    detector = get_ngram_detector()
+    return _cached("ngram", detector.detect_ai_content, text, version=f"ngram:{detector.version}")
+
+
+def detect_semantic(text: str) -> Dict[str, Any]:
+    """Semantic pattern detection (cached)."""
+    return _semantic_detect(text)
+
+
+def _centered_probability(name: str, result: Dict[str, Any]) -> float:
+    """Map a detector result to a probability-like score centred on that detector's threshold."""
+    if name == "statistical":
+        margin = result["confidence"] - result["threshold"]
+    elif name == "transformer":
+        margin = result["scores"].get("ai_probability", 0.0) - TRANSFORMER_THRESHOLD
+    elif name == "ngram":
+        margin = result["scores"].get("ai_probability", 0.0) - result["threshold"]
+    else:
+        margin = result["scores"].get("ai_probability", 0.0) - SEMANTIC_THRESHOLD
+    return min(1.0, max(0.0, 0.5 + margin))
+
+
+def detect_statistical(text: str) -> Dict[str, Any]:
+    """Statistical detection, falling back to the transformer if it fails."""
+    try:
+        result = _statistical_detect(text)
+    except Exception as e:
+        logger.warning(f"Failed to load statistical AI detector, falling back to Hugging Face method: {e}")
+        result = _transformer_detect(text)
+        result["decided_by"] = "transformer"
+        return result
+
+    result["decided_by"] = "statistical"
+    return result
+
+
+def detect_cascade(text: str, band: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Cascaded detection: escalate to the transformer only for ambiguous texts.
+
+    Args:
+        text: Text to analyze
+        band: Half-width of the ambiguity band around the statistical threshold
+
+    Returns:
+        Detection result with a `decided_by` field naming the deciding stage
+    """
+    start_time = time.time()
+    band = settings.CASCADE_BAND if band is None else band
+
+    result = _statistical_detect(text)
+    margin = result["confidence"] - result["threshold"]
+
+    escalated = False
+    skipped = False
+    if abs(margin) > band:
+        result["decided_by"] = "statistical"
+    elif warmup_manager.is_loading(AI_DETECTOR_WARMUP_NAME):
+        # Don't stall the request on a model that is still being loaded
+        skipped = True
+        result["decided_by"] = "statistical"
+        result["escalation"] = "skipped: transformer still loading"
+    else:
+        try:
+            transformer = _transformer_detect(text)
+            if _is_error_result(transformer):
+                # Its 0.0 probability is not a verdict
+                raise RuntimeError(transformer["analysis"])
+            result = _combine(result, transformer)
+            escalated = True
+        except Exception as e:
+            logger.warning(f"Cascade escalation failed, keeping statistical result: {e}")
+            skipped = True
+            result["decided_by"] = "statistical"
+            result["escalation"] = f"failed: {e}"
+
+    cascade_metrics.record(escalated, skipped, time.time() - start_time)
+    return result
+
+
+def _combine(statistical: Dict[str, Any], transformer: Dict[str, Any]) -> Dict[str, Any]:
+    """Combine both stages into one result, weighting the transformer more heavily."""
+    weight = settings.CASCADE_TRANSFORMER_WEIGHT
+    ai_probability = transformer["scores"].get("ai_probability", 0.0)
+    combined = (
+        (1 - weight) * _centered_probability("statistical", statistical) +
+        weight * _centered_probability("transformer", transformer)
+    )
+
+    scores = dict(statistical["scores"])
+    scores["ai_probability"] = round(ai_probability, 3)
+    scores["combined_probability"] = round(combined, 3)
+
+    return {
+        "is_ai_generated": combined > 0.5,
+        "confidence": round(combined, 3),
+        "scores": scores,
+        "threshold": statistical["threshold"],
+        "analysis": f"{transformer['analysis']} (Statistical score {statistical['confidence']:.3f} "
+                    f"was within the ambiguity band around {statistical['threshold']:.3f}.)",
+        "decided_by": "transformer"
+    }
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client went away while an ensemble was running."""
+
+
+# Detector functions and dedicated worker pools for the ensemble. The
+# transformer gets a single worker: concurrent inference on one model only
+# adds contention.
+ENSEMBLE_DETECTORS: Dict[str, Callable[[str], Dict[str, Any]]] = {
+    "statistical": _statistical_detect,
+    "transformer": _transformer_detect,
+    "semantic": _semantic_detect,
+    "ngram": _ngram_detect,
+}
+ENSEMBLE_WORKERS = {"statistical": 4, "transformer": 1, "semantic": 4, "ngram": 2}
+_ensemble_pools = {
+    name: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"detect-{name}")
+    for name, workers in ENSEMBLE_WORKERS.items()
+}
+
+# Detector calls still running after their request stopped waiting (threads can't be
+# interrupted). While they occupy every worker of a pool, the detector is skipped
+# instead of queueing new calls that would time out behind them.
+_abandoned_calls = {name: 0 for name in ENSEMBLE_WORKERS}
+_abandoned_lock = threading.Lock()
+
+
+def _abandon(name: str, work: Future):
+    """Count a call nobody waits for anymore until its thread finishes."""
+    if work.cancel():
+        # Still queued: dropped without running
+        return
+
+    def finished(_):
+        with _abandoned_lock:
+            _abandoned_calls[name] -= 1
+
+    with _abandoned_lock:
+        _abandoned_calls[name] += 1
+    work.add_done_callback(finished)
+
+
+def _pool_busy(name: str) -> bool:
+    with _abandoned_lock:
+        return _abandoned_calls[name] >= ENSEMBLE_WORKERS[name]
+
+
+async def _run_detector(name: str, text: str, timeout: float) -> Dict[str, Any]:
+    """Run one detector on its pool, returning a status record instead of raising."""
+    if name == "transformer" and warmup_manager.is_loading(AI_DETECTOR_WARMUP_NAME):
+        return {"status": "skipped", "reason": "model still loading", "latency_ms": 0.0}
+    if _pool_busy(name):
+        return {"status": "skipped", "reason": "busy with timed-out calls", "latency_ms": 0.0}
+
+    start_time = time.time()
+    work = _ensemble_pools[name].submit(ENSEMBLE_DETECTORS[name], text)
+    try:
+        result = await asyncio.wait_for(asyncio.wrap_future(work), timeout)
+        status = "ok"
+        if _is_error_result(result):
+            logger.warning(f"Ensemble detector '{name}' failed: {result['analysis']}")
+            result, status = None, "error"
+    except asyncio.TimeoutError:
+        _abandon(name, work)
+        result, status = None, "timeout"
+    except asyncio.CancelledError:
+        _abandon(name, work)
+        raise
+    except Exception as e:
+        logger.warning(f"Ensemble detector '{name}' failed: {e}")
+        result, status = None, "error"
+
+    record = {"status": status, "latency_ms": round((time.time() - start_time) * 1000, 3)}
+    if result is not None:
+        record["result"] = result
+    return record
+
+
+async def _watch_disconnect(is_disconnected: Callable[[], Awaitable[bool]], interval: float = 0.1):
+    while not await is_disconnected():
+        await asyncio.sleep(interval)
+
+
+async def detect_ensemble(
+    text: str,
+    deadline: Optional[float] = None,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+) -> Dict[str, Any]:
+    """
+    Run the statistical, transformer and semantic detectors concurrently.
+
+    Each detector has its own timeout (settings.ENSEMBLE_TIMEOUTS), capped by
+    the overall deadline. Results that complete in time are combined using
+    settings.ENSEMBLE_WEIGHTS.
+
+    Args:
+        text: Text to analyze
+        deadline: Overall deadline in seconds (defaults to settings.ENSEMBLE_DEADLINE)
+        is_disconnected: Optional coroutine function; when it returns True the
+            ensemble is cancelled and ClientDisconnected is raised
+
+    Returns:
+        Combined detection result with a per-detector `detectors` breakdown
+    """
+    from .ngram_detector import is_available as ngram_available
+
+    deadline = settings.ENSEMBLE_DEADLINE if deadline is None else deadline
+    names = [name for name in ENSEMBLE_DETECTORS if name != "ngram" or ngram_available()]
+    tasks = {
+        name: asyncio.create_task(_run_detector(name, text, min(deadline, settings.ENSEMBLE_TIMEOUTS.get(name, deadline))))
+        for name in names
+    }
+
+    watcher = asyncio.create_task(_watch_disconnect(is_disconnected)) if is_disconnected else None
+    try:
+        waiting = set(tasks.values()) | ({watcher} if watcher else set())
+        while not all(task.done() for task in tasks.values()):
+            done, waiting = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            if watcher in done:
+                raise ClientDisconnected()
+    finally:
+        if watcher:
+            watcher.cancel()
+        for task in tasks.values():
+            # Threads already running finish in the background (counted as abandoned); queued work is dropped
+            task.cancel()
+
+    detectors = {name: task.result() for name, task in tasks.items()}
+    return _combine_ensemble(detectors)
+
+
+def _combine_ensemble(detectors: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Weighted combination of the detectors that completed."""
+    completed = {name: d["result"] for name, d in detectors.items() if d["status"] == "ok"}
+    summary = {name: {k: v for k, v in d.items() if k != "result"} for name, d in detectors.items()}
+
+    if not completed:
+        return {
+            "is_ai_generated": False,
+            "confidence": 0.0,
+            "scores": {"ai_probability": 0.0},
+            "analysis": "AI detection unavailable",
+            "decided_by": "ensemble",
+            "detectors": summary
+        }
+
+    scores = {}
+    weighted_sum = 0.0
+    total_weight = 0.0
+    for name, result in completed.items():
+        probability = _centered_probability(name, result)
+        weight = settings.ENSEMBLE_WEIGHTS.get(name, 0.0)
+        scores[f"{name}_probability"] = round(probability, 3)
+        summary[name]["is_ai_generated"] = result["is_ai_generated"]
+        weighted_sum += weight * probability
+        total_weight += weight
+
+    combined = weighted_sum / total_weight if total_weight > 0 else sum(scores.values()) / len(scores)
+    scores["combined_probability"] = round(combined, 3)
+    is_ai_generated = combined > 0.5
+
+    verdict = "likely AI-generated" if is_ai_generated else "likely human-written"
+    return {
+        "is_ai_generated": is_ai_generated,
+        "confidence": round(combined, 3),
+        "scores": scores,
+        "analysis": f"Text is {verdict} (combined score {combined:.3f} from {', '.join(completed)}).",
+        "decided_by": "ensemble",
+        "detectors": summary
+    }
+
+
+async def detect_async(
+    text: str,
+    mode: Optional[str] = None,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+) -> Dict[str, Any]:
+    """Run AI detection in the given mode without blocking the event loop."""
+    mode = mode or settings.DETECTION_MODE
+    if mode == "ensemble":
+        return await detect_ensemble(text, is_disconnected=is_disconnected)
+    return await asyncio.to_thread(detect, text, mode)
+
+
+def detect(text: str, mode: Optional[str] = None) -> Dict[str, Any]:
+    """Run AI detection in the given mode (defaults to settings.DETECTION_MODE)."""
+    mode = mode or settings.DETECTION_MODE
+    if mode == "cascade":
+        return detect_cascade(text)
+    if mode == "ensemble":
+        return asyncio.run(detect_ensemble(text))
+    if mode == "ngram":
+        result = _ngram_detect(text)
+        result["decided_by"] = "ngram"
+        return result
+    return detect_statistical(text)
@@ -1,59 +1,73 @@
 """
 Gemini API Humanizer for text humanization using Google's Gemini model.
+
+Calls go through the shared async LLM gateway (core.llm), so they reach
+Gemini or, with LLM_PROVIDER=mock, the local mock provider. Chunks of a
+text are rewritten concurrently, a bounded number at a time, and put back
+in order; a chunk that can't be rewritten falls back to the local
+humanizer. In batching mode (HUMANIZER_BATCH_SIZE > 1) several chunks are
+rewritten by one structured request, and segments the model drops or
+merges are re-requested on their own.
 """
-import os
+import asyncio
+import json
 import logging
 import re
-from typing import Optional, List
+import time
+from typing import Any, Dict, Optional, List
+
+from core.config import settings
+from core.llm import LLMGateway, LLMUnavailable, get_llm_gateway, is_quota_error, is_transient_error
 
 logger = logging.getLogger(__name__)
 
-# Try to import Gemini, fall back gracefully if not available
-try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
-except ImportError:
-    logger.warning("google-generativeai not available, Gemini humanizer will fall back to semantic humanizer")
-    GEMINI_AVAILABLE = False
+MODEL_NAME = 'gemini-2.5-flash'
+
+# Tool name for the gateway's per-tool concurrency limit and metrics
+TOOL_NAME = "text_humanizer"
+
+BATCH_PROMPT = """Task: Completely rewrite each numbered segment below using different words and simpler language while keeping the exact same meaning. Change as many words as possible.
+
+Rewrite every segment on its own: do not merge, split, skip or reorder segments. Return exactly {count} segments, each with the id of the segment it rewrites.
+
+{segments}"""
+
+def batch_schema(count: int) -> Dict[str, Any]:
+    """Response schema of a batch of count segments"""
+    return {
+        "type": "object",
+        "properties": {
+            "segments": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"id": {"type": "integer"}, "text": {"type": "string"}},
+                    "required": ["id", "text"],
+                },
+                "min_items": count,
+                "max_items": count,
+            },
+        },
+        "required": ["segments"],
+    }
 
 class GeminiHumanizer:
     def __init__(self):
-        self.model = None
-        self.api_key = None
-        if GEMINI_AVAILABLE:
-            self._load_gemini()
-        
-    def _load_gemini(self):
-        """Load Gemini API configuration"""
-        if not GEMINI_AVAILABLE:
-            logger.error("Gemini not available - missing google-generativeai package")
-            return False
+        self.llm: Optional[LLMGateway] = None
+        self.batches = 0
+        self.batched_segments = 0
+        self.repaired_segments = 0
+        
+    def _load_gemini(self) -> bool:
+        """Get the shared LLM gateway on first use"""
+        if self.llm is not None:
+            return True
             
         try:
-            # Try to get API key from environment variable first
-            self.api_key = os.getenv('GEMINI_API_KEY')
-            
-            # If not found, try to load from config file
-            if not self.api_key:
-                config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'config.env')
-                if os.path.exists(config_path):
-                    with open(config_path, 'r') as f:
-                        for line in f:
-                            if line.startswith('GEMINI_API_KEY='):
-                                self.api_key = line.split('=', 1)[1].strip()
-                                break
-            
-            if not self.api_key:
-                logger.error("GEMINI_API_KEY not found in environment or config file")
-                return False
-            
-            # Configure Gemini
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel('gemini-2.5-flash')
+            self.llm = get_llm_gateway()
             logger.info("Gemini API configured successfully")
             return True
-            
-        except Exception as e:
+        except LLMUnavailable as e:
             logger.error(f"Failed to load Gemini API: {e}")
             return False
     
@@ -125,47 +139,176 @@ Rewritten version:"""
         
         return chunks if chunks else [text]
     
-    def _humanize_chunk(self, chunk: str) -> str:
-        """Humanize a single text chunk using Gemini"""
-        if not GEMINI_AVAILABLE:
-            logger.warning("Gemini not available, falling back to semantic humanizer for chunk: " + chunk)
-            return chunk # Fallback to semantic humanizer
+    async def _humanize_chunk(self, chunk: str) -> str:
+        """
+        Humanize a single text chunk using Gemini
+
+        Raises:
+            Exception: If the model is unavailable, the call fails or the rewrite is empty or too short
+        """
+        if not self._load_gemini():
+            raise LLMUnavailable("Gemini model not loaded")
+
+        prompt = self._create_humanization_prompt(chunk)
+        logger.info(f"Gemini prompt: {prompt[:100]}...")
+
+        # Generate response using Gemini
+        response = await self.llm.generate(prompt, tool=TOOL_NAME, model=MODEL_NAME)
+        logger.info(f"Gemini raw response: {response.text[:100]}...")
+
+        # Clean the output
+        humanized_part = self._clean_output(response.text or "", chunk)
+        logger.info(f"Cleaned response: {humanized_part[:100]}...")
+
+        # Safety check - only check for empty or very short responses
+        if len(humanized_part.strip()) < 3:
+            raise ValueError(f"Gemini returned empty or invalid response: '{humanized_part}'")
+
+        logger.info(f"Gemini transformation successful: '{chunk}' -> '{humanized_part}'")
+        return humanized_part
+
+    def _batch_chunks(self, chunks: List[str]) -> List[List[int]]:
+        """Group consecutive chunk indices into batches of at most HUMANIZER_BATCH_SIZE chunks and HUMANIZER_BATCH_MAX_CHARS"""
+        batches: List[List[int]] = []
+        size = 0
+        for i, chunk in enumerate(chunks):
+            if (batches and len(batches[-1]) < settings.HUMANIZER_BATCH_SIZE
+                    and size + len(chunk) <= settings.HUMANIZER_BATCH_MAX_CHARS):
+                batches[-1].append(i)
+                size += len(chunk)
+            else:
+                batches.append([i])
+                size = len(chunk)
+        return batches
 
+    def _parse_segments(self, raw: str, originals: List[str]) -> Dict[int, str]:
+        """
+        Rewritten segments of a batch response by position in the batch.
+
+        Segments with an unknown or repeated id, an empty rewrite, or a
+        rewrite much longer than the original (merged with a neighbour) are
+        left out, so they can be requested again.
+        """
         try:
-            if not self.model:
-                logger.error("Gemini model not loaded")
-                return chunk
-            
-            prompt = self._create_humanization_prompt(chunk)
-            logger.info(f"Gemini prompt: {prompt[:100]}...")
-            
-            # Generate response using Gemini
-            response = self.model.generate_content(prompt)
-            logger.info(f"Gemini raw response: {response.text[:100]}...")
-            
-            if response.text:
-                # Clean the output
-                humanized_part = self._clean_output(response.text, chunk)
-                logger.info(f"Cleaned response: {humanized_part[:100]}...")
-                
-                # Safety check - only check for empty or very short responses
-                if len(humanized_part.strip()) < 3:
-                    logger.warning(f"Gemini output too short: '{humanized_part}'")
-                    raise Exception("Gemini returned empty or invalid response")
-                
-                logger.info(f"Gemini transformation successful: '{chunk}' -> '{humanized_part}'")
-                return humanized_part
+            items = json.loads(raw).get("segments", [])
+        except (ValueError, AttributeError):
+            logger.warning(f"Unparseable batch response: {raw[:100]}...")
+            return {}
+
+        segments: Dict[int, str] = {}
+        seen = set()
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict) or not isinstance(item.get("id"), int):
+                continue
+            position = item["id"]
+            if position in seen:
+                # Two rewrites for one segment: trust neither
+                segments.pop(position, None)
+                continue
+            seen.add(position)
+            if not 0 <= position < len(originals) or not isinstance(item.get("text"), str):
+                continue
+            text = self._clean_output(item["text"], originals[position])
+            if len(text) < 3 or len(text) > 2 * len(originals[position]) + 40:
+                continue
+            segments[position] = text
+        return segments
+
+    async def _humanize_batch(self, indices: List[int], chunks: List[str],
+                              semaphore: asyncio.Semaphore) -> Dict[int, str]:
+        """
+        Humanize several chunks with one structured request.
+
+        Segments missing from the response (dropped, merged or invalid) are
+        re-requested individually, with the per-chunk retry and fallback.
+
+        Returns:
+            Rewritten chunks by chunk index
+        """
+        originals = [chunks[i] for i in indices]
+        segments = "\n\n".join(f"Segment {position}: {chunk}" for position, chunk in enumerate(originals))
+        prompt = BATCH_PROMPT.format(count=len(originals), segments=segments)
+
+        rewritten: Dict[int, str] = {}
+        async with semaphore:
+            start_time = time.perf_counter()
+            try:
+                if not self._load_gemini():
+                    raise LLMUnavailable("Gemini model not loaded")
+                response = await self.llm.generate(
+                    prompt, tool=TOOL_NAME, model=MODEL_NAME,
+                    generation_config={"response_mime_type": "application/json",
+                                       "response_schema": batch_schema(len(originals))}
+                )
+            except Exception as e:
+                logger.warning(f"Error humanizing batch of {len(indices)} chunks with Gemini: {e}")
+                if isinstance(e, LLMUnavailable) or is_quota_error(e) or is_transient_error(e):
+                    # Already retried by the gateway; don't multiply the calls
+                    local = await asyncio.gather(*(asyncio.to_thread(self._humanize_locally, chunk)
+                                                   for chunk in originals))
+                    return dict(zip(indices, local))
             else:
-                logger.warning("Gemini returned empty response")
-                return chunk
-                
+                parsed = self._parse_segments(response.text or "", originals)
+                rewritten = {indices[position]: text for position, text in parsed.items()}
+                logger.info(f"Batch of {len(indices)} chunks humanized in {time.perf_counter() - start_time:.2f}s, "
+                            f"{len(indices) - len(rewritten)} segments to repair")
+
+        self.batches += 1
+        self.batched_segments += len(rewritten)
+        missing = [i for i in indices if i not in rewritten]
+        if missing:
+            self.repaired_segments += len(missing)
+            repaired = await asyncio.gather(*(
+                self._humanize_chunk_with_fallback(i, chunks[i], semaphore) for i in missing
+            ))
+            rewritten.update(zip(missing, repaired))
+        return rewritten
+
+    def _humanize_locally(self, chunk: str) -> str:
+        """Fallback for a chunk Gemini couldn't rewrite: the local semantic humanizer, else basic rules"""
+        try:
+            from .semantic_enhanced_regex import humanize_with_semantic_enhanced_regex
+            return humanize_with_semantic_enhanced_regex(chunk)
+        except Exception as e:
+            logger.warning(f"Semantic humanizer unavailable, using basic humanization: {e}")
+        try:
+            from .utils import apply_basic_humanization
+            return apply_basic_humanization(chunk)
         except Exception as e:
-            logger.error(f"Error humanizing chunk with Gemini: {e}")
+            logger.error(f"Basic humanization failed, keeping chunk unchanged: {e}")
             return chunk
+
+    async def _humanize_chunk_with_fallback(self, index: int, chunk: str, semaphore: asyncio.Semaphore) -> str:
+        """
+        Humanize a chunk, retrying invalid rewrites and falling back to the local humanizer.
+
+        Quota and transient errors are not retried here, since the gateway has
+        already retried them with backoff.
+        """
+        async with semaphore:
+            start_time = time.perf_counter()
+            attempts = 1 + max(0, settings.HUMANIZER_CHUNK_RETRIES)
+            for attempt in range(1, attempts + 1):
+                try:
+                    result = await self._humanize_chunk(chunk)
+                    logger.info(f"Chunk {index + 1} humanized in {time.perf_counter() - start_time:.2f}s "
+                                f"(attempt {attempt})")
+                    return result
+                except LLMUnavailable as e:
+                    logger.error(f"Error humanizing chunk {index + 1} with Gemini: {e}")
+                    break
+                except Exception as e:
+                    logger.warning(f"Error humanizing chunk {index + 1} with Gemini "
+                                   f"(attempt {attempt}/{attempts}): {e}")
+                    if is_quota_error(e) or is_transient_error(e):
+                        break
+
+        logger.warning(f"Chunk {index + 1} falling back to the local humanizer")
+        return await asyncio.to_thread(self._humanize_locally, chunk)
     
-    def humanize_text(self, text: str) -> str:
+    async def humanize_text(self, text: str) -> str:
         """Humanize text by changing words and sentence structure while preserving meaning"""
-        if not GEMINI_AVAILABLE:
+        if not self._load_gemini():
             logger.error("Gemini not available, cannot humanize text.")
             return text # Fallback to semantic humanizer
 
@@ -173,16 +316,27 @@ Rewritten version:"""
             return text
         
         logger.info(f"Humanizing text with Gemini: {text[:100]}...")
+        start_time = time.perf_counter()
         
         # Segment text if it's too long
         chunks = self._segment_text(text)
         logger.info(f"Text segmented into {len(chunks)} chunks")
         
-        humanized_chunks = []
-        for i, chunk in enumerate(chunks):
-            logger.info(f"Processing chunk {i+1}/{len(chunks)}")
-            humanized_chunk = self._humanize_chunk(chunk)
-            humanized_chunks.append(humanized_chunk)
+        # Rewrite chunks (or batches of chunks) concurrently, then put them back in order
+        semaphore = asyncio.Semaphore(max(1, settings.HUMANIZER_CHUNK_CONCURRENCY))
+        if settings.HUMANIZER_BATCH_SIZE > 1 and len(chunks) > 1:
+            batches = self._batch_chunks(chunks)
+            logger.info(f"Chunks packed into {len(batches)} batches")
+            rewritten: Dict[int, str] = {}
+            for result in await asyncio.gather(*(
+                self._humanize_batch(batch, chunks, semaphore) for batch in batches
+            )):
+                rewritten.update(result)
+            humanized_chunks = [rewritten[i] for i in range(len(chunks))]
+        else:
+            humanized_chunks = await asyncio.gather(*(
+                self._humanize_chunk_with_fallback(i, chunk, semaphore) for i, chunk in enumerate(chunks)
+            ))
         
         # Combine chunks
         humanized_text = " ".join(humanized_chunks)
@@ -190,13 +344,26 @@ Rewritten version:"""
         # Clean up extra spaces
         humanized_text = re.sub(r'\s+', ' ', humanized_text).strip()
         
-        logger.info(f"Gemini humanization completed. Original: {len(text)} chars, Humanized: {len(humanized_text)} chars")
+        logger.info(f"Gemini humanization completed in {time.perf_counter() - start_time:.2f}s. "
+                    f"Original: {len(text)} chars, Humanized: {len(humanized_text)} chars")
         
         return humanized_text
 
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batch_size": settings.HUMANIZER_BATCH_SIZE,
+            "batches": self.batches,
+            "batched_segments": self.batched_segments,
+            "repaired_segments": self.repaired_segments,
+        }
+
 # Global instance
 gemini_humanizer = GeminiHumanizer()
 
-def humanize_with_gemini(text: str) -> str:
+def gemini_available() -> bool:
+    """Whether the LLM gateway (package and API key, or the mock provider) is available"""
+    return gemini_humanizer._load_gemini()
+
+async def humanize_with_gemini(text: str) -> str:
     """Main function to humanize text using Gemini API"""
-    return gemini_humanizer.humanize_text(text) 
\ No newline at end of file
+    return await gemini_humanizer.humanize_text(text) 
\ No newline at end of file
@@ -1,6 +1,7 @@
 """
 Hugging Face AI Content Detector using transformer-based models.
 """
+import threading
 import torch
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 from typing import Dict, Any, Optional
@@ -8,6 +9,9 @@ from core.dependencies import get_logger
 
 logger = get_logger(__name__)
 
+# AI probability above which text is flagged as AI-generated
+AI_THRESHOLD = 0.55
+
 class HuggingFaceAIDetector:
     """AI content detector using pre-trained transformer models."""
     
@@ -63,14 +67,14 @@ class HuggingFaceAIDetector:
             
             # Use a more sensitive threshold for AI detection
             # Flag as AI if probability is > 0.55 (more sensitive)
-            is_ai_generated = ai_probability > 0.55
+            is_ai_generated = ai_probability > AI_THRESHOLD
             
             # Calculate confidence based on how far from threshold
             # More sensitive confidence calculation
             if is_ai_generated:
-                confidence = min((ai_probability - 0.55) * 2.22, 1.0)  # Scale to 0-1
+                confidence = min((ai_probability - AI_THRESHOLD) * 2.22, 1.0)  # Scale to 0-1
             else:
-                confidence = min((0.55 - ai_probability) * 2.22, 1.0)  # Scale to 0-1
+                confidence = min((AI_THRESHOLD - ai_probability) * 2.22, 1.0)  # Scale to 0-1
             
             # Generate analysis
             analysis = self._generate_analysis(ai_probability, is_ai_generated)
@@ -117,15 +121,22 @@ class HuggingFaceAIDetector:
 
 # Global instance for reuse
 _ai_detector_instance: Optional[HuggingFaceAIDetector] = None
+_ai_detector_lock = threading.Lock()
 
 def get_ai_detector() -> HuggingFaceAIDetector:
     """Get or create the global AI detector instance."""
     global _ai_detector_instance
     if _ai_detector_instance is None:
-        _ai_detector_instance = HuggingFaceAIDetector()
+        with _ai_detector_lock:
+            if _ai_detector_instance is None:
+                _ai_detector_instance = HuggingFaceAIDetector()
     return _ai_detector_instance
 
+def warmup(detector: HuggingFaceAIDetector):
+    """Run a dummy inference on the loaded detector."""
+    detector.detect_ai_content("This is a short warmup sentence for the detection model.")
+
 def detect_ai_content(text: str) -> Dict[str, Any]:
     """Convenience function to detect AI content."""
     detector = get_ai_detector()
-    return detector.detect_ai_content(text) 
\ No newline at end of file
+    return detector.detect_ai_content(text)
\ No newline at end of file
@@ -28,10 +28,13 @@ class HealthResponse(BaseModel):
 class AIDetectionRequest(BaseModel):
     """Request model for AI content detection."""
     text: str = Field(..., description="Text to analyze", min_length=1)
+    mode: Optional[str] = Field(default=None, description="Detection mode: statistical, cascade or ensemble (defaults to server setting)")
 
 class AIDetectionResponse(BaseModel):
     """Response model for AI content detection."""
     is_ai_generated: bool = Field(..., description="Whether text is AI-generated")
     confidence: float = Field(..., description="Confidence score (0-1)")
     scores: Dict[str, float] = Field(..., description="Individual analysis scores")
-    analysis: str = Field(..., description="Human-readable analysis") 
\ No newline at end of file
+    analysis: str = Field(..., description="Human-readable analysis")
+    decided_by: Optional[str] = Field(None, description="Detection stage that produced the verdict")
+    detectors: Optional[Dict[str, Any]] = Field(None, description="Per-detector status and latency (ensemble mode)") 
\ No newline at end of file
@@ -4,12 +4,18 @@ Router for the text humanizer tool.
 import time
 import asyncio
 from typing import Optional
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, Response, status
 from .nltk_utils import safe_sent_tokenize
 
 from .models import HumanizeRequest, HumanizeResponse, HealthResponse, AIDetectionRequest, AIDetectionResponse
 from .utils import apply_basic_humanization
+from .detection import (
+    DETECTION_MODES, ClientDisconnected, available_modes, detect_async, detect_ensemble, detect_semantic,
+    cascade_metrics, detection_cache
+)
+from core.config import settings
 from core.dependencies import get_logger, validate_text_input, validate_tone_input
+from core.llm import llm_stats
 
 logger = get_logger(__name__)
 
@@ -45,37 +51,52 @@ async def load_model():
         return {"status": "error", "message": str(e)}
 
 @router.post("/detect-ai", response_model=AIDetectionResponse)
-async def detect_ai_content_endpoint(request: AIDetectionRequest):
+async def detect_ai_content_endpoint(request: AIDetectionRequest, http_request: Request):
     """
     Detect if text is AI-generated using statistical analysis.
+    
+    In cascade mode the transformer model only runs when the statistical
+    score is ambiguous; `decided_by` reports which stage decided. In ensemble
+    mode all detectors run concurrently with per-detector deadlines.
     """
     start_time = time.time()
     
     # Validate input
     text = validate_text_input(request.text)
+    if request.mode and request.mode not in DETECTION_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid detection mode. Must be one of: {', '.join(DETECTION_MODES)}"
+        )
+    mode = request.mode or settings.DETECTION_MODE
+    if mode in DETECTION_MODES and mode not in available_modes():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Detection mode '{mode}' is unavailable: no trained n-gram detector weights. "
+                   f"Available modes: {', '.join(available_modes())}"
+        )
     
     logger.info(f"AI detection started for text: {text[:100]}...")
     
     try:
-        # Try statistical method first (more reliable), fallback to Hugging Face model
-        try:
-            from .ai_detector import detect_ai_content
-            result = detect_ai_content(text)
-        except Exception as e:
-            logger.warning(f"Failed to load statistical AI detector, falling back to Hugging Face method: {e}")
-            from .huggingface_ai_detector import detect_ai_content as fallback_detect
-            result = fallback_detect(text)
+        # Run off the event loop: escalation may hit the transformer model
+        result = await detect_async(text, mode, is_disconnected=http_request.is_disconnected)
         
         processing_time = time.time() - start_time
-        logger.info(f"AI detection completed in {processing_time:.3f}s")
+        logger.info(f"AI detection completed in {processing_time:.3f}s (decided by {result.get('decided_by')})")
         
         return AIDetectionResponse(
             is_ai_generated=result["is_ai_generated"],
             confidence=result["confidence"],
             scores=result["scores"],
-            analysis=result["analysis"]
+            analysis=result["analysis"],
+            decided_by=result.get("decided_by"),
+            detectors=result.get("detectors")
         )
         
+    except ClientDisconnected:
+        logger.info("Client disconnected, AI detection cancelled")
+        return Response(status_code=499)
     except Exception as e:
         logger.error(f"Error in AI detection: {e}")
         import traceback
@@ -94,6 +115,17 @@ async def detect_ai_content_endpoint(request: AIDetectionRequest):
             analysis="Error occurred during analysis"
         )
 
+@router.get("/metrics")
+async def detection_metrics():
+    """AI detection metrics (cascade escalation rate, latency, cache hit rate), Gemini humanizer batching and LLM call statistics."""
+    from .gemini_humanizer import gemini_humanizer
+    return {
+        "cascade": cascade_metrics.snapshot(),
+        "cache": detection_cache.stats(),
+        "gemini_humanizer": gemini_humanizer.stats(),
+        "llm": llm_stats()
+    }
+
 @router.post("/detect-ai-semantic", response_model=AIDetectionResponse)
 async def detect_ai_content_semantic_endpoint(request: AIDetectionRequest):
     """
@@ -107,8 +139,7 @@ async def detect_ai_content_semantic_endpoint(request: AIDetectionRequest):
     logger.info(f"Semantic AI detection started for text: {text[:100]}...")
     
     try:
-        from .semantic_ai_detector import detect_ai_content
-        result = detect_ai_content(text)
+        result = detect_semantic(text)
         
         processing_time = time.time() - start_time
         logger.info(f"Semantic AI detection completed in {processing_time:.3f}s")
@@ -137,7 +168,7 @@ async def detect_ai_content_semantic_endpoint(request: AIDetectionRequest):
         )
 
 @router.post("/humanize", response_model=HumanizeResponse)
-async def humanize_text(request: HumanizeRequest):
+async def humanize_text(request: HumanizeRequest, http_request: Request):
     """
     Rewrites AI-generated text to sound more natural using advanced text transformation.
     """
@@ -155,13 +186,12 @@ async def humanize_text(request: HumanizeRequest):
         # Route to appropriate humanizer based on model selection
         if request.model == "gemini":
             try:
-                from .gemini_humanizer import humanize_with_gemini, GEMINI_AVAILABLE
-                logger.info(f"Gemini available: {GEMINI_AVAILABLE}")
-                if not GEMINI_AVAILABLE:
-                    raise Exception("Gemini is not available - missing google-generativeai package")
+                from .gemini_humanizer import humanize_with_gemini, gemini_available
+                if not gemini_available():
+                    raise Exception("Gemini is not available - missing google-generativeai package or API key")
                 
                 logger.info("Calling Gemini humanizer...")
-                humanized_text = humanize_with_gemini(text)
+                humanized_text = await humanize_with_gemini(text)
                 logger.info(f"Gemini result: {humanized_text[:100]}...")
                 logger.info(f"Same as original? {humanized_text == text}")
                 
@@ -184,28 +214,8 @@ async def humanize_text(request: HumanizeRequest):
         
         processing_time = time.time() - start_time
         
-        # Perform AI detection using statistical method first (more reliable)
-        try:
-            from .ai_detector import detect_ai_content
-            ai_detection = detect_ai_content(text)
-        except Exception as e:
-            logger.warning(f"Failed to load statistical AI detector, falling back to Hugging Face method: {e}")
-            try:
-                from .huggingface_ai_detector import detect_ai_content as fallback_detect
-                ai_detection = fallback_detect(text)
-            except Exception as e2:
-                logger.warning(f"Failed to load Hugging Face AI detector, trying semantic detector: {e2}")
-                try:
-                    from .semantic_ai_detector import detect_ai_content as semantic_detect
-                    ai_detection = semantic_detect(text)
-                except Exception as e3:
-                    logger.error(f"All AI detectors failed: {e3}")
-                    ai_detection = {
-                        "is_ai_generated": False,
-                        "confidence": 0.0,
-                        "scores": {"ai_probability": 0.0},
-                        "analysis": "AI detection unavailable"
-                    }
+        # Run all detectors concurrently; whatever finishes within the deadline is combined
+        ai_detection = await detect_ensemble(text, is_disconnected=http_request.is_disconnected)
         
         return HumanizeResponse(
             humanized_text=humanized_text,
@@ -215,6 +225,9 @@ async def humanize_text(request: HumanizeRequest):
             ai_detection=ai_detection
         )
         
+    except ClientDisconnected:
+        logger.info("Client disconnected, humanization cancelled")
+        return Response(status_code=499)
     except Exception as e:
         logger.error(f"Error in humanization: {e}")
         import traceback
@@ -224,13 +237,7 @@ async def humanize_text(request: HumanizeRequest):
         processing_time = time.time() - start_time
         
         # Perform AI detection even on fallback
-        try:
-            from .ai_detector import detect_ai_content
-            ai_detection = detect_ai_content(text)
-        except Exception as e:
-            logger.warning(f"Failed to load statistical AI detector, falling back to Hugging Face method: {e}")
-            from .huggingface_ai_detector import detect_ai_content as fallback_detect
-            ai_detection = fallback_detect(text)
+        ai_detection = await detect_ensemble(text)
         
         return HumanizeResponse(
             humanized_text=text,
@@ -0,0 +1,124 @@
+"""
+Train the hashed n-gram AI detector from a labeled JSONL corpus.
+
+Each line is a JSON object with a `text` field and a `label` field
+(1 / true / "ai" for AI-generated text, 0 / false / "human" otherwise).
+
+Usage (from the backend directory):
+    python -m tools.text_humanizer.train_ngram_detector corpus.jsonl
+    python -m tools.text_humanizer.train_ngram_detector corpus.jsonl --epochs 10 --output weights/my_model
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from .ngram_detector import DEFAULT_MODEL_PATH, DEFAULT_N_FEATURES, hash_features, save_model
+
+AI_LABELS = {"1", "true", "ai", "machine", "generated"}
+
+
+def load_corpus(path: str):
+    """Read (text, label) pairs from a JSONL file."""
+    texts, labels = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if not record.get("text"):
+                print(f"Skipping line {line_number}: no text")
+                continue
+            texts.append(record["text"])
+            labels.append(1.0 if str(record["label"]).strip().lower() in AI_LABELS else 0.0)
+    return texts, np.array(labels, dtype=np.float32)
+
+
+def train(features, labels, n_features, epochs, learning_rate, l2, seed):
+    """Logistic regression with sparse SGD updates."""
+    weights = np.zeros(n_features, dtype=np.float32)
+    bias = 0.0
+    rng = np.random.default_rng(seed)
+
+    for epoch in range(1, epochs + 1):
+        order = rng.permutation(len(features))
+        loss = 0.0
+        lr = learning_rate / (1 + 0.1 * (epoch - 1))
+        for i in order:
+            indices, values = features[i]
+            logit = float(np.dot(weights[indices], values)) + bias
+            probability = 1.0 / (1.0 + np.exp(-logit))
+            gradient = probability - labels[i]
+            weights[indices] -= lr * (gradient * values + l2 * weights[indices])
+            bias -= lr * gradient
+            loss -= np.log(max(probability if labels[i] else 1.0 - probability, 1e-12))
+        print(f"Epoch {epoch}/{epochs}: log loss {loss / max(len(features), 1):.4f}")
+
+    return weights, bias
+
+
+def evaluate(features, labels, weights, bias):
+    """Accuracy of the model at a 0.5 threshold."""
+    if not features:
+        return None
+    correct = 0
+    for (indices, values), label in zip(features, labels):
+        logit = float(np.dot(weights[indices], values)) + bias
+        correct += int((logit > 0) == bool(label))
+    return correct / len(features)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the hashed n-gram AI detector")
+    parser.add_argument("corpus", help="Labeled JSONL corpus")
+    parser.add_argument("--output", default=DEFAULT_MODEL_PATH, help="Output path prefix (.npy/.json are added)")
+    parser.add_argument("--n-features", type=int, default=DEFAULT_N_FEATURES, help="Hashed feature space size (power of two)")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--learning-rate", type=float, default=0.5)
+    parser.add_argument("--l2", type=float, default=1e-6)
+    parser.add_argument("--holdout", type=float, default=0.1, help="Fraction of the corpus held out for evaluation")
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args()
+
+    if args.n_features & (args.n_features - 1):
+        parser.error("--n-features must be a power of two")
+
+    texts, labels = load_corpus(args.corpus)
+    print(f"Loaded {len(texts)} documents ({int(labels.sum())} AI, {len(texts) - int(labels.sum())} human)")
+
+    start_time = time.time()
+    features = [hash_features(text, args.n_features) for text in texts]
+    featurize_time = time.time() - start_time
+    print(f"Featurized in {featurize_time:.2f}s ({featurize_time / max(len(texts), 1) * 1000:.3f} ms/document)")
+
+    order = np.random.default_rng(args.seed).permutation(len(features))
+    holdout_size = int(len(features) * args.holdout)
+    holdout, training = order[:holdout_size], order[holdout_size:]
+
+    weights, bias = train(
+        [features[i] for i in training], labels[training], args.n_features,
+        args.epochs, args.learning_rate, args.l2, args.seed
+    )
+
+    train_accuracy = evaluate([features[i] for i in training], labels[training], weights, bias)
+    holdout_accuracy = evaluate([features[i] for i in holdout], labels[holdout], weights, bias)
+    print(f"Training accuracy: {train_accuracy:.4f}")
+    if holdout_accuracy is not None:
+        print(f"Holdout accuracy: {holdout_accuracy:.4f}")
+
+    save_model(
+        args.output, weights, bias,
+        version=time.strftime("%Y%m%d%H%M%S"),
+        extra={
+            "documents": len(texts),
+            "train_accuracy": train_accuracy,
+            "holdout_accuracy": holdout_accuracy
+        }
+    )
+    print(f"Saved model to {args.output}.npy / {args.output}.json")
+
+
+if __name__ == "__main__":
+    main()